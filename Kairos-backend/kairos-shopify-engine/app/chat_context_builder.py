@@ -25,16 +25,29 @@ def _profit_per_unit(s: SnapshotInput) -> float | None:
     return None
 
 
+def priority_signals(req: ChatRequest) -> dict:
+    """Signaux pré-calculés : contexte du LLM (build_context) et réponse dégradée sans LLM."""
+    healthy = [s for s in req.snapshots if s.has_cost and s.gross_margin_pct >= 15]
+    return {
+        "problems": [s for s in req.snapshots if s.has_cost and s.gross_margin_pct < 0],
+        "risky": [s for s in req.snapshots if s.has_cost and 0 <= s.gross_margin_pct < 15],
+        "missing_cost": [s for s in req.snapshots if not s.has_cost],
+        "healthy": healthy,
+        "best": max(healthy, key=lambda s: s.gross_profit) if healthy else None,
+        "high_refund": [i for i in req.insights if "remboursement" in i.title.lower() or "refund" in i.type.lower()],
+    }
+
+
 def build_context(req: ChatRequest) -> str:
     lines = []
 
     # --- Signaux prioritaires (pré-calculés pour guider le LLM) ---
-    problems = [s for s in req.snapshots if s.has_cost and s.gross_margin_pct < 0]
-    risky = [s for s in req.snapshots if s.has_cost and 0 <= s.gross_margin_pct < 15]
-    missing_cost = [s for s in req.snapshots if not s.has_cost]
-    healthy = [s for s in req.snapshots if s.has_cost and s.gross_margin_pct >= 15]
-
-    high_refund = [i for i in req.insights if "remboursement" in i.title.lower() or "refund" in i.type.lower()]
+    signals = priority_signals(req)
+    problems = signals["problems"]
+    risky = signals["risky"]
+    missing_cost = signals["missing_cost"]
+    healthy = signals["healthy"]
+    high_refund = signals["high_refund"]
 
     lines.append("=== SIGNAUX PRIORITAIRES ===")
     if problems:
@@ -49,7 +62,7 @@ def build_context(req: ChatRequest) -> str:
         names = ", ".join(f"{s.product_name} ({s.gross_margin_pct:.1f}%)" for s in risky)
         lines.append(f"MARGE FAIBLE ({len(risky)} produit(s)) : {names}")
     if healthy:
-        best = max(healthy, key=lambda s: s.gross_profit)
+        best = signals["best"]
         lines.append(f"PRODUIT LE PLUS RENTABLE : {best.product_name} ({best.gross_margin_pct:.1f}%, profit {best.gross_profit:.0f}$)")
     lines.append("")
 
@@ -89,3 +102,35 @@ def build_context(req: ChatRequest) -> str:
             lines.append("")
 
     return "\n".join(lines)
+
+
+def _names(snaps: list[SnapshotInput], with_margin: bool = True, limit: int = 3) -> str:
+    shown = [f"{s.product_name} ({s.gross_margin_pct:.1f}%)" if with_margin else s.product_name for s in snaps[:limit]]
+    if len(snaps) > limit:
+        shown.append(f"{len(snaps) - limit} more")
+    return ", ".join(shown)
+
+
+def degraded_answer(req: ChatRequest) -> str:
+    """
+    Réponse sans LLM (disjoncteur ouvert, budget épuisé) : les signaux prioritaires,
+    dans l'ordre de priorité du prompt, sans markdown.
+    """
+    signals = priority_signals(req)
+    parts = ["Live analysis is unavailable right now, so here is what your data flags."]
+    if signals["problems"]:
+        worst_first = sorted(signals["problems"], key=lambda s: s.gross_margin_pct)
+        parts.append(f"Losing money on every sale: {_names(worst_first)}.")
+    if signals["high_refund"]:
+        parts.append(f"{len(signals['high_refund'])} refund alert(s) to review.")
+    if signals["missing_cost"]:
+        parts.append(f"No cost recorded for {_names(signals['missing_cost'], with_margin=False)}, so their margin is unknown.")
+    if signals["risky"]:
+        parts.append(f"Thin margin: {_names(signals['risky'])}.")
+    best = signals["best"]
+    if best is not None:
+        parts.append(f"Most profitable: {best.product_name} ({best.gross_margin_pct:.1f}% margin, ${best.gross_profit:,.0f} profit).")
+    if len(parts) == 1:
+        parts.append("No product data was received." if not req.snapshots else "No product needs urgent attention.")
+    parts.append("Ask again in a moment for a full answer.")
+    return " ".join(parts)
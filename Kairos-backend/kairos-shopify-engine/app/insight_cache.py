@@ -0,0 +1,213 @@
+"""
+Cache des textes d'insights générés par le LLM (write_insights), sur deux niveaux.
+
+Clé = (type, produit, faits normalisés, version du prompt) : un dashboard rafraîchi
+avec les mêmes faits arrondis ne rappelle pas OpenAI.
+- niveau 1 : LRU en mémoire du process (aucune E/S)
+- niveau 2 : SQLite partagé par les workers uvicorn (mode WAL), relu en cas de miss LRU
+Les deux niveaux expirent après le TTL. Seules les réponses LLM complètes sont mises en
+cache : un texte de repli (_fallback) laisse le prochain rafraîchissement réessayer.
+Une erreur SQLite ne fait jamais échouer un insight : elle compte comme un miss. Si la
+base ne peut pas être ouverte (dossier impossible à créer, système de fichiers en
+lecture seule), le niveau disque est coupé pour le process et le LRU continue seul.
+
+Tolérances optionnelles : les faits listés sont arrondis au pas donné avant de calculer
+la clé (ex. margin_percent=0.5 -> -12.3 et -12.4 tombent sur la même entrée). Le texte
+servi reprend alors les chiffres de la première génération, à un pas près.
+
+SHOPIFY_ENGINE_INSIGHT_CACHE             : 0 = désactivé
+SHOPIFY_ENGINE_INSIGHT_CACHE_DB          : fichier SQLite
+SHOPIFY_ENGINE_INSIGHT_CACHE_TTL_S       : durée de vie d'une entrée (défaut 7 jours)
+SHOPIFY_ENGINE_INSIGHT_CACHE_LRU_SIZE    : entrées gardées en mémoire par process
+SHOPIFY_ENGINE_INSIGHT_CACHE_TOLERANCES  : "fait=pas,..." ex. "margin_percent=0.5,gross_profit=1"
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+CACHE_ENABLED = os.getenv("SHOPIFY_ENGINE_INSIGHT_CACHE", "1") == "1"
+CACHE_DB = Path(os.getenv(
+    "SHOPIFY_ENGINE_INSIGHT_CACHE_DB", str(Path(__file__).resolve().parent.parent / "data" / "insight_cache.sqlite")
+))
+CACHE_TTL_S = float(os.getenv("SHOPIFY_ENGINE_INSIGHT_CACHE_TTL_S", str(7 * 24 * 3600)))
+LRU_SIZE = int(os.getenv("SHOPIFY_ENGINE_INSIGHT_CACHE_LRU_SIZE", "4096"))
+
+# purge des entrées expirées du disque toutes les N écritures
+_PURGE_EVERY = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS insight_cache (
+    key        TEXT PRIMARY KEY,
+    value      TEXT NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def parse_tolerances(spec: str) -> dict[str, float]:
+    """'margin_percent=0.5,gross_profit=1' -> {"margin_percent": 0.5, "gross_profit": 1.0}"""
+    tolerances = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, step = part.partition("=")
+        tolerances[name.strip()] = float(step)
+    return tolerances
+
+
+FACT_TOLERANCES = parse_tolerances(os.getenv("SHOPIFY_ENGINE_INSIGHT_CACHE_TOLERANCES", ""))
+
+
+def normalize_facts(facts: dict, tolerances: dict[str, float]) -> dict:
+    normalized = {}
+    for name, value in facts.items():
+        step = tolerances.get(name)
+        if step and isinstance(value, (int, float)) and not isinstance(value, bool):
+            # round final : -12.5 et non -12.500000000000002
+            value = round(round(value / step) * step, 6)
+        normalized[name] = value
+    return normalized
+
+
+def cache_key(raw_facts: dict, prompt_version: str, tolerances: dict[str, float] = FACT_TOLERANCES) -> str:
+    payload = [
+        prompt_version,
+        raw_facts["type"],
+        raw_facts["product_id"],
+        # le nom apparaît dans le texte généré : un produit renommé doit être régénéré
+        raw_facts.get("product_name"),
+        normalize_facts(raw_facts.get("facts", {}), tolerances),
+    ]
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class InsightCache:
+    def __init__(
+        self,
+        path: Path = CACHE_DB,
+        ttl_s: float = CACHE_TTL_S,
+        lru_size: int = LRU_SIZE,
+        enabled: bool = CACHE_ENABLED,
+    ) -> None:
+        self.path = path
+        self.ttl_s = ttl_s
+        self.lru_size = lru_size
+        self.enabled = enabled
+        self._lru: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self.disk_enabled = True
+        self._writes = 0
+        self._counters = {"lru_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "stores": 0, "disk_errors": 0}
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _disk(self) -> sqlite3.Connection | None:
+        """Connexion du niveau disque (sous self._lock), None s'il est coupé."""
+        if not self.disk_enabled:
+            return None
+        try:
+            return self.conn
+        except (sqlite3.Error, OSError):
+            # base impossible à ouvrir : pas de nouvel essai (ni mkdir) à chaque appel
+            self._counters["disk_errors"] += 1
+            self.disk_enabled = False
+            return None
+
+    def get(self, key: str) -> dict | None:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._lru.move_to_end(key)
+                    self._counters["lru_hits"] += 1
+                    return entry[1]
+                # l'entrée disque a la même échéance, sauf si un autre worker l'a régénérée
+                del self._lru[key]
+
+            conn = self._disk()
+            row = None
+            if conn is not None:
+                try:
+                    row = conn.execute(
+                        "SELECT value, expires_at FROM insight_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                except (sqlite3.Error, OSError):
+                    self._counters["disk_errors"] += 1
+            if row is not None and row[1] > now:
+                value = json.loads(row[0])
+                self._remember(key, row[1], value)
+                self._counters["disk_hits"] += 1
+                return value
+            if row is not None:
+                self._counters["expired"] += 1
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, key: str, value: dict) -> None:
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl_s
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._counters["stores"] += 1
+            conn = self._disk()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO insight_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), expires_at),
+                )
+                self._writes += 1
+                if self._writes % _PURGE_EVERY == 0:
+                    conn.execute("DELETE FROM insight_cache WHERE expires_at <= ?", (time.time(),))
+            except (sqlite3.Error, OSError):
+                self._counters["disk_errors"] += 1
+
+    def _remember(self, key: str, expires_at: float, value: dict) -> None:
+        self._lru[key] = (expires_at, value)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def metrics(self) -> dict:
+        """Compteurs du process courant (chaque worker uvicorn a les siens)."""
+        with self._lock:
+            counters = dict(self._counters)
+            lru_entries = len(self._lru)
+        lookups = counters["lru_hits"] + counters["disk_hits"] + counters["misses"]
+        hits = counters["lru_hits"] + counters["disk_hits"]
+        return {
+            "enabled": self.enabled,
+            "disk_enabled": self.disk_enabled,
+            **counters,
+            "lookups": lookups,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+            "lru_hit_rate": round(counters["lru_hits"] / lookups, 4) if lookups else None,
+            "lru_entries": lru_entries,
+            "ttl_s": self.ttl_s,
+            "tolerances": FACT_TOLERANCES,
+        }
+
+
+insight_cache = InsightCache()
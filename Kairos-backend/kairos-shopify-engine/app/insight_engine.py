@@ -1,42 +1,143 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
+"""
+Détection des insights en une passe.
+
+DetectionContext construit une fois la table partagée par tous les détecteurs :
+- une passe sur order_items -> totaux par produit (revenue, remboursements, revenu
+  catalogue et remise des lignes dont le prix catalogue est connu), ordre de première vente
+- une passe sur snapshots -> chaque snapshot classé une fois (marge négative, faible,
+  coût manquant) + candidat meilleur produit, et name_map
+
+Les détecteurs sont enregistrés avec @detector("type") et ne lisent que le contexte :
+ajouter un type d'insight n'ajoute pas de passe. Un détecteur qui a besoin d'un nouveau
+total l'ajoute à ProductTotals et au pli de DetectionContext. L'ordre d'enregistrement
+est l'ordre des faits dans la réponse.
+"""
+
+import asyncio
+from typing import Callable
+
 from app.models import InsightRequest
-from app.insight_writer import write_insight
+from app.insight_runs import insight_runs, start_upgrade
+from app.insight_writer import template_insights, write_insights
 
 # Seuils configurables
 LOW_MARGIN_THRESHOLD = 15.0   # % en dessous duquel on considère la marge faible
 DISCOUNT_THRESHOLD = 0.05     # 5% de remise minimum pour compter comme "soldé"
 REFUND_IMPACT_THRESHOLD = 0.1 # remboursements > 10% du revenue = impact significatif
 
+# Classes de snapshot (une par snapshot au plus)
+NEGATIVE_MARGIN = "negative_margin"
+LOW_MARGIN = "low_margin"
+MISSING_COST = "missing_cost"
 
-def compute_insights(req: InsightRequest) -> list[dict]:
-    raw_facts_list = []
 
-    raw_facts_list += _true_top_product(req)
-    raw_facts_list += _negative_margin_alert(req)
-    raw_facts_list += _low_margin_warning(req)
-    raw_facts_list += _missing_cost_alert(req)
-    raw_facts_list += _refund_impact(req)
-    raw_facts_list += _discount_erosion(req)
+class ProductTotals:
+    """Totaux d'un produit sur les lignes de commande."""
 
-    # Enrichissement : appels LLM en parallèle (1 thread par insight)
-    results = [None] * len(raw_facts_list)
-    with ThreadPoolExecutor(max_workers=6) as executor:
-        futures = {executor.submit(write_insight, facts): i for i, facts in enumerate(raw_facts_list)}
-        for future in as_completed(futures):
-            results[futures[future]] = future.result()
-    return results
+    __slots__ = ("revenue", "refund", "catalogue_revenue", "discount")
+
+    def __init__(self) -> None:
+        self.revenue = 0.0
+        self.refund = 0.0
+        self.catalogue_revenue = 0.0
+        self.discount = 0.0
+
+
+class DetectionContext:
+    def __init__(self, req: InsightRequest) -> None:
+        self.snapshots = req.snapshots
+        self.name_map = {s.product_id: s.product_name for s in req.snapshots}
+
+        # passe unique sur les lignes ; mêmes sommes, dans le même ordre, que les anciens détecteurs
+        products: dict[str, ProductTotals] = {}
+        discounted: dict[str, ProductTotals] = {}
+        for item in req.order_items:
+            pid = item.product_id
+            totals = products.get(pid)
+            if totals is None:
+                totals = products[pid] = ProductTotals()
+            revenue = item.unit_price * item.quantity
+            totals.revenue += revenue
+            totals.refund += item.refunded_amount
+            if item.original_price > 0:
+                catalogue_revenue = item.original_price * item.quantity
+                totals.catalogue_revenue += catalogue_revenue
+                totals.discount += catalogue_revenue - revenue
+                discounted.setdefault(pid, totals)
+        self.products = products
+        # ordre de première ligne au prix catalogue connu (ordre historique de discount_erosion)
+        self.discounted = discounted
+
+        # classement des snapshots
+        self.classes: dict[str, list] = {NEGATIVE_MARGIN: [], LOW_MARGIN: [], MISSING_COST: []}
+        self.top = None
+        for s in req.snapshots:
+            if s.has_cost:
+                if s.gross_profit > 0 and (self.top is None or s.gross_profit > self.top.gross_profit):
+                    self.top = s
+                if s.gross_margin_pct < 0:
+                    self.classes[NEGATIVE_MARGIN].append(s)
+                elif s.gross_margin_pct < LOW_MARGIN_THRESHOLD:
+                    self.classes[LOW_MARGIN].append(s)
+            elif s.units_sold > 0:
+                self.classes[MISSING_COST].append(s)
+
+    def product_name(self, pid: str) -> str:
+        return self.name_map.get(pid, pid)
+
+
+Detector = Callable[[DetectionContext], list[dict]]
+
+# type d'insight -> détecteur, dans l'ordre d'enregistrement
+DETECTORS: dict[str, Detector] = {}
+
+
+def detector(insight_type: str) -> Callable[[Detector], Detector]:
+    def register(fn: Detector) -> Detector:
+        DETECTORS[insight_type] = fn
+        return fn
+    return register
+
+
+def detect(req: InsightRequest) -> list[dict]:
+    """Faits bruts de tous les détecteurs enregistrés (sans appel LLM)."""
+    ctx = DetectionContext(req)
+    return [facts for fn in DETECTORS.values() for facts in fn(ctx)]
+
+
+async def compute_insights(req: InsightRequest) -> list[dict]:
+    # détection CPU hors de la boucle d'événements
+    raw_facts_list = await asyncio.to_thread(detect, req)
+
+    # Enrichissement : cache puis quelques appels LLM groupés, bornés par llm_limiter
+    return await write_insights(raw_facts_list, req.business_id)
+
+
+async def compute_insights_template_first(req: InsightRequest) -> dict:
+    """
+    Rendu immédiat (textes en cache ou templates, source "llm" / "template") et run
+    enregistré ; la rédaction LLM des templates continue en tâche de fond (app/insight_runs.py).
+    """
+    raw_facts_list = await asyncio.to_thread(detect, req)
+    insights, pending = await template_insights(raw_facts_list)
+    templated = set(pending)
+    insights = [{**insight, "source": "template" if i in templated else "llm"} for i, insight in enumerate(insights)]
+
+    run = await asyncio.to_thread(insight_runs.create, req.business_id, insights)
+    if pending:
+        start_upgrade(run["run_id"], raw_facts_list, pending, req.business_id)
+    return {**run, "insights": insights, "pending": len(pending)}
 
 
 # -----------------------------------------------------------------------------
 # 1. Meilleur produit en profit brut réel
 # -----------------------------------------------------------------------------
-def _true_top_product(req: InsightRequest) -> list[dict]:
-    eligible = [s for s in req.snapshots if s.has_cost and s.gross_profit > 0]
-    if not eligible:
+@detector("true_top_product")
+def _true_top_product(ctx: DetectionContext) -> list[dict]:
+    top = ctx.top
+    if top is None:
         return []
 
-    top = max(eligible, key=lambda s: s.gross_profit)
-
     return [{
         "type":         "true_top_product",
         "product_id":   top.product_id,
@@ -54,88 +155,79 @@ def _true_top_product(req: InsightRequest) -> list[dict]:
 # -----------------------------------------------------------------------------
 # 2. Alerte marge négative
 # -----------------------------------------------------------------------------
-def _negative_margin_alert(req: InsightRequest) -> list[dict]:
+@detector("negative_margin_alert")
+def _negative_margin_alert(ctx: DetectionContext) -> list[dict]:
     results = []
-    for s in req.snapshots:
-        if s.has_cost and s.gross_margin_pct < 0:
-            loss_per_unit = round(-s.gross_profit / s.units_sold, 2) if s.units_sold > 0 else 0
-            results.append({
-                "type":         "negative_margin_alert",
-                "product_id":   s.product_id,
-                "product_name": s.product_name,
-                "severity":     "critical",
-                "value":        round(s.gross_margin_pct, 1),
-                "facts": {
-                    "margin_percent": round(s.gross_margin_pct, 1),
-                    "total_loss":     round(-s.gross_profit, 2),
-                    "loss_per_unit":  loss_per_unit,
-                    "units_sold":     s.units_sold,
-                },
-            })
+    for s in ctx.classes[NEGATIVE_MARGIN]:
+        loss_per_unit = round(-s.gross_profit / s.units_sold, 2) if s.units_sold > 0 else 0
+        results.append({
+            "type":         "negative_margin_alert",
+            "product_id":   s.product_id,
+            "product_name": s.product_name,
+            "severity":     "critical",
+            "value":        round(s.gross_margin_pct, 1),
+            "facts": {
+                "margin_percent": round(s.gross_margin_pct, 1),
+                "total_loss":     round(-s.gross_profit, 2),
+                "loss_per_unit":  loss_per_unit,
+                "units_sold":     s.units_sold,
+            },
+        })
     return results
 
 
 # -----------------------------------------------------------------------------
 # 3. Avertissement marge faible
 # -----------------------------------------------------------------------------
-def _low_margin_warning(req: InsightRequest) -> list[dict]:
+@detector("low_margin_warning")
+def _low_margin_warning(ctx: DetectionContext) -> list[dict]:
     results = []
-    for s in req.snapshots:
-        if s.has_cost and 0 <= s.gross_margin_pct < LOW_MARGIN_THRESHOLD:
-            results.append({
-                "type":         "low_margin_warning",
-                "product_id":   s.product_id,
-                "product_name": s.product_name,
-                "severity":     "warning",
-                "value":        round(s.gross_margin_pct, 1),
-                "facts": {
-                    "margin_percent":   round(s.gross_margin_pct, 1),
-                    "gross_profit":     round(s.gross_profit, 2),
-                    "threshold":        LOW_MARGIN_THRESHOLD,
-                    "units_sold":       s.units_sold,
-                },
-            })
+    for s in ctx.classes[LOW_MARGIN]:
+        results.append({
+            "type":         "low_margin_warning",
+            "product_id":   s.product_id,
+            "product_name": s.product_name,
+            "severity":     "warning",
+            "value":        round(s.gross_margin_pct, 1),
+            "facts": {
+                "margin_percent":   round(s.gross_margin_pct, 1),
+                "gross_profit":     round(s.gross_profit, 2),
+                "threshold":        LOW_MARGIN_THRESHOLD,
+                "units_sold":       s.units_sold,
+            },
+        })
     return results
 
 
 # -----------------------------------------------------------------------------
 # 4. Produits sans coût défini
 # -----------------------------------------------------------------------------
-def _missing_cost_alert(req: InsightRequest) -> list[dict]:
+@detector("missing_cost_alert")
+def _missing_cost_alert(ctx: DetectionContext) -> list[dict]:
     results = []
-    for s in req.snapshots:
-        if not s.has_cost and s.units_sold > 0:
-            results.append({
-                "type":         "missing_cost_alert",
-                "product_id":   s.product_id,
-                "product_name": s.product_name,
-                "severity":     "warning",
-                "value":        s.units_sold,
-                "facts": {
-                    "units_sold": s.units_sold,
-                    "revenue":    round(s.revenue, 2),
-                },
-            })
+    for s in ctx.classes[MISSING_COST]:
+        results.append({
+            "type":         "missing_cost_alert",
+            "product_id":   s.product_id,
+            "product_name": s.product_name,
+            "severity":     "warning",
+            "value":        s.units_sold,
+            "facts": {
+                "units_sold": s.units_sold,
+                "revenue":    round(s.revenue, 2),
+            },
+        })
     return results
 
 
 # -----------------------------------------------------------------------------
 # 5. Impact des remboursements
 # -----------------------------------------------------------------------------
-def _refund_impact(req: InsightRequest) -> list[dict]:
-    refund_map: dict[str, float] = {}
-    revenue_map: dict[str, float] = {}
-
-    for item in req.order_items:
-        pid = item.product_id
-        refund_map[pid]  = refund_map.get(pid, 0.0)  + item.refunded_amount
-        revenue_map[pid] = revenue_map.get(pid, 0.0) + item.unit_price * item.quantity
-
-    name_map = {s.product_id: s.product_name for s in req.snapshots}
-
+@detector("refund_impact")
+def _refund_impact(ctx: DetectionContext) -> list[dict]:
     results = []
-    for pid, total_refund in refund_map.items():
-        revenue = revenue_map.get(pid, 0.0)
+    for pid, totals in ctx.products.items():
+        total_refund, revenue = totals.refund, totals.revenue
         if revenue <= 0 or total_refund <= 0:
             continue
         refund_rate = total_refund / revenue
@@ -143,7 +235,7 @@ def _refund_impact(req: InsightRequest) -> list[dict]:
             results.append({
                 "type":         "refund_impact",
                 "product_id":   pid,
-                "product_name": name_map.get(pid, pid),
+                "product_name": ctx.product_name(pid),
                 "severity":     "warning",
                 "value":        round(refund_rate * 100, 2),
                 "facts": {
@@ -158,26 +250,11 @@ def _refund_impact(req: InsightRequest) -> list[dict]:
 # -----------------------------------------------------------------------------
 # 6. Érosion par les remises
 # -----------------------------------------------------------------------------
-def _discount_erosion(req: InsightRequest) -> list[dict]:
-    discount_map: dict[str, float] = {}
-    catalogue_revenue_map: dict[str, float] = {}
-
-    for item in req.order_items:
-        if item.original_price <= 0:
-            continue
-        pid = item.product_id
-        catalogue_revenue = item.original_price * item.quantity
-        actual_revenue    = item.unit_price     * item.quantity
-        discount          = catalogue_revenue - actual_revenue
-
-        catalogue_revenue_map[pid] = catalogue_revenue_map.get(pid, 0.0) + catalogue_revenue
-        discount_map[pid]          = discount_map.get(pid, 0.0)          + discount
-
-    name_map = {s.product_id: s.product_name for s in req.snapshots}
-
+@detector("discount_erosion")
+def _discount_erosion(ctx: DetectionContext) -> list[dict]:
     results = []
-    for pid, total_discount in discount_map.items():
-        catalogue_rev = catalogue_revenue_map.get(pid, 0.0)
+    for pid, totals in ctx.discounted.items():
+        total_discount, catalogue_rev = totals.discount, totals.catalogue_revenue
         if catalogue_rev <= 0 or total_discount <= 0:
             continue
         discount_rate = total_discount / catalogue_rev
@@ -185,7 +262,7 @@ def _discount_erosion(req: InsightRequest) -> list[dict]:
             results.append({
                 "type":         "discount_erosion",
                 "product_id":   pid,
-                "product_name": name_map.get(pid, pid),
+                "product_name": ctx.product_name(pid),
                 "severity":     "info",
                 "value":        round(discount_rate * 100, 2),
                 "facts": {
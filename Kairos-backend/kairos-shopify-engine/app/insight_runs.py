@@ -0,0 +1,174 @@
+"""
+Insights "template d'abord" : rendu immédiat puis textes LLM en tâche de fond.
+
+/insights/compute avec template_first=true répond sans attendre OpenAI : textes en
+cache quand il y en a, templates (_fallback) sinon, plus un run_id et une révision.
+La rédaction LLM des faits restants tourne ensuite dans la boucle du worker ; chaque
+complétion qui arrive remplace ses insights et incrémente la révision du run.
+Node relit GET /insights/runs/{run_id}?since=<révision> : seuls les insights modifiés
+depuis cette révision sont renvoyés, complete=true quand il n'y a plus rien à attendre.
+
+Les runs vivent dans un SQLite partagé (mode WAL) : le polling peut tomber sur un autre
+worker uvicorn que celui qui rédige. Ils expirent après INSIGHT_RUN_TTL_S.
+
+SHOPIFY_ENGINE_INSIGHT_RUNS_DB     : fichier SQLite
+SHOPIFY_ENGINE_INSIGHT_RUN_TTL_S   : durée de vie d'un run (défaut 1 h)
+SHOPIFY_ENGINE_INSIGHT_UPGRADE_BUDGET_S : budget LLM de la rédaction de fond d'un run
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from app.insight_writer import upgrade_insights
+from app.llm_deadline import deadline_scope
+
+INSIGHT_RUNS_DB = Path(os.getenv(
+    "SHOPIFY_ENGINE_INSIGHT_RUNS_DB", str(Path(__file__).resolve().parent.parent / "data" / "insight_runs.sqlite")
+))
+INSIGHT_RUN_TTL_S = float(os.getenv("SHOPIFY_ENGINE_INSIGHT_RUN_TTL_S", "3600"))
+# la rédaction de fond n'hérite pas du budget de la requête qui l'a lancée
+INSIGHT_UPGRADE_BUDGET_S = float(os.getenv("SHOPIFY_ENGINE_INSIGHT_UPGRADE_BUDGET_S", "60"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS insight_runs (
+    run_id      TEXT PRIMARY KEY,
+    business_id INTEGER NOT NULL,
+    revision    INTEGER NOT NULL,
+    complete    INTEGER NOT NULL,
+    expires_at  REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS insight_run_items (
+    run_id   TEXT NOT NULL,
+    idx      INTEGER NOT NULL,
+    revision INTEGER NOT NULL,
+    insight  TEXT NOT NULL,
+    PRIMARY KEY (run_id, idx)
+) WITHOUT ROWID;
+"""
+
+
+class InsightRunStore:
+    def __init__(self, path: Path = INSIGHT_RUNS_DB, ttl_s: float = INSIGHT_RUN_TTL_S) -> None:
+        self.path = path
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def create(self, business_id: int, insights: list[dict]) -> dict:
+        """Enregistre le rendu initial (révision 0) ; complete si aucun insight n'attend le LLM."""
+        run_id = uuid.uuid4().hex
+        complete = all(i["source"] == "llm" for i in insights)
+        now = time.time()
+        with self._lock:
+            conn = self.conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._purge(now)
+                conn.execute(
+                    "INSERT INTO insight_runs (run_id, business_id, revision, complete, expires_at) VALUES (?, ?, 0, ?, ?)",
+                    (run_id, business_id, int(complete), now + self.ttl_s),
+                )
+                conn.executemany(
+                    "INSERT INTO insight_run_items (run_id, idx, revision, insight) VALUES (?, ?, 0, ?)",
+                    [(run_id, i, json.dumps(insight)) for i, insight in enumerate(insights)],
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return {"run_id": run_id, "revision": 0, "complete": complete}
+
+    def apply(self, run_id: str, updates: list[tuple[int, dict]]) -> int:
+        """Remplace des insights du run ; retourne la nouvelle révision."""
+        with self._lock:
+            conn = self.conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("UPDATE insight_runs SET revision = revision + 1 WHERE run_id = ?", (run_id,))
+                revision = conn.execute(
+                    "SELECT revision FROM insight_runs WHERE run_id = ?", (run_id,)
+                ).fetchone()[0]
+                conn.executemany(
+                    "UPDATE insight_run_items SET revision = ?, insight = ? WHERE run_id = ? AND idx = ?",
+                    [(revision, json.dumps(insight), run_id, i) for i, insight in updates],
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return revision
+
+    def finish(self, run_id: str) -> None:
+        with self._lock:
+            self.conn.execute("UPDATE insight_runs SET complete = 1 WHERE run_id = ?", (run_id,))
+
+    def get(self, run_id: str, since: int = -1) -> dict | None:
+        """État du run et insights modifiés après la révision `since` (tous par défaut) ; None si inconnu ou expiré."""
+        with self._lock:
+            run = self.conn.execute(
+                "SELECT business_id, revision, complete, expires_at FROM insight_runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+            if run is None or run[3] <= time.time():
+                return None
+            rows = self.conn.execute(
+                "SELECT idx, insight FROM insight_run_items WHERE run_id = ? AND revision > ? ORDER BY idx",
+                (run_id, since),
+            ).fetchall()
+        return {
+            "run_id": run_id,
+            "business_id": run[0],
+            "revision": run[1],
+            "complete": bool(run[2]),
+            "insights": [{"index": idx, **json.loads(insight)} for idx, insight in rows],
+        }
+
+    def _purge(self, now: float) -> None:
+        expired = [r[0] for r in self.conn.execute("SELECT run_id FROM insight_runs WHERE expires_at <= ?", (now,))]
+        if expired:
+            self.conn.executemany("DELETE FROM insight_run_items WHERE run_id = ?", [(r,) for r in expired])
+            self.conn.executemany("DELETE FROM insight_runs WHERE run_id = ?", [(r,) for r in expired])
+
+
+insight_runs = InsightRunStore()
+
+# tâches de rédaction en cours (référence forte : une tâche asyncio orpheline peut être collectée)
+_upgrades: set[asyncio.Task] = set()
+
+
+def start_upgrade(run_id: str, raw_facts_list: list[dict], pending: list[int], business_id: int) -> None:
+    task = asyncio.create_task(_upgrade(run_id, raw_facts_list, pending, business_id))
+    _upgrades.add(task)
+    task.add_done_callback(_upgrades.discard)
+
+
+async def _upgrade(run_id: str, raw_facts_list: list[dict], pending: list[int], business_id: int) -> None:
+    try:
+        with deadline_scope(INSIGHT_UPGRADE_BUDGET_S):
+            async for written in upgrade_insights(raw_facts_list, pending, business_id):
+                updates = [(i, {**insight, "source": "llm"}) for i, insight in written]
+                await asyncio.to_thread(insight_runs.apply, run_id, updates)
+    finally:
+        # échecs LLM : les templates restent, le run est tout de même terminé
+        await asyncio.shield(asyncio.to_thread(insight_runs.finish, run_id))
+
+
+def cancel_upgrades() -> None:
+    for task in list(_upgrades):
+        task.cancel()
@@ -4,21 +4,39 @@ Insight Writer — Hybrid layer between detection and storage.
 Flow:
   raw_facts (from insight_engine.py)
     -> _build_prompt(facts)
-    -> OpenAI -> { title, message, action, next_step }
-    -> fallback if LLM fails -> _fallback(facts)
+    -> insight_cache (LRU + SQLite) or OpenAI -> { title, message, action, next_step }
+    -> fallback if LLM fails, or llm_breaker is open / shedding -> _fallback(facts)
     -> returns final enriched insight dict
 """
 
+import asyncio
 import json
 import os
-from openai import OpenAI
+
 from dotenv import load_dotenv
 
-load_dotenv()
+from app.insight_cache import cache_key, insight_cache
+from app.llm_deadline import call_llm
+from app.llm_limiter import llm_limiter
+from app.openai_client import get_async_client
 
-_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+load_dotenv()
 
-_SYSTEM_PROMPT = """\
+_MODEL = "gpt-4o-mini"
+# Bump whenever _SYSTEM_PROMPT, _build_prompt or the call parameters change:
+# cached texts from the previous version are no longer served.
+PROMPT_VERSION = "2"
+
+# Batch writer: facts are spread over up to BATCH_CHUNKS parallel completions per run,
+# each kept under these budgets (estimated at ~4 characters per token). A completion
+# generates its entries one after another, so balanced chunks beat one huge call.
+# The process-wide cap on completions in flight is llm_limiter's.
+BATCH_INPUT_TOKENS = int(os.getenv("SHOPIFY_ENGINE_INSIGHT_BATCH_INPUT_TOKENS", "6000"))
+BATCH_OUTPUT_TOKENS = int(os.getenv("SHOPIFY_ENGINE_INSIGHT_BATCH_OUTPUT_TOKENS", "4000"))
+BATCH_CHUNKS = int(os.getenv("SHOPIFY_ENGINE_INSIGHT_BATCH_CHUNKS", "8"))
+_OUTPUT_TOKENS_PER_FACT = 180
+
+_RULES = """\
 You are Kairos, a profit intelligence copilot for Shopify store owners.
 Your job is to write short, direct, premium business insights.
 
@@ -29,40 +47,95 @@ Rules:
 - next_step: exactly 1 sentence, what to do AFTER the action (the follow-up within 7 days)
 - Language: English
 - Tone: direct, premium, no fluff
+"""
 
+_SYSTEM_PROMPT = _RULES + """
 Respond with valid JSON only:
 {"title": "...", "message": "...", "action": "...", "next_step": "..."}
 """
 
+_BATCH_SYSTEM_PROMPT = _RULES + """
+You receive several numbered facts. Write one insight per fact, following its own instructions.
+Respond with valid JSON only, one entry per fact, using the fact number as "index":
+{"insights": [{"index": 0, "title": "...", "message": "...", "action": "...", "next_step": "..."}]}
+"""
+
+
+async def write_insights(raw_facts_list: list[dict], business_id: object = None) -> list[dict]:
+    """
+    Insights for raw_facts_list, same order.
+    Cache misses are packed into a few concurrent completions (one JSON array entry
+    per fact); a missing or invalid entry falls back to _fallback for that fact only.
+    Every completion goes through llm_limiter (process-wide concurrency + TPM share
+    of business_id).
+    """
+    texts = await _cached_texts(raw_facts_list)
+    pending = [i for i, text in enumerate(texts) if text is None]
+    async for written in _write_missing(raw_facts_list, pending, business_id):
+        for i, text in written:
+            texts[i] = text
+    return [_enriched(f, text) for f, text in zip(raw_facts_list, texts)]
+
 
-def write_insight(raw_facts: dict) -> dict:
+async def template_insights(raw_facts_list: list[dict]) -> tuple[list[dict], list[int]]:
     """
-    Takes raw_facts produced by insight_engine.py.
-    Returns the full enriched insight dict ready for storage.
+    Immediate render, no LLM call: cached texts where available, _fallback elsewhere.
+    Returns (insights, indexes still rendered from templates).
     """
+    texts = await _cached_texts(raw_facts_list)
+    return (
+        [_enriched(f, text) for f, text in zip(raw_facts_list, texts)],
+        [i for i, text in enumerate(texts) if text is None],
+    )
+
+
+async def upgrade_insights(raw_facts_list: list[dict], pending: list[int], business_id: object = None):
+    """
+    Writes the LLM text of the pending facts. Async generator: yields
+    [(index, enriched insight)] each time a completion lands (LLM successes only).
+    """
+    async for written in _write_missing(raw_facts_list, pending, business_id):
+        yield [(i, _enriched(raw_facts_list[i], text)) for i, text in written]
+
+
+async def _cached_texts(raw_facts_list: list[dict]) -> list[dict | None]:
+    keys = [_key(f) for f in raw_facts_list]
+    # SQLite lookups off the event loop
+    return await asyncio.to_thread(lambda: [insight_cache.get(key) for key in keys])
+
+
+async def _write_missing(raw_facts_list: list[dict], pending: list[int], business_id: object):
+    """Chunks the pending facts, runs the completions concurrently and yields [(index, text)] per landed chunk."""
+    prompts = {i: _build_prompt(raw_facts_list[i]) for i in pending}
+
+    async def run(chunk: list[int]) -> list[tuple[int, dict]]:
+        texts = await _generate_chunk([raw_facts_list[i] for i in chunk], [prompts[i] for i in chunk], business_id)
+        written = [(i, text) for i, text in zip(chunk, texts) if text is not None]
+        if written:
+            await asyncio.to_thread(lambda: [insight_cache.put(_key(raw_facts_list[i]), text) for i, text in written])
+        return written
+
+    tasks = [asyncio.ensure_future(run(chunk)) for chunk in _chunks(pending, prompts)]
     try:
-        prompt = _build_prompt(raw_facts)
-        response = _client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": _SYSTEM_PROMPT},
-                {"role": "user",   "content": prompt},
-            ],
-            temperature=0.4,
-            max_tokens=180,
-        )
-        raw = response.choices[0].message.content or ""
-        parsed = json.loads(raw)
-        title     = str(parsed.get("title",     "")).strip()
-        message   = str(parsed.get("message",   "")).strip()
-        action    = str(parsed.get("action",    "")).strip()
-        next_step = str(parsed.get("next_step", "")).strip()
+        for landed in asyncio.as_completed(tasks):
+            written = await landed
+            if written:
+                yield written
+    finally:
+        # consumer gone (cancelled run): no orphan completions
+        for task in tasks:
+            task.cancel()
 
-        if not title or not message or not action:
-            raise ValueError("Incomplete LLM response")
 
-    except Exception:
+def _key(raw_facts: dict) -> str:
+    return cache_key(raw_facts, f"{PROMPT_VERSION}:{_MODEL}")
+
+
+def _enriched(raw_facts: dict, text: dict | None) -> dict:
+    if text is None:
         title, message, action, next_step = _fallback(raw_facts)
+    else:
+        title, message, action, next_step = text["title"], text["message"], text["action"], text["next_step"]
 
     return {
         "type":        raw_facts["type"],
@@ -76,6 +149,106 @@ def write_insight(raw_facts: dict) -> dict:
     }
 
 
+def _completion_kwargs(prompts: list[str]) -> dict:
+    """One fact keeps the original single-fact prompt; several are numbered in one message."""
+    if len(prompts) == 1:
+        return {
+            "model": _MODEL,
+            "messages": [
+                {"role": "system", "content": _SYSTEM_PROMPT},
+                {"role": "user",   "content": prompts[0]},
+            ],
+            "temperature": 0.4,
+            "max_tokens": _OUTPUT_TOKENS_PER_FACT,
+        }
+    return {
+        "model": _MODEL,
+        "messages": [
+            {"role": "system", "content": _BATCH_SYSTEM_PROMPT},
+            {"role": "user",   "content": "\n\n".join(f"[{i}]\n{prompt}" for i, prompt in enumerate(prompts))},
+        ],
+        "temperature": 0.4,
+        "max_tokens": _OUTPUT_TOKENS_PER_FACT * len(prompts),
+        "response_format": {"type": "json_object"},
+    }
+
+
+def _parse_completion(content: str | None, n: int) -> list[dict | None]:
+    """Completion text -> one text (or None) per fact, in order."""
+    parsed = json.loads(content or "")
+    if n == 1:
+        return [_parse_text(parsed)]
+
+    entries = parsed.get("insights") if isinstance(parsed, dict) else None
+    texts: list[dict | None] = [None] * n
+    for entry in entries if isinstance(entries, list) else []:
+        index = entry.get("index") if isinstance(entry, dict) else None
+        # Unknown or duplicate indexes are ignored
+        if isinstance(index, int) and 0 <= index < n and texts[index] is None:
+            texts[index] = _parse_text(entry)
+    return texts
+
+
+async def _generate_chunk(facts: list[dict], prompts: list[str], business_id: object) -> list[dict | None]:
+    """
+    One async completion for a chunk of facts, within the request deadline (llm_deadline:
+    per-call timeout, hedge past p90, one retry) and behind llm_breaker. Budget exhausted,
+    every attempt failed, breaker open or call shed by llm_limiter -> None for the whole chunk.
+    """
+    kwargs = _completion_kwargs(prompts)
+    estimated = sum(_estimate_tokens(m["content"]) for m in kwargs["messages"]) + kwargs["max_tokens"]
+
+    def slot():
+        return llm_limiter.slot(business_id, estimated)
+
+    async def attempt(timeout: float, lease) -> list[dict | None]:
+        # Runs once call_llm holds the limiter slot: timeout and latency exclude the queue
+        response = await get_async_client().chat.completions.create(**kwargs, timeout=timeout)
+        lease.used(getattr(getattr(response, "usage", None), "total_tokens", None))
+        # Invalid JSON raises here, so the attempt counts as failed and may be retried
+        return _parse_completion(response.choices[0].message.content, len(facts))
+
+    # Breaker open or limiter queue past the shedding threshold -> templates right away
+    texts = await call_llm("insights" if len(facts) == 1 else "insights_batch", attempt, slot)
+    return texts if texts is not None else [None] * len(facts)
+
+
+def _parse_text(parsed: dict) -> dict | None:
+    if not isinstance(parsed, dict):
+        return None
+    title     = str(parsed.get("title",     "")).strip()
+    message   = str(parsed.get("message",   "")).strip()
+    action    = str(parsed.get("action",    "")).strip()
+    next_step = str(parsed.get("next_step", "")).strip()
+
+    # Incomplete LLM response
+    if not title or not message or not action:
+        return None
+    return {"title": title, "message": message, "action": action, "next_step": next_step}
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def _chunks(pending: list[int], prompts: dict[int, str]) -> list[list[int]]:
+    """Greedy split into up to BATCH_CHUNKS balanced chunks that each fit the token budgets."""
+    input_budget = BATCH_INPUT_TOKENS - _estimate_tokens(_BATCH_SYSTEM_PROMPT)
+    max_facts = max(BATCH_OUTPUT_TOKENS // _OUTPUT_TOKENS_PER_FACT, 1)
+    max_facts = min(max_facts, -(-len(pending) // max(BATCH_CHUNKS, 1)))
+    chunks, current, tokens = [], [], 0
+    for i in pending:
+        cost = _estimate_tokens(prompts[i]) + 4  # "[i]" header
+        if current and (tokens + cost > input_budget or len(current) >= max_facts):
+            chunks.append(current)
+            current, tokens = [], 0
+        current.append(i)
+        tokens += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
 # -----------------------------------------------------------------------------
 # Prompt builder — one prompt format per insight type
 # -----------------------------------------------------------------------------
@@ -0,0 +1,176 @@
+"""
+Disjoncteur des appels LLM du process (insights et chat).
+
+Quand OpenAI se dégrade, chaque appel attendait son propre échec avant de se rabattre
+sur son texte de repli ; sous charge, toute la boucle du worker s'encombrait. Le
+disjoncteur est partagé par tous les appels (call_llm) :
+- fermé : les appels passent ; chaque issue (succès, erreur/timeout, durée) entre dans
+  une fenêtre glissante de BREAKER_WINDOW_S
+- ouvert dès BREAKER_CONSECUTIVE échecs d'affilée, ou quand la fenêtre compte au moins
+  BREAKER_MIN_CALLS appels dont BREAKER_FAILURE_RATE en échec (un appel réussi mais plus
+  lent que BREAKER_SLOW_CALL_S compte comme un échec)
+- ouvert : aucun appel, les appelants servent leur repli déterministe (templates des
+  insights, réponse dégradée du chat) sans attendre
+- après BREAKER_OPEN_S : semi-ouvert, BREAKER_PROBES appels d'essai ; tous réussis ->
+  fermé, un seul en échec -> ouvert à nouveau
+
+Le délestage sous charge est celui de llm_limiter (Overloaded) : un appel délesté ne
+compte pas comme un échec d'OpenAI.
+
+Les changements d'état sont comptés et les derniers gardés pour /metrics.
+
+SHOPIFY_ENGINE_LLM_BREAKER            : 0 = disjoncteur désactivé
+SHOPIFY_ENGINE_LLM_BREAKER_WINDOW_S   : fenêtre glissante (défaut 30 s)
+SHOPIFY_ENGINE_LLM_BREAKER_MIN_CALLS  : appels minimum dans la fenêtre avant de juger le taux
+SHOPIFY_ENGINE_LLM_BREAKER_FAILURE_RATE : taux d'échec qui ouvre (défaut 0.5)
+SHOPIFY_ENGINE_LLM_BREAKER_CONSECUTIVE  : échecs d'affilée qui ouvrent (défaut 5)
+SHOPIFY_ENGINE_LLM_BREAKER_SLOW_CALL_S  : au-delà, un appel réussi compte comme un échec
+SHOPIFY_ENGINE_LLM_BREAKER_OPEN_S     : durée d'ouverture avant les appels d'essai
+SHOPIFY_ENGINE_LLM_BREAKER_PROBES     : appels d'essai en semi-ouvert
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+BREAKER_ENABLED = os.getenv("SHOPIFY_ENGINE_LLM_BREAKER", "1") == "1"
+BREAKER_WINDOW_S = float(os.getenv("SHOPIFY_ENGINE_LLM_BREAKER_WINDOW_S", "30"))
+BREAKER_MIN_CALLS = int(os.getenv("SHOPIFY_ENGINE_LLM_BREAKER_MIN_CALLS", "10"))
+BREAKER_FAILURE_RATE = float(os.getenv("SHOPIFY_ENGINE_LLM_BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_CONSECUTIVE = int(os.getenv("SHOPIFY_ENGINE_LLM_BREAKER_CONSECUTIVE", "5"))
+BREAKER_SLOW_CALL_S = float(os.getenv("SHOPIFY_ENGINE_LLM_BREAKER_SLOW_CALL_S", "10"))
+BREAKER_OPEN_S = float(os.getenv("SHOPIFY_ENGINE_LLM_BREAKER_OPEN_S", "15"))
+BREAKER_PROBES = int(os.getenv("SHOPIFY_ENGINE_LLM_BREAKER_PROBES", "2"))
+TRANSITIONS_KEPT = 20
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        enabled: bool = BREAKER_ENABLED,
+        window_s: float = BREAKER_WINDOW_S,
+        min_calls: int = BREAKER_MIN_CALLS,
+        failure_rate: float = BREAKER_FAILURE_RATE,
+        consecutive: int = BREAKER_CONSECUTIVE,
+        slow_call_s: float = BREAKER_SLOW_CALL_S,
+        open_s: float = BREAKER_OPEN_S,
+        probes: int = BREAKER_PROBES,
+    ) -> None:
+        self.enabled = enabled
+        self.window_s = window_s
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.consecutive = consecutive
+        self.slow_call_s = slow_call_s
+        self.open_s = open_s
+        self.probes = probes
+        # /metrics lit depuis le threadpool pendant que la boucle enregistre les issues
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._changed_at = time.monotonic()
+        self._generation = 0
+        # (time.monotonic, échec, durée) des appels terminés
+        self._window: deque[tuple[float, bool, float]] = deque()
+        self._failures_in_row = 0
+        self._probes_in_flight = 0
+        self._probes_ok = 0
+        self.counters = {"admitted": 0, "rejected": 0, "failures": 0, "slow": 0}
+        self.transitions: dict[str, int] = {}
+        self._recent: deque[dict] = deque(maxlen=TRANSITIONS_KEPT)
+
+    def admit(self) -> tuple[int, bool] | None:
+        """
+        Ticket (génération, appel d'essai) si l'appel peut partir, None sinon ; l'appelant
+        rapporte ensuite son issue avec record(ticket, ...).
+        """
+        if not self.enabled:
+            return (self._generation, False)
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._changed_at >= self.open_s:
+                self._move(HALF_OPEN, "open timeout")
+            if self.state == CLOSED:
+                self.counters["admitted"] += 1
+                return (self._generation, False)
+            if self.state == HALF_OPEN and self._probes_in_flight < self.probes:
+                self._probes_in_flight += 1
+                self.counters["admitted"] += 1
+                return (self._generation, True)
+            self.counters["rejected"] += 1
+            return None
+
+    def record(self, ticket: tuple[int, bool], ok: bool | None, duration_s: float) -> None:
+        """Issue d'un appel admis : True, False (erreur, timeout), None (abandonné, ne compte pas)."""
+        if not self.enabled:
+            return
+        generation, probe = ticket
+        with self._lock:
+            # un appel parti avant le dernier changement d'état ne décide plus de rien
+            current = generation == self._generation
+            if probe and current:
+                self._probes_in_flight -= 1
+            if ok is None:
+                return
+            slow = ok and duration_s > self.slow_call_s
+            failed = not ok or slow
+            self.counters["failures"] += int(not ok)
+            self.counters["slow"] += int(slow)
+            if not current:
+                return
+            now = time.monotonic()
+            self._window.append((now, failed, duration_s))
+            self._failures_in_row = self._failures_in_row + 1 if failed else 0
+
+            if probe:
+                if failed:
+                    self._move(OPEN, "probe failed")
+                else:
+                    self._probes_ok += 1
+                    if self._probes_ok >= self.probes:
+                        self._move(CLOSED, "probes succeeded")
+            elif self.state == CLOSED:
+                if self._failures_in_row >= self.consecutive:
+                    self._move(OPEN, f"{self._failures_in_row} failures in a row")
+                else:
+                    calls, failures = self._trim(now)
+                    if calls >= self.min_calls and failures / calls >= self.failure_rate:
+                        self._move(OPEN, f"failure rate {failures / calls:.0%} over {calls} calls")
+
+    def _trim(self, now: float) -> tuple[int, int]:
+        while self._window and self._window[0][0] < now - self.window_s:
+            self._window.popleft()
+        return len(self._window), sum(1 for _, failed, _ in self._window if failed)
+
+    def _move(self, state: str, reason: str) -> None:
+        key = f"{self.state}->{state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        self._recent.append({"from": self.state, "to": state, "at": time.time(), "reason": reason})
+        self.state = state
+        self._generation += 1
+        self._changed_at = time.monotonic()
+        self._probes_in_flight = self._probes_ok = 0
+        if state == CLOSED:
+            # nouveau départ : les échecs d'avant l'ouverture ne rouvrent pas le disjoncteur
+            self._window.clear()
+            self._failures_in_row = 0
+
+    def metrics(self) -> dict:
+        with self._lock:
+            calls, failures = self._trim(time.monotonic())
+            durations = sorted(d for _, _, d in self._window)
+            return {
+                "enabled": self.enabled,
+                "state": self.state,
+                "state_for_s": round(time.monotonic() - self._changed_at, 1),
+                "window_calls": calls,
+                "window_failure_rate": round(failures / calls, 3) if calls else None,
+                "window_p90_ms": round(durations[min(int(0.9 * calls), calls - 1)] * 1000, 1) if calls else None,
+                **self.counters,
+                "transitions": dict(self.transitions),
+                "recent_transitions": list(self._recent),
+            }
+
+
+llm_breaker = CircuitBreaker()
@@ -0,0 +1,232 @@
+"""
+Budget de temps des appels LLM : deadline par requête, timeout par appel, requête doublée.
+
+La route ouvre un deadline_scope(budget) ; la deadline suit la requête jusque dans
+chaque appel (ContextVar, copiée dans les tâches asyncio et asyncio.to_thread).
+call_llm(name, attempt, slot) :
+- ne lance pas d'appel s'il reste moins de MIN_CALL_S (-> None, l'appelant se rabat
+  sur son texte de repli)
+- slot() : place à obtenir avant chaque tentative (llm_limiter) ; l'attente dans sa file
+  n'est ni chronométrée ni comptée dans le timeout
+- timeout de l'appel = min(LLM_CALL_TIMEOUT_S, temps restant), calculé une fois la
+  place obtenue, appliqué au SDK et par asyncio.wait_for
+- requête doublée (hedge) : si la tentative en cours dépasse, depuis l'obtention de sa
+  place, le p90 observé pour ce type d'appel, une seconde part et la première réponse
+  valide gagne ; pas de hedge pour une tentative encore dans la file
+- une erreur rapide est retentée une fois si le budget le permet
+- disjoncteur ouvert : pas d'appel, None tout de suite ; l'issue de chaque appel
+  alimente le disjoncteur (app/llm_breaker.py), avec la durée de l'appel amont ; seules
+  les tentatives parties chez OpenAI comptent : un budget épuisé dans la file du
+  limiteur est rapporté comme abandonné (None), pas comme un échec
+- appel délesté par llm_limiter (Overloaded) : None, sans nouvelle tentative
+Le p90 est calculé sur la durée de l'appel amont (hors file du limiteur) des
+LATENCY_WINDOW dernières réponses réussies du process ; pas de hedge tant qu'il y a
+moins de MIN_SAMPLES mesures.
+
+SHOPIFY_ENGINE_LLM_CALL_TIMEOUT_S   : plafond d'un appel, quel que soit le budget
+SHOPIFY_ENGINE_LLM_HEDGE            : 0 = pas de requête doublée
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import AbstractAsyncContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, TypeVar
+
+from app.llm_breaker import llm_breaker
+from app.llm_limiter import Overloaded
+
+LLM_CALL_TIMEOUT_S = float(os.getenv("SHOPIFY_ENGINE_LLM_CALL_TIMEOUT_S", "20"))
+HEDGE_ENABLED = os.getenv("SHOPIFY_ENGINE_LLM_HEDGE", "1") == "1"
+MIN_CALL_S = 0.5
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 20
+
+T = TypeVar("T")
+
+# échéance (time.monotonic) de la requête en cours ; None = pas de budget
+_deadline: ContextVar[float | None] = ContextVar("llm_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(budget_s: float):
+    """Budget de la requête ; un scope imbriqué (tâche de fond) remplace celui du parent."""
+    token = _deadline.set(time.monotonic() + budget_s)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float:
+    deadline = _deadline.get()
+    return LLM_CALL_TIMEOUT_S if deadline is None else deadline - time.monotonic()
+
+
+def call_timeout() -> float:
+    """Timeout du prochain appel : plafond par appel borné par le budget restant."""
+    return max(min(LLM_CALL_TIMEOUT_S, remaining()), 0.0)
+
+
+class CallStats:
+    def __init__(self) -> None:
+        self.latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.counters = {
+            "calls": 0, "ok": 0, "timeouts": 0, "errors": 0, "skipped": 0, "shed": 0, "rejected": 0,
+            "queue_expired": 0,
+            "hedges": 0, "hedge_wins": 0,
+        }
+
+    def quantile(self, q: float) -> float | None:
+        if len(self.latencies) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def snapshot(self) -> dict:
+        p50, p90 = self.quantile(0.5), self.quantile(0.9)
+        return {
+            **self.counters,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p90_ms": round(p90 * 1000, 1) if p90 is not None else None,
+        }
+
+
+_stats: dict[str, CallStats] = {}
+
+
+class _QueueExpired(Exception):
+    """Budget épuisé pendant l'attente d'une place : la tentative ne part pas."""
+
+
+def _stats_for(name: str) -> CallStats:
+    stats = _stats.get(name)
+    if stats is None:
+        stats = _stats[name] = CallStats()
+    return stats
+
+
+async def call_llm(
+    name: str,
+    attempt: Callable[[float, Any], Awaitable[T]],
+    slot: Callable[[], AbstractAsyncContextManager] | None = None,
+) -> T | None:
+    """
+    attempt(timeout_s, lease) lance un appel, une fois la place slot() obtenue (lease =
+    valeur de son `async with`, None sans slot) ; la première tentative réussie gagne.
+    None si le budget est épuisé, si toutes les tentatives échouent, si le disjoncteur
+    est ouvert ou si l'appel est délesté.
+    """
+    stats = _stats_for(name)
+    stats.counters["calls"] += 1
+    if remaining() < MIN_CALL_S:
+        stats.counters["skipped"] += 1
+        return None
+    ticket = llm_breaker.admit()
+    if ticket is None:
+        stats.counters["rejected"] += 1
+        return None
+
+    loop = asyncio.get_running_loop()
+
+    async def timed(hedge: bool, granted: asyncio.Future) -> tuple[T, bool, float]:
+        async with (slot() if slot is not None else nullcontext()) as lease:
+            # chrono et timeout partent de la place obtenue : la file du limiteur n'est pas OpenAI
+            timeout = call_timeout()
+            if timeout < MIN_CALL_S:
+                raise _QueueExpired()
+            t0 = time.monotonic()
+            granted.set_result(t0)
+            result = await asyncio.wait_for(attempt(timeout, lease), timeout)
+            elapsed = time.monotonic() - t0
+        stats.latencies.append(elapsed)
+        return result, hedge, elapsed
+
+    # tentative -> instant (futur) où elle obtient sa place
+    grants: dict[asyncio.Future, asyncio.Future] = {}
+
+    def start(hedge: bool) -> tuple[asyncio.Future, asyncio.Future]:
+        granted = loop.create_future()
+        task = asyncio.ensure_future(timed(hedge, granted))
+        grants[task] = granted
+        return task, granted
+
+    # issue rapportée au disjoncteur ; None = appel abandonné (requête annulée)
+    ok: bool | None = None
+    # tentative que le hedge surveille, et l'instant où elle a obtenu sa place
+    current, granted = start(False)
+    tasks = {current}
+    hedge_at = stats.quantile(0.9) if HEDGE_ENABLED else None
+    retried = hedged = shed = False
+    failures = 0
+    try:
+        while tasks:
+            wait_s = remaining()
+            watch = set(tasks)
+            if hedge_at is not None and not hedged and current in tasks:
+                if granted.done():
+                    wait_s = min(wait_s, granted.result() + hedge_at - time.monotonic())
+                else:
+                    # encore dans la file : réveil quand la place est obtenue
+                    watch.add(granted)
+            done, _ = await asyncio.wait(watch, timeout=max(wait_s, 0.0), return_when=asyncio.FIRST_COMPLETED)
+            done.discard(granted)
+            tasks -= done
+
+            for task in done:
+                if task.exception() is None:
+                    result, from_hedge, upstream_s = task.result()
+                    stats.counters["ok"] += 1
+                    stats.counters["hedge_wins"] += int(from_hedge)
+                    ok = True
+                    return result
+                if isinstance(task.exception(), _QueueExpired):
+                    stats.counters["queue_expired"] += 1
+                elif isinstance(task.exception(), Overloaded):
+                    stats.counters["shed"] += 1
+                    shed = True
+                elif isinstance(task.exception(), asyncio.TimeoutError):
+                    stats.counters["timeouts"] += 1
+                    failures += 1
+                else:
+                    stats.counters["errors"] += 1
+                    failures += 1
+
+            if remaining() < MIN_CALL_S:
+                break
+            if (
+                not done and not hedged and hedge_at is not None and current in tasks and granted.done()
+                and time.monotonic() - granted.result() >= hedge_at
+            ):
+                # tentative plus lente que le p90 depuis l'obtention de sa place : on double
+                hedged = True
+                stats.counters["hedges"] += 1
+                tasks.add(start(True)[0])
+            elif done and not tasks and not retried and not shed:
+                # échec rapide (erreur réseau, 5xx, réponse invalide) : une nouvelle tentative
+                retried = True
+                current, granted = start(False)
+                tasks.add(current)
+        if any(grants[task].done() for task in tasks):
+            # parti chez OpenAI et sans réponse à l'échéance
+            stats.counters["timeouts"] += 1
+            failures += 1
+        elif tasks:
+            stats.counters["queue_expired"] += 1
+        # délesté ou budget épuisé dans la file, sans autre échec : rien à reprocher à OpenAI
+        ok = False if failures else None
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+        if ok is not True:
+            # durée amont : depuis la première place obtenue (0 si aucune tentative n'est partie)
+            sent = [g.result() for g in grants.values() if g.done()]
+            upstream_s = time.monotonic() - min(sent) if sent else 0.0
+        llm_breaker.record(ticket, ok, upstream_s)
+
+
+def metrics() -> dict:
+    return {name: stats.snapshot() for name, stats in _stats.items()}
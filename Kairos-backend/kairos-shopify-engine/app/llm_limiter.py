@@ -0,0 +1,161 @@
+"""
+Limiteur des appels LLM du process (enrichissement des insights, asyncio).
+
+Deux bornes, partagées par toutes les requêtes du worker :
+- au plus LLM_CONCURRENCY complétions en vol
+- un seau de tokens par minute (LLM_TPM), rempli en continu
+Une complétion part quand les deux le permettent. Les attentes sont servies à tour de
+rôle par business_id (une autorisation par business et par tour) : un marchand avec
+200 faits ne fait pas attendre celui qui en a 2, que la limite atteinte soit la
+concurrence ou le TPM.
+
+Le coût d'un appel est estimé avant l'envoi (prompt + max_tokens), puis corrigé avec
+usage.total_tokens quand la réponse arrive (les tokens non consommés sont rendus).
+
+Délestage : un appel qui devrait attendre derrière LLM_SHED_QUEUE autres lève
+Overloaded tout de suite (call_llm -> texte de repli, sans nouvelle tentative) au lieu
+d'allonger une file que le budget des requêtes ne laissera pas écouler.
+
+SHOPIFY_ENGINE_LLM_CONCURRENCY : complétions simultanées max par worker
+SHOPIFY_ENGINE_LLM_TPM         : tokens par minute (limite du compte OpenAI / nb de workers)
+SHOPIFY_ENGINE_LLM_SHED_QUEUE  : attentes max avant délestage (0 = pas de délestage)
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+LLM_CONCURRENCY = int(os.getenv("SHOPIFY_ENGINE_LLM_CONCURRENCY", "16"))
+LLM_TPM = int(os.getenv("SHOPIFY_ENGINE_LLM_TPM", "200000"))
+LLM_SHED_QUEUE = int(os.getenv("SHOPIFY_ENGINE_LLM_SHED_QUEUE", "64"))
+
+
+class Overloaded(Exception):
+    """File d'attente du limiteur pleine : l'appel est délesté."""
+
+
+class Lease:
+    def __init__(self, estimated_tokens: float) -> None:
+        self.estimated_tokens = estimated_tokens
+        self.used_tokens: int | None = None
+
+    def used(self, tokens: int | None) -> None:
+        self.used_tokens = tokens
+
+
+class LLMLimiter:
+    def __init__(
+        self, concurrency: int = LLM_CONCURRENCY, tokens_per_minute: int = LLM_TPM, shed_queue: int = LLM_SHED_QUEUE
+    ) -> None:
+        self.concurrency = concurrency
+        self.shed_queue = shed_queue
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = self.capacity
+        self.in_flight = 0
+        self.calls = 0
+        self.shed = 0
+        self._waiting = 0
+        self._updated = time.monotonic()
+        # business_id -> attentes (coût, future), dans l'ordre du round-robin
+        self._queues: OrderedDict[object, deque] = OrderedDict()
+        self._timer: asyncio.TimerHandle | None = None
+
+    @asynccontextmanager
+    async def slot(self, business_id: object, estimated_tokens: int):
+        """Attend son tour (concurrence + TPM) ; usage: lease.used(response.usage.total_tokens)."""
+        # un appel plus gros que le seau passe quand il est plein
+        cost = min(float(estimated_tokens), self.capacity)
+        await self._acquire(business_id, cost)
+        lease = Lease(cost)
+        self.calls += 1
+        try:
+            yield lease
+        finally:
+            self.in_flight -= 1
+            if lease.used_tokens is not None:
+                self._refill()
+                self.tokens = min(self.capacity, self.tokens + cost - lease.used_tokens)
+            self._dispatch()
+
+    async def _acquire(self, business_id: object, cost: float) -> None:
+        self._refill()
+        if not self._queues and self.in_flight < self.concurrency and self.tokens >= cost:
+            self._grant(cost)
+            return
+
+        if self.shed_queue and self._waiting >= self.shed_queue:
+            self.shed += 1
+            raise Overloaded(f"{self._waiting} LLM calls already waiting")
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(business_id, deque()).append((cost, future))
+        self._waiting += 1
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # accordé puis annulé : place et tokens rendus
+                self.in_flight -= 1
+                self.tokens += cost
+            else:
+                # annulé en attente : ne compte plus dans la file (retiré de sa deque au dispatch)
+                future.cancel()
+                self._waiting -= 1
+            self._dispatch()
+            raise
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _grant(self, cost: float) -> None:
+        self.tokens -= cost
+        self.in_flight += 1
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._refill()
+        while self._queues and self.in_flight < self.concurrency:
+            business_id, queue = next(iter(self._queues.items()))
+            cost, future = queue[0]
+            if future.done():  # attente annulée
+                queue.popleft()
+            elif self.tokens >= cost:
+                queue.popleft()
+                self._waiting -= 1
+                self._grant(cost)
+                future.set_result(None)
+                # au tour du business suivant
+                self._queues.move_to_end(business_id)
+            else:
+                # seau vide : réveil quand il aura assez de tokens (une fin d'appel réveille aussi)
+                self._timer = asyncio.get_running_loop().call_later(
+                    (cost - self.tokens) / self.rate, self._dispatch
+                )
+                break
+            if not queue:
+                del self._queues[business_id]
+
+    def metrics(self) -> dict:
+        # lecture seule : le seau n'est rempli (écrit) que par les appels de la boucle
+        available = min(self.capacity, self.tokens + (time.monotonic() - self._updated) * self.rate)
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "tokens_per_minute": int(self.capacity),
+            "tokens_available": int(available),
+            "waiting": self._waiting,
+            "shed_queue": self.shed_queue,
+            "shed": self.shed,
+            "waiting_by_business": {str(b): len(q) for b, q in self._queues.items()},
+        }
+
+
+llm_limiter = LLMLimiter()
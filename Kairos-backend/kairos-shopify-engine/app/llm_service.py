@@ -1,10 +1,9 @@
-import os
-from openai import OpenAI
 from dotenv import load_dotenv
 
-load_dotenv()
+from app.llm_deadline import call_llm
+from app.openai_client import get_async_client
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+load_dotenv()
 
 SYSTEM_PROMPT = """You are Kairos, an AI business advisor for Shopify merchants.
 You analyze real profit data and help merchants make better decisions.
@@ -78,7 +77,14 @@ STRICT RULES
 - No repeated structure across consecutive answers"""
 
 
-def ask_llm(context: str, question: str, history: list[dict] | None = None) -> str:
+# budget de la requête épuisé, toutes les tentatives en échec ou disjoncteur ouvert,
+# sans réponse de repli fournie par l'appelant (cf. degraded_answer du chat)
+TIMEOUT_ANSWER = "I couldn't finish analyzing your data in time. Please ask again in a moment."
+
+
+async def ask_llm(
+    context: str, question: str, history: list[dict] | None = None, fallback: str = TIMEOUT_ANSWER
+) -> str:
     messages = [{"role": "system", "content": SYSTEM_PROMPT}]
 
     messages.append({"role": "user", "content": context})
@@ -89,10 +95,16 @@ def ask_llm(context: str, question: str, history: list[dict] | None = None) -> s
 
     messages.append({"role": "user", "content": question})
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-        temperature=0.5,
-    )
-
-    return response.choices[0].message.content or "No response generated."
+    async def attempt(timeout: float, _lease) -> str:
+        response = await get_async_client().chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0.5,
+            timeout=timeout,
+        )
+        return response.choices[0].message.content or "No response generated."
+
+    # deadline de la requête (deadline_scope de la route), timeout par appel, hedge au-delà
+    # du p90 ; disjoncteur ouvert -> fallback sans appel
+    answer = await call_llm("chat", attempt)
+    return answer if answer is not None else fallback
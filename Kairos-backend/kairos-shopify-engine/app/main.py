@@ -1,20 +1,49 @@
 from __future__ import annotations
 
+import asyncio
 import os
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
-from app.models import ProfitabilityRequest, InsightRequest, ChatRequest
-from app.insight_engine import compute_insights
-from app.chat_context_builder import build_context
+from app.models import ProfitabilityRequest, ProfitSeriesRequest, ProfitSyncRequest, InsightRequest, ChatRequest
+from app.insight_cache import insight_cache
+from app.insight_engine import compute_insights, compute_insights_template_first
+from app.insight_runs import cancel_upgrades, insight_runs
+from app import llm_deadline
+from app.llm_deadline import deadline_scope
+from app.llm_breaker import llm_breaker
+from app.llm_limiter import llm_limiter
+from app.profit_engine import compute_snapshots, cost_book
+from app.profit_series import compute_series
+from app.profit_store import profit_store
+from app.profit_stream import StreamFormatError, compute_from_stream
+from app.chat_context_builder import build_context, degraded_answer
 from app.llm_service import ask_llm
 from app.intent_classifier import classify_intent
+from app.warmup import is_ready, readiness, start_warm_up
 
 
 load_dotenv()
 
 DEBUG = os.getenv("SHOPIFY_ENGINE_DEBUG", "0") == "1"
+# budget de bout en bout des routes LLM : au-delà, textes de repli (cf. app/llm_deadline.py)
+INSIGHTS_BUDGET_S = float(os.getenv("SHOPIFY_ENGINE_INSIGHTS_BUDGET_S", "10"))
+CHAT_BUDGET_S = float(os.getenv("SHOPIFY_ENGINE_CHAT_BUDGET_S", "20"))
 
-app = FastAPI(title="Kairos Shopify Engine", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # préchauffage en tâche de fond : le port s'ouvre sans l'attendre
+    warmup = start_warm_up()
+    yield
+    if warmup is not None:
+        warmup.cancel()
+    cancel_upgrades()
+
+
+app = FastAPI(title="Kairos Shopify Engine", version="0.1.0", lifespan=lifespan)
 
 
 @app.get("/health")
@@ -26,56 +55,113 @@ def health():
     }
 
 
+@app.get("/ready")
+def ready():
+    # 503 tant que le préchauffage tourne : l'autoscaler attend avant d'envoyer du trafic
+    return JSONResponse(readiness(), status_code=200 if is_ready() else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    # compteurs du worker qui répond (un jeu par process uvicorn) ; async : le limiteur et
+    # les stats d'appels LLM ne sont modifiés que par la boucle, on les lit depuis elle.
+    # Le cache prend un verrou tenu pendant ses écritures SQLite : lu dans un thread.
+    return {
+        "insight_cache": await asyncio.to_thread(insight_cache.metrics),
+        "llm_limiter": llm_limiter.metrics(),
+        "llm_calls": llm_deadline.metrics(),
+        "llm_breaker": llm_breaker.metrics(),
+    }
+
+
 # -----------------------------------------------------------------------------
 # Profit calculation (stub — Semaine 3-4)
 # -----------------------------------------------------------------------------
 @app.post("/profit/compute")
 def compute_profit(request: ProfitabilityRequest):
-    # Indexer le cout le plus recent par product_id
-    cost_map: dict[str, float] = {}
-    for c in request.product_costs:
-        cost_map[c.product_id] = c.cost_per_unit
-        
-    # abreger revenue + COGS par produit
-    revenue_map: dict[str, float] = {}
-    cogs_map: dict[str, float] = {}
-    units_map: dict[str, int] = {}
-    
-    for item in request.order_items:
-        pid = item.product_id
-        revenue_map[pid] = revenue_map.get(pid, 0.0) + item.unit_price * item.quantity
-        units_map[pid] = units_map.get(pid, 0) + item.quantity
-        cost = cost_map.get(pid)
-        if cost is not None:
-            cogs_map[pid] = cogs_map.get(pid, 0.0) + cost * item.quantity
-    
-    # construire les snapchots
-    snapshots = []
-    for pid ,revenue in revenue_map.items():
-        cogs = cogs_map.get(pid, 0.0)
-        gross_profit = revenue - cogs
-        margin_pct = (gross_profit / revenue * 100) if revenue > 0 else 0.0
-        snapshots.append({
-            "product_id": pid,
-            "period_start": request.period_start,
-            "period_end": request.period_end,
-            "revenue": round(revenue,2),
-            "cogs": round(cogs,2),
-            "gross_profit": round(gross_profit,2),
-            "gross_margin_pct": round(margin_pct,2),
-            "units_sold": units_map[pid],
-            "has_cost": pid in cost_map
-        })
-    
+    # agrégation colonnaire (NumPy) : même sortie que l'ancienne boucle par ligne
+    try:
+        snapshots = compute_snapshots(
+            request.order_items, request.product_costs, request.period_start, request.period_end
+        )
+    except ValueError as e:
+        # order_date / effective_date illisible avec des coûts datés
+        return JSONResponse({"detail": str(e)}, status_code=422)
     return {"business_id": request.business_id, "snapshots": snapshots}
 
 
+@app.post("/profit/series")
+def compute_profit_series(request: ProfitSeriesRequest):
+    """
+    Séries jour / semaine / mois + fenêtres libres en une passe (au lieu d'un
+    /profit/compute par seau). Réponse colonnaire, cf. app/profit_series.py.
+    """
+    try:
+        return compute_series(request)
+    except ValueError as e:
+        return JSONResponse({"detail": str(e)}, status_code=422)
+
+
+@app.post("/profit/compute-stream")
+async def compute_profit_stream(request: Request):
+    """
+    Variante NDJSON de /profit/compute pour les gros historiques (recalcul annuel) :
+    en-tête puis une ligne de commande par ligne, repliées par lots (cf. app/profit_stream.py).
+    """
+    try:
+        return await compute_from_stream(request.stream())
+    except StreamFormatError as e:
+        return JSONResponse({"detail": str(e), "line": e.line}, status_code=422)
+
+
+@app.post("/profit/sync")
+def sync_profit(request: ProfitSyncRequest):
+    """
+    Synchro incrémentale : seules les lignes nouvelles / modifiées / supprimées depuis
+    la dernière synchro, repliées dans les agrégats journaliers (cf. app/profit_store.py).
+    """
+    t0 = time.perf_counter()
+    try:
+        counts = profit_store.apply_lines(request.business_id, request.order_items, cost_book(request.product_costs))
+    except ValueError as e:
+        return JSONResponse({"detail": f"invalid order_date: {e}"}, status_code=422)
+    return {
+        "business_id": request.business_id,
+        "received": len(request.order_items),
+        **counts,
+        "processing_time_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+
+
+@app.get("/profit/snapshots/{business_id}")
+def profit_snapshots(business_id: int, period_start: str, period_end: str):
+    """Snapshots d'une période à partir des seaux journaliers, même forme que /profit/compute."""
+    try:
+        snapshots = profit_store.snapshots(business_id, period_start, period_end)
+    except ValueError as e:
+        return JSONResponse({"detail": f"invalid period: {e}"}, status_code=422)
+    return {"business_id": business_id, "snapshots": snapshots}
+
+
 # -----------------------------------------------------------------------------
 # Insight Engine (Semaine 7)
 # -----------------------------------------------------------------------------
 @app.post("/insights/compute")
-def compute_insights_route(request: InsightRequest):
-    insights = compute_insights(request)
+async def compute_insights_route(request: InsightRequest):
+    # async : les appels OpenAI n'occupent ni thread ni place du threadpool FastAPI
+    if request.template_first:
+        # templates tout de suite, textes LLM via /insights/runs/{run_id}
+        run = await compute_insights_template_first(request)
+        return {
+            "business_id": request.business_id,
+            "period_start": request.period_start,
+            "period_end": request.period_end,
+            **run,
+            "count": len(run["insights"]),
+        }
+
+    with deadline_scope(INSIGHTS_BUDGET_S):
+        insights = await compute_insights(request)
     return {
         "business_id": request.business_id,
         "period_start": request.period_start,
@@ -84,14 +170,24 @@ def compute_insights_route(request: InsightRequest):
         "count": len(insights),
     }
 
+
+@app.get("/insights/runs/{run_id}")
+def insight_run(run_id: str, since: int = -1):
+    """Insights d'un run template_first modifiés après la révision `since` (tous par défaut)."""
+    run = insight_runs.get(run_id, since)
+    if run is None:
+        return JSONResponse({"detail": "unknown or expired run"}, status_code=404)
+    return run
+
 # -----------------------------------------------------------------------------
 # Chat enrichi (Semaine 9)
 # -----------------------------------------------------------------------------
 @app.post("/chat/compute")
-def chat_compute(request: ChatRequest):
-    intent_family, routing_status = classify_intent(request.question)
-    context = build_context(request)
-    answer = ask_llm(context, request.question, request.history)
+async def chat_compute(request: ChatRequest):
+    with deadline_scope(CHAT_BUDGET_S):
+        intent_family, routing_status = classify_intent(request.question)
+        context = build_context(request)
+        answer = await ask_llm(context, request.question, request.history, fallback=degraded_answer(request))
 
     return {
         "business_id": request.business_id,
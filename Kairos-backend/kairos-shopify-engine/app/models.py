@@ -1,14 +1,19 @@
-from pydantic import BaseModel
+from datetime import date
+from typing import Literal
+
+from pydantic import BaseModel, model_validator
 
 class OrderItemInput(BaseModel):
     product_id: str
     quantity: int
     unit_price: float
+    order_date: str | None = None  # "YYYY-MM-DD" ou datetime ISO ; requis par /profit/series
     
     
 class ProductCostInput(BaseModel):
     product_id: str
     cost_per_unit: float
+    effective_date: str | None = None  # "YYYY-MM-DD" ; absent = en vigueur depuis toujours
     
 class ProfitabilityRequest(BaseModel):
     business_id: int
@@ -18,6 +23,66 @@ class ProfitabilityRequest(BaseModel):
     product_costs: list[ProductCostInput]
 
 
+class ProfitStreamHeader(BaseModel):
+    """Première ligne du flux NDJSON de /profit/compute-stream (les lignes suivantes sont des OrderItemInput)."""
+    business_id: int
+    period_start: str  # format "YYYY-MM-DD"
+    period_end: str  # format "YYYY-MM-DD"
+    product_costs: list[ProductCostInput] = []
+
+
+class OrderLineInput(BaseModel):
+    """Ligne de commande synchronisée dans le store de profit (/profit/sync)."""
+    line_key: str  # clé d'idempotence stable, ex. id de line item Shopify
+    order_date: str  # "YYYY-MM-DD" ou datetime ISO : seule la date compte
+    product_id: str
+    quantity: int
+    unit_price: float
+    removed: bool = False  # ligne annulée / supprimée côté Shopify
+
+
+class ProfitSyncRequest(BaseModel):
+    business_id: int
+    order_items: list[OrderLineInput]
+    product_costs: list[ProductCostInput] = []
+
+
+class SeriesWindow(BaseModel):
+    """Fenêtre libre (bornes incluses), ex. une campagne ou un trimestre fiscal."""
+    start: str
+    end: str
+    label: str | None = None
+
+    @model_validator(mode="after")
+    def _check_bounds(self):
+        # "YYYY-MM-DD" ou datetime ISO : seule la date compte, comme dans profit_series
+        if date.fromisoformat(self.start[:10]) > date.fromisoformat(self.end[:10]):
+            raise ValueError(f"window {self.label or self.start} starts after it ends ({self.start} > {self.end})")
+        return self
+
+
+class ProfitSeriesRequest(BaseModel):
+    business_id: int
+    period_start: str  # format "YYYY-MM-DD"
+    period_end: str  # format "YYYY-MM-DD"
+    order_items: list[OrderItemInput]
+    product_costs: list[ProductCostInput]
+    granularities: list[Literal["day", "week", "month"]] = ["month"]
+    windows: list[SeriesWindow] = []
+
+    @model_validator(mode="after")
+    def _check_windows(self):
+        # une fenêtre hors de la période sortirait des bornes inversées (tronquées à la période)
+        lo, hi = date.fromisoformat(self.period_start[:10]), date.fromisoformat(self.period_end[:10])
+        for w in self.windows:
+            if date.fromisoformat(w.end[:10]) < lo or date.fromisoformat(w.start[:10]) > hi:
+                raise ValueError(
+                    f"window {w.label or w.start} ({w.start} .. {w.end}) is outside the period "
+                    f"{self.period_start} .. {self.period_end}"
+                )
+        return self
+
+
 # -----------------------------------------------------------------------------
 # Insight Engine models
 # -----------------------------------------------------------------------------
@@ -47,6 +112,8 @@ class InsightRequest(BaseModel):
     period_end: str
     snapshots: list[SnapshotInput]
     order_items: list[OrderItemDetailInput]
+    # réponse immédiate (templates) puis textes LLM à relire via /insights/runs/{run_id}
+    template_first: bool = False
     
 # -----------------------------------------------------------------------------
 # Chat enrichi models (Semaine 9)
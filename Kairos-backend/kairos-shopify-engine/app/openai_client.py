@@ -0,0 +1,26 @@
+"""
+Client OpenAI asynchrone partagé (chat et insights, llm_service / insight_writer),
+créé au premier appel.
+
+`import openai` coûte ~0.5 s : le faire à l'import de app.main ralentissait chaque
+démarrage à froid, même pour /profit/compute qui n'appelle jamais le LLM.
+"""
+
+import os
+import threading
+
+_async_client = None
+_lock = threading.Lock()
+
+
+def get_async_client():
+    """AsyncOpenAI unique du process : un pool httpx partagé par toutes les requêtes d'insights."""
+    global _async_client
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                from openai import AsyncOpenAI
+
+                # pas de retries du SDK : tentatives, timeouts et hedge sont gérés par llm_deadline
+                _async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    return _async_client
@@ -0,0 +1,323 @@
+"""
+Moteur de profit colonnaire (/profit/compute).
+
+Les lignes de commande sont converties une seule fois en colonnes NumPy, les
+product_id factorisés en codes entiers (ordre de première apparition), puis revenu,
+unités et COGS sont sommés par produit avec np.bincount. Plus de boucle Python par
+ligne : seule la construction des snapshots boucle, une fois par produit.
+
+Parité avec l'ancienne boucle (dicts par ligne) :
+- bincount additionne les poids dans l'ordre des lignes, comme la boucle : mêmes flottants
+- arrondis et marge calculés en Python (round() et np.round n'arrondissent pas pareil)
+- coût sans date d'effet : le dernier product_costs d'un produit gagne, comme l'assignation de dict
+
+Coûts datés (effective_date) : chaque vente est coûtée au dernier coût en vigueur à sa
+date (CostBook, un np.searchsorted pour toutes les lignes : O(n log k)).
+"""
+
+from bisect import bisect_right
+from datetime import date
+from operator import attrgetter
+
+import numpy as np
+
+_product_id = attrgetter("product_id")
+_quantity = attrgetter("quantity")
+_unit_price = attrgetter("unit_price")
+_order_date = attrgetter("order_date")
+_effective_date = attrgetter("effective_date")
+_cost_per_unit = attrgetter("cost_per_unit")
+
+# ordinal d'une vente sans date : après toutes les dates d'effet (coût le plus récent)
+UNDATED = date.max.toordinal() + 1
+_ORDINAL_BITS = 22  # UNDATED < 2**22 : clé (produit, jour) sur un seul int64
+
+
+def factorize(values: list) -> tuple[list, np.ndarray]:
+    """(valeurs uniques dans l'ordre de première apparition, code de chaque valeur)."""
+    uniques = list(dict.fromkeys(values))
+    index = {v: i for i, v in enumerate(uniques)}
+    codes = np.fromiter(map(index.__getitem__, values), dtype=np.intp, count=len(values))
+    return uniques, codes
+
+
+def order_columns(order_items: list) -> tuple[list[str], np.ndarray, np.ndarray]:
+    """OrderItemInput -> (product_ids, quantities int64, unit_prices float64)."""
+    n = len(order_items)
+    product_ids = list(map(_product_id, order_items))
+    quantities = np.fromiter(map(_quantity, order_items), dtype=np.int64, count=n)
+    unit_prices = np.fromiter(map(_unit_price, order_items), dtype=np.float64, count=n)
+    return product_ids, quantities, unit_prices
+
+
+def sale_ordinals(order_dates: list, missing: int | None = UNDATED) -> np.ndarray:
+    """
+    Dates ISO (jour ou datetime) -> ordinal du jour ; chaque date distincte n'est parsée
+    qu'une fois. Date absente -> `missing` (ValueError si None).
+    """
+    uniques, codes = factorize(order_dates)
+    if None in uniques and missing is None:
+        raise ValueError("order_date is required on every order item")
+    ordinals = np.fromiter(
+        (missing if d is None else date.fromisoformat(d[:10]).toordinal() for d in uniques),
+        dtype=np.int64, count=len(uniques),
+    )
+    return ordinals[codes]
+
+
+class CostBook:
+    """
+    Historique des coûts unitaires par produit (ProductCostInput, daté ou non).
+
+    Pour une vente du jour d, le coût est le dernier en vigueur (effective_date <= d) ;
+    avant la première date d'effet, le plus ancien connu ; pour une vente non datée, le
+    plus récent. Un coût sans date vaut depuis toujours ; à date égale, le dernier de la
+    liste gagne (même règle que l'ancien cost_map).
+    """
+
+    def __init__(self, product_ids: list[str], ordinals: list[int] | np.ndarray, costs: list[float]):
+        # une entrée par coût reçu, dans l'ordre ; ordinal 0 = sans date d'effet
+        ordinals = np.asarray(ordinals, dtype=np.int64)
+        self.dated = bool(ordinals.any())
+        if self.dated:
+            uniques, codes = factorize(product_ids)
+            self.index: dict[str, int] = dict(zip(uniques, range(len(uniques))))
+        else:
+            # sans date d'effet : seul le dernier coût de chaque produit compte
+            latest = dict(zip(product_ids, costs))
+            self.index = dict(zip(latest, range(len(latest))))
+            codes, ordinals, costs = np.arange(len(latest)), [0] * len(latest), list(latest.values())
+
+        n = len(costs)
+        codes = codes.astype(np.int64)
+        ordinals = np.array(ordinals, dtype=np.int64)
+        costs = np.array(costs, dtype=np.float64)
+        order = np.lexsort((np.arange(n), ordinals, codes))
+        sorted_ordinals = ordinals[order]
+        self._codes = codes[order]
+        self._keys = (self._codes << _ORDINAL_BITS) | sorted_ordinals
+        self._costs = costs[order]
+        k = len(self.index)
+        self._first = np.searchsorted(self._codes, np.arange(k), side="left")
+        self._latest = self._costs[np.searchsorted(self._codes, np.arange(k), side="right") - 1] if k else costs
+
+        self._sorted_ordinals = sorted_ordinals
+        self._by_product: dict[str, tuple[list[int], list[float]]] | None = None
+
+    @classmethod
+    def from_inputs(cls, product_costs: list) -> "CostBook":
+        dates = list(map(_effective_date, product_costs))
+        if not any(dates):
+            return cls.from_map({c.product_id: c.cost_per_unit for c in product_costs})
+        return cls(
+            list(map(_product_id, product_costs)),
+            sale_ordinals(dates, missing=0),
+            list(map(_cost_per_unit, product_costs)),
+        )
+
+    @classmethod
+    def from_map(cls, costs: dict[str, float]) -> "CostBook":
+        return cls(list(costs), [0] * len(costs), list(costs.values()))
+
+    def __contains__(self, product_id: str) -> bool:
+        return product_id in self.index
+
+    def codes_for(self, product_ids: list[str]) -> np.ndarray:
+        """Code du produit dans le carnet, -1 s'il n'a aucun coût."""
+        return np.fromiter((self.index.get(pid, -1) for pid in product_ids), dtype=np.int64, count=len(product_ids))
+
+    def line_costs(self, book_codes: np.ndarray, ordinals: np.ndarray | None = None) -> np.ndarray:
+        """Coût unitaire de chaque ligne (0.0 sans coût). ordinals = jour de vente, None = non daté."""
+        has = book_codes >= 0
+        if not len(self._costs):
+            return np.zeros(len(book_codes), dtype=np.float64)
+        codes = np.where(has, book_codes, 0)
+        if ordinals is None or not self.dated:
+            costs = self._latest[codes]
+        else:
+            pos = np.searchsorted(self._keys, (codes << _ORDINAL_BITS) | ordinals, side="right") - 1
+            same_product = self._codes[np.maximum(pos, 0)] == codes
+            costs = self._costs[np.where((pos >= 0) & same_product, pos, self._first[codes])]
+        return np.where(has, costs, 0.0)
+
+    def cost_at(self, product_id: str, ordinal: int = UNDATED) -> float | None:
+        """Chemin scalaire (store de profit) : bisect dans les dates d'effet du produit."""
+        if self._by_product is None:
+            products = list(self.index)
+            by_product: dict[str, tuple[list[int], list[float]]] = {pid: ([], []) for pid in products}
+            for code, day, cost in zip(self._codes.tolist(), self._sorted_ordinals.tolist(), self._costs.tolist()):
+                by_product[products[code]][0].append(day)
+                by_product[products[code]][1].append(cost)
+            self._by_product = by_product
+        entry = self._by_product.get(product_id)
+        if entry is None:
+            return None
+        ordinals, costs = entry
+        return costs[max(bisect_right(ordinals, ordinal) - 1, 0)]
+
+
+def cost_book(product_costs: list) -> CostBook:
+    return CostBook.from_inputs(product_costs)
+
+
+def aggregate(
+    codes: np.ndarray,
+    n_products: int,
+    quantities: np.ndarray,
+    unit_prices: np.ndarray,
+    line_costs: np.ndarray,
+    has_cost: np.ndarray,
+) -> dict[str, np.ndarray]:
+    """
+    Sommes par produit (index = code). line_costs : coût unitaire de chaque ligne
+    (0 sans coût) ; has_cost est indexé par code produit.
+    """
+    revenue = np.bincount(codes, weights=unit_prices * quantities, minlength=n_products)
+    units = np.bincount(codes, weights=quantities, minlength=n_products).astype(np.int64)
+    cogs = np.bincount(codes, weights=line_costs * quantities, minlength=n_products)
+    # sans coût: 0.0 exact (0.0 * quantite negative donnerait -0.0)
+    cogs = np.where(has_cost, cogs, 0.0)
+    return {"revenue": revenue, "units": units, "cogs": cogs}
+
+
+def snapshot_row(
+    product_id: str,
+    revenue: float,
+    cogs: float,
+    units: int,
+    has_cost: bool,
+    period_start: str,
+    period_end: str,
+) -> dict:
+    gross_profit = revenue - cogs
+    margin_pct = (gross_profit / revenue * 100) if revenue > 0 else 0.0
+    return {
+        "product_id": product_id,
+        "period_start": period_start,
+        "period_end": period_end,
+        "revenue": round(revenue, 2),
+        "cogs": round(cogs, 2),
+        "gross_profit": round(gross_profit, 2),
+        "gross_margin_pct": round(margin_pct, 2),
+        "units_sold": units,
+        "has_cost": has_cost,
+    }
+
+
+def snapshot_rows(
+    product_ids: list[str],
+    totals: dict[str, np.ndarray],
+    has_cost: np.ndarray,
+    period_start: str,
+    period_end: str,
+) -> list[dict]:
+    return [
+        snapshot_row(pid, revenue, cogs, units, costed, period_start, period_end)
+        for pid, revenue, cogs, units, costed in zip(
+            product_ids,
+            totals["revenue"].tolist(),
+            totals["cogs"].tolist(),
+            totals["units"].tolist(),
+            has_cost.tolist(),
+        )
+    ]
+
+
+def compute_snapshots_columnar(
+    product_ids: list[str],
+    quantities: np.ndarray,
+    unit_prices: np.ndarray,
+    costs: CostBook,
+    period_start: str,
+    period_end: str,
+    ordinals: np.ndarray | None = None,
+) -> list[dict]:
+    """Snapshots à partir de colonnes déjà construites (une ligne de commande par index)."""
+    if not product_ids:
+        return []
+    uniques, codes = factorize(product_ids)
+    book_codes = costs.codes_for(uniques)
+    totals = aggregate(
+        codes, len(uniques), quantities, unit_prices, costs.line_costs(book_codes[codes], ordinals), book_codes >= 0
+    )
+    return snapshot_rows(uniques, totals, book_codes >= 0, period_start, period_end)
+
+
+def compute_snapshots(order_items: list, product_costs: list, period_start: str, period_end: str) -> list[dict]:
+    """Même sortie que l'ancienne boucle de compute_profit (ordre de première vente)."""
+    product_ids, quantities, unit_prices = order_columns(order_items)
+    costs = cost_book(product_costs)
+    # les dates de vente ne servent qu'avec des coûts datés
+    ordinals = sale_ordinals(list(map(_order_date, order_items))) if costs.dated else None
+    return compute_snapshots_columnar(product_ids, quantities, unit_prices, costs, period_start, period_end, ordinals)
+
+
+class ProfitAccumulator:
+    """
+    Agrégats courants par produit, alimentés lot par lot (ingestion NDJSON) : on ne
+    garde jamais la liste des lignes, seulement un tableau par métrique (taille = nb
+    de produits vus). np.add.at applique les lignes dans l'ordre, comme la boucle
+    d'origine : les snapshots restent identiques à ceux de compute_snapshots.
+    """
+
+    def __init__(self, costs: CostBook):
+        self.costs = costs
+        self.product_ids: list[str] = []
+        self.lines = 0
+        self._index: dict[str, int] = {}
+        self._revenue = np.zeros(0, dtype=np.float64)
+        self._units = np.zeros(0, dtype=np.int64)
+        self._cogs = np.zeros(0, dtype=np.float64)
+        self._book_codes = np.zeros(0, dtype=np.int64)
+
+    def _grow(self, size: int) -> None:
+        capacity = len(self._revenue)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 1024)
+        for name in ("_revenue", "_units", "_cogs", "_book_codes"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def _codes(self, product_ids: list[str]) -> np.ndarray:
+        index = self._index
+        new = [pid for pid in dict.fromkeys(product_ids) if pid not in index]
+        if new:
+            start = len(self.product_ids)
+            self._grow(start + len(new))
+            for offset, pid in enumerate(new):
+                index[pid] = start + offset
+            self._book_codes[start:start + len(new)] = self.costs.codes_for(new)
+            self.product_ids.extend(new)
+        return np.fromiter(map(index.__getitem__, product_ids), dtype=np.intp, count=len(product_ids))
+
+    def add(
+        self,
+        product_ids: list[str],
+        quantities: np.ndarray,
+        unit_prices: np.ndarray,
+        ordinals: np.ndarray | None = None,
+    ) -> None:
+        if not product_ids:
+            return
+        codes = self._codes(product_ids)
+        np.add.at(self._revenue, codes, unit_prices * quantities)
+        np.add.at(self._units, codes, quantities)
+        np.add.at(self._cogs, codes, self.costs.line_costs(self._book_codes[codes], ordinals) * quantities)
+        self.lines += len(product_ids)
+
+    def add_items(self, order_items: list) -> None:
+        ordinals = sale_ordinals(list(map(_order_date, order_items))) if self.costs.dated else None
+        self.add(*order_columns(order_items), ordinals)
+
+    def snapshots(self, period_start: str, period_end: str) -> list[dict]:
+        k = len(self.product_ids)
+        has_cost = self._book_codes[:k] >= 0
+        totals = {
+            "revenue": self._revenue[:k],
+            "units": self._units[:k],
+            "cogs": np.where(has_cost, self._cogs[:k], 0.0),
+        }
+        return snapshot_rows(self.product_ids, totals, has_cost, period_start, period_end)
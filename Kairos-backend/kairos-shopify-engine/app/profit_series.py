@@ -0,0 +1,214 @@
+"""
+Séries de profit multi-granularité (/profit/series) en une seule passe groupée.
+
+Les lignes de la période sont agrégées une fois par (jour, produit) ; jour / semaine
+(lundi) / mois et fenêtres libres sont ensuite des regroupements de ces cellules, dont
+le nombre est borné par jours x produits vendus et non par le nombre de lignes.
+Un graphe sur 12 mois ne coûte plus 12 recalculs complets.
+
+Réponse en colonnes : un dictionnaire de produits, puis pour chaque série des listes
+parallèles (une entrée par couple seau x produit ayant des ventes). Les montants sont
+sommés par cellule puis par seau : à l'arrondi près, mêmes valeurs que /profit/compute
+appelé sur les lignes du seau.
+"""
+
+from datetime import date
+from itertools import compress
+
+import numpy as np
+
+from app.profit_engine import CostBook, cost_book, factorize, order_columns, sale_ordinals
+
+GRANULARITIES = ("day", "week", "month")
+# au-delà de jours x produits cellules, on groupe par tri (np.unique) plutôt qu'en dense
+DENSE_CELLS = 1 << 22
+
+
+def bucket_start(granularity: str, day: int) -> int:
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - (day - 1) % 7  # l'ordinal 1 (0001-01-01) est un lundi
+    return date.fromordinal(day).replace(day=1).toordinal()
+
+
+def bucket_end(granularity: str, start: int) -> int:
+    if granularity == "day":
+        return start
+    if granularity == "week":
+        return start + 6
+    d = date.fromordinal(start)
+    next_month = date(d.year + d.month // 12, d.month % 12 + 1, 1)
+    return next_month.toordinal() - 1
+
+
+def calendar_buckets(granularity: str, lo: int, hi: int) -> list[int]:
+    """Débuts de tous les seaux qui touchent [lo, hi], y compris ceux sans vente."""
+    starts = []
+    start = bucket_start(granularity, lo)
+    while start <= hi:
+        starts.append(start)
+        start = bucket_end(granularity, start) + 1
+    return starts
+
+
+def _iso(ordinal: int) -> str:
+    return date.fromordinal(ordinal).isoformat()
+
+
+def _ordinal(iso: str) -> int:
+    return date.fromisoformat(iso[:10]).toordinal()
+
+
+def _buckets_header(granularity: str, starts: list[int], lo: int, hi: int) -> dict:
+    # seaux calendaires tronqués à la période demandée
+    return {
+        "bucket_start": [_iso(max(s, lo)) for s in starts],
+        "bucket_end": [_iso(min(bucket_end(granularity, s), hi)) for s in starts],
+    }
+
+
+def _windows_header(windows: list[tuple[str, str, str | None]], lo: int, hi: int) -> dict:
+    return {
+        "label": [label for _, _, label in windows],
+        "bucket_start": [_iso(max(_ordinal(start), lo)) for start, _, _ in windows],
+        "bucket_end": [_iso(min(_ordinal(end), hi)) for _, end, _ in windows],
+    }
+
+
+def _group_cells(day_index: np.ndarray, codes: np.ndarray, n_days: int, n_products: int, weights: dict) -> tuple:
+    """Une passe : sommes par cellule (jour, produit). Retourne (cell_ids, {métrique: sommes})."""
+    cells = day_index * n_products + codes
+    size = n_days * n_products
+    if size <= DENSE_CELLS:
+        cell_ids = np.flatnonzero(np.bincount(cells, minlength=size))
+        sums = {name: np.bincount(cells, weights=w, minlength=size)[cell_ids] for name, w in weights.items()}
+    else:
+        cell_ids, inverse = np.unique(cells, return_inverse=True)
+        sums = {name: np.bincount(inverse, weights=w, minlength=len(cell_ids)) for name, w in weights.items()}
+    return cell_ids, sums
+
+
+def _rows(bucket: np.ndarray, product: np.ndarray, revenue: np.ndarray, cogs: np.ndarray, units: np.ndarray) -> dict:
+    gross_profit = revenue - cogs
+    with np.errstate(divide="ignore", invalid="ignore"):
+        margin_pct = np.where(revenue > 0, gross_profit / revenue * 100, 0.0)
+    return {
+        "bucket": bucket.tolist(),
+        "product": product.tolist(),
+        "revenue": [round(x, 2) for x in revenue.tolist()],
+        "cogs": [round(x, 2) for x in cogs.tolist()],
+        "gross_profit": [round(x, 2) for x in gross_profit.tolist()],
+        "gross_margin_pct": [round(x, 2) for x in margin_pct.tolist()],
+        "units_sold": np.rint(units).astype(np.int64).tolist(),
+    }
+
+
+def _rollup(cell_bucket: np.ndarray, cell_product: np.ndarray, n_products: int, sums: dict) -> tuple:
+    keys = cell_bucket * n_products + cell_product
+    ids, inverse = np.unique(keys, return_inverse=True)
+    rolled = {name: np.bincount(inverse, weights=v, minlength=len(ids)) for name, v in sums.items()}
+    return ids // n_products, ids % n_products, rolled
+
+
+def compute_series_columnar(
+    product_ids: list[str],
+    ordinals: np.ndarray,
+    quantities: np.ndarray,
+    unit_prices: np.ndarray,
+    costs: CostBook,
+    period_start: str,
+    period_end: str,
+    granularities: list[str],
+    windows: list[tuple[str, str, str | None]],
+) -> dict:
+    lo, hi = _ordinal(period_start), _ordinal(period_end)
+    inside = (ordinals >= lo) & (ordinals <= hi)
+    n_inside = int(inside.sum())
+    if n_inside < len(product_ids):
+        product_ids = list(compress(product_ids, inside.tolist()))
+        ordinals, quantities, unit_prices = ordinals[inside], quantities[inside], unit_prices[inside]
+
+    products, codes = factorize(product_ids)
+    k = len(products)
+    book_codes = costs.codes_for(products)
+    has_cost = book_codes >= 0
+
+    result = {
+        "products": products,
+        "has_cost": has_cost.tolist(),
+        "series": {},
+        "lines": n_inside,
+        "lines_outside_period": len(inside) - n_inside,
+    }
+    if not n_inside:
+        empty = _rows(*(np.zeros(0, dtype=t) for t in (np.int64, np.int64, float, float, float)))
+        for g in granularities:
+            result["series"][g] = {**_buckets_header(g, calendar_buckets(g, lo, hi), lo, hi), **empty}
+        if windows:
+            result["windows"] = {**_windows_header(windows, lo, hi), **empty}
+        return result
+
+    # passe unique sur les lignes : cellules (jour, produit)
+    day0 = int(ordinals.min())
+    n_days = int(ordinals.max()) - day0 + 1
+    cell_ids, sums = _group_cells(
+        ordinals - day0, codes, n_days, k,
+        {
+            "revenue": unit_prices * quantities,
+            # coût en vigueur au jour de chaque vente (coûts datés)
+            "cogs": costs.line_costs(book_codes[codes], ordinals) * quantities,
+            "units": quantities.astype(np.float64),
+        },
+    )
+    cell_day = cell_ids // k + day0
+    cell_product = cell_ids % k
+    sums["cogs"] = np.where(has_cost[cell_product], sums["cogs"], 0.0)
+
+    # regroupements des cellules : un mapping jour -> seau calculé par jour distinct
+    days, day_inverse = np.unique(cell_day, return_inverse=True)
+    for g in granularities:
+        starts = calendar_buckets(g, lo, hi)
+        day_starts = np.fromiter((bucket_start(g, d) for d in days.tolist()), dtype=np.int64, count=len(days))
+        bucket_of_day = np.searchsorted(np.asarray(starts, dtype=np.int64), day_starts)
+        bucket, product, rolled = _rollup(bucket_of_day[day_inverse], cell_product, k, sums)
+        result["series"][g] = {
+            **_buckets_header(g, starts, lo, hi),
+            **_rows(bucket, product, rolled["revenue"], rolled["cogs"], rolled["units"]),
+        }
+
+    if windows:
+        # fenêtres libres (chevauchements permis) : une somme par produit sur les cellules de la fenêtre
+        columns = {name: [] for name in ("bucket", "product", "revenue", "cogs", "units")}
+        for i, (start, end, _label) in enumerate(windows):
+            mask = (cell_day >= _ordinal(start)) & (cell_day <= _ordinal(end))
+            window_product = cell_product[mask]
+            sold = np.flatnonzero(np.bincount(window_product, minlength=k))
+            columns["bucket"].append(np.full(len(sold), i, dtype=np.int64))
+            columns["product"].append(sold)
+            for name, values in sums.items():
+                columns[name].append(np.bincount(window_product, weights=values[mask], minlength=k)[sold])
+        merged = {name: np.concatenate(parts) for name, parts in columns.items()}
+        result["windows"] = {
+            **_windows_header(windows, lo, hi),
+            **_rows(merged["bucket"], merged["product"], merged["revenue"], merged["cogs"], merged["units"]),
+        }
+    return result
+
+
+def compute_series(request) -> dict:
+    """ProfitSeriesRequest -> réponse colonnaire de /profit/series."""
+    product_ids, quantities, unit_prices = order_columns(request.order_items)
+    ordinals = sale_ordinals([item.order_date for item in request.order_items], missing=None)
+    series = compute_series_columnar(
+        product_ids, ordinals, quantities, unit_prices, cost_book(request.product_costs),
+        request.period_start, request.period_end,
+        list(dict.fromkeys(request.granularities)),
+        [(w.start, w.end, w.label) for w in request.windows],
+    )
+    return {
+        "business_id": request.business_id,
+        "period_start": request.period_start,
+        "period_end": request.period_end,
+        **series,
+    }
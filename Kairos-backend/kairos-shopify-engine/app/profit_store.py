@@ -0,0 +1,212 @@
+"""
+Agrégats de profit persistants par business / jour / produit (SQLite embarqué).
+
+Node n'envoie plus que les lignes de commande nouvelles ou modifiées depuis la
+dernière synchro (/profit/sync) ; une période se lit ensuite en sommant les seaux
+journaliers (/profit/snapshots), sans rescanner les commandes.
+
+- profit_lines : contribution de chaque ligne, par clé d'idempotence (line_key).
+  Renvoyer une ligne identique ne change rien ; une ligne modifiée retire son ancienne
+  contribution de son ancien seau avant d'ajouter la nouvelle ; removed=True la retire.
+- profit_daily : revenu, COGS, unités, lignes et lignes coûtées par (business, jour, produit).
+
+Le coût est figé à l'ingestion : celui de product_costs en vigueur au jour de la vente
+(coûts datés, cf. CostBook). Pour recoûter, Node
+renvoie les lignes concernées avec les nouveaux coûts (mêmes clés -> delta appliqué).
+has_cost n'est vrai que si toutes les lignes de la période avaient un coût.
+
+SHOPIFY_ENGINE_PROFIT_DB : fichier SQLite (partagé entre workers uvicorn, mode WAL)
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import date
+from pathlib import Path
+
+from app.profit_engine import CostBook, snapshot_row
+
+PROFIT_DB = Path(os.getenv(
+    "SHOPIFY_ENGINE_PROFIT_DB", str(Path(__file__).resolve().parent.parent / "data" / "profit.sqlite")
+))
+
+# taille des IN (...) : sous la limite de variables SQLite
+_LOOKUP_BATCH = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profit_lines (
+    business_id INTEGER NOT NULL,
+    line_key    TEXT NOT NULL,
+    day         TEXT NOT NULL,
+    product_id  TEXT NOT NULL,
+    revenue     REAL NOT NULL,
+    cogs        REAL NOT NULL,
+    units       INTEGER NOT NULL,
+    costed      INTEGER NOT NULL,
+    PRIMARY KEY (business_id, line_key)
+) WITHOUT ROWID;
+-- WITHOUT ROWID : les seaux d'un business sont contigus et triés par jour (lecture de période séquentielle)
+CREATE TABLE IF NOT EXISTS profit_daily (
+    business_id  INTEGER NOT NULL,
+    day          TEXT NOT NULL,
+    product_id   TEXT NOT NULL,
+    revenue      REAL NOT NULL,
+    cogs         REAL NOT NULL,
+    units        INTEGER NOT NULL,
+    lines        INTEGER NOT NULL,
+    costed_lines INTEGER NOT NULL,
+    PRIMARY KEY (business_id, day, product_id)
+) WITHOUT ROWID;
+"""
+
+_UPSERT_BUCKET = """
+INSERT INTO profit_daily (business_id, day, product_id, revenue, cogs, units, lines, costed_lines)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (business_id, day, product_id) DO UPDATE SET
+    revenue = revenue + excluded.revenue,
+    cogs = cogs + excluded.cogs,
+    units = units + excluded.units,
+    lines = lines + excluded.lines,
+    costed_lines = costed_lines + excluded.costed_lines
+"""
+
+
+def sale_day(order_date: str) -> str:
+    """'YYYY-MM-DD' ou datetime ISO (created_at Shopify) -> jour de vente tel qu'envoyé."""
+    return date.fromisoformat(order_date[:10]).isoformat()
+
+
+class ProfitStore:
+    def __init__(self, path: Path = PROFIT_DB) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # autocommit : les transactions sont ouvertes à la main (BEGIN IMMEDIATE)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def apply_lines(self, business_id: int, order_items: list, costs: CostBook) -> dict:
+        """
+        Applique une synchro (OrderLineInput). Dans un même envoi, la dernière
+        occurrence d'une clé gagne. Retourne les compteurs inserted/updated/removed/unchanged.
+        """
+        incoming = {item.line_key: item for item in order_items}
+        # validation avant toute écriture : une date invalide rejette toute la synchro
+        days = {key: sale_day(item.order_date) for key, item in incoming.items()}
+        ordinals = {day: date.fromisoformat(day).toordinal() for day in set(days.values())}
+        counts = {"inserted": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        deltas: dict[tuple[str, str], list] = {}
+
+        def bump(day: str, pid: str, revenue: float, cogs: float, units: int, lines: int, costed: int) -> None:
+            d = deltas.setdefault((day, pid), [0.0, 0.0, 0, 0, 0])
+            d[0] += revenue
+            d[1] += cogs
+            d[2] += units
+            d[3] += lines
+            d[4] += costed
+
+        with self._lock:
+            conn = self.conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = self._existing(business_id, list(incoming))
+                upserts, deletes = [], []
+                for key, item in incoming.items():
+                    old = existing.get(key)
+                    if item.removed:
+                        if old is None:
+                            counts["unchanged"] += 1
+                            continue
+                        bump(old[0], old[1], -old[2], -old[3], -old[4], -1, -old[5])
+                        deletes.append((business_id, key))
+                        counts["removed"] += 1
+                        continue
+
+                    cost = costs.cost_at(item.product_id, ordinals[days[key]])
+                    new = (
+                        days[key],
+                        item.product_id,
+                        item.unit_price * item.quantity,
+                        cost * item.quantity if cost is not None else 0.0,
+                        item.quantity,
+                        int(cost is not None),
+                    )
+                    if old == new:
+                        counts["unchanged"] += 1
+                        continue
+                    if old is not None:
+                        bump(old[0], old[1], -old[2], -old[3], -old[4], -1, -old[5])
+                        counts["updated"] += 1
+                    else:
+                        counts["inserted"] += 1
+                    bump(new[0], new[1], new[2], new[3], new[4], 1, new[5])
+                    upserts.append((business_id, key, *new))
+
+                conn.executemany(
+                    "INSERT OR REPLACE INTO profit_lines (business_id, line_key, day, product_id, revenue, cogs, units, costed)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    upserts,
+                )
+                conn.executemany("DELETE FROM profit_lines WHERE business_id = ? AND line_key = ?", deletes)
+                conn.executemany(
+                    _UPSERT_BUCKET, [(business_id, day, pid, *d) for (day, pid), d in deltas.items()]
+                )
+                # seaux vidés par des suppressions / déplacements de date
+                conn.executemany(
+                    "DELETE FROM profit_daily WHERE business_id = ? AND day = ? AND product_id = ? AND lines <= 0",
+                    [(business_id, day, pid) for (day, pid), d in deltas.items() if d[3] < 0],
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return counts
+
+    def _existing(self, business_id: int, keys: list[str]) -> dict[str, tuple]:
+        found = {}
+        for start in range(0, len(keys), _LOOKUP_BATCH):
+            chunk = keys[start:start + _LOOKUP_BATCH]
+            rows = self.conn.execute(
+                "SELECT line_key, day, product_id, revenue, cogs, units, costed FROM profit_lines"
+                f" WHERE business_id = ? AND line_key IN ({','.join('?' * len(chunk))})",
+                (business_id, *chunk),
+            )
+            for key, *rest in rows:
+                found[key] = tuple(rest)
+        return found
+
+    def snapshots(self, business_id: int, period_start: str, period_end: str) -> list[dict]:
+        """Snapshots de la période (bornes incluses), même forme que /profit/compute, par premier jour de vente."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT product_id, SUM(revenue), SUM(cogs), SUM(units), SUM(lines), SUM(costed_lines)"
+                " FROM profit_daily WHERE business_id = ? AND day BETWEEN ? AND ?"
+                " GROUP BY product_id ORDER BY MIN(day), product_id",
+                (business_id, sale_day(period_start), sale_day(period_end)),
+            ).fetchall()
+        return [
+            snapshot_row(pid, revenue, cogs, units, costed == lines, period_start, period_end)
+            for pid, revenue, cogs, units, lines, costed in rows
+        ]
+
+    def stats(self, business_id: int) -> dict:
+        with self._lock:
+            lines, first, last = self.conn.execute(
+                "SELECT COUNT(*), MIN(day), MAX(day) FROM profit_lines WHERE business_id = ?", (business_id,)
+            ).fetchone()
+            buckets = self.conn.execute(
+                "SELECT COUNT(*) FROM profit_daily WHERE business_id = ?", (business_id,)
+            ).fetchone()[0]
+        return {"lines": lines, "daily_buckets": buckets, "first_day": first, "last_day": last}
+
+
+profit_store = ProfitStore()
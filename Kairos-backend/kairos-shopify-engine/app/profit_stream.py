@@ -0,0 +1,110 @@
+"""
+Ingestion NDJSON pour /profit/compute-stream (gros historiques de commandes).
+
+Format du corps (application/x-ndjson, envoyé en chunked par Node) :
+    ligne 1   : {"business_id", "period_start", "period_end", "product_costs": [...]}
+    lignes 2+ : {"product_id", "quantity", "unit_price"}   (une ligne de commande chacune)
+Les lignes vides sont ignorées.
+
+Le corps est lu morceau par morceau ; les lignes complètes sont regroupées par lots de
+STREAM_CHUNK_LINES, validées une à une (pydantic, mêmes règles que OrderItemInput) puis
+repliées dans un ProfitAccumulator. Mémoire bornée par un lot + un tableau par produit, quel que soit
+le nombre de lignes.
+"""
+
+import asyncio
+import os
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+
+from app.models import OrderItemInput, ProfitStreamHeader
+from app.profit_engine import ProfitAccumulator, cost_book
+
+STREAM_CHUNK_LINES = int(os.getenv("SHOPIFY_ENGINE_STREAM_CHUNK_LINES", "50000"))
+# une ligne sans fin (pas de \n) ne doit pas faire grossir le tampon indéfiniment ;
+# l'en-tête porte tous les coûts du catalogue, d'où une limite large
+MAX_LINE_BYTES = int(os.getenv("SHOPIFY_ENGINE_STREAM_MAX_LINE_BYTES", str(16 << 20)))
+
+
+class StreamFormatError(ValueError):
+    """Flux NDJSON invalide ; line = numéro de ligne (1 = en-tête)."""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+        self.message = message
+
+
+def _first_error(e: ValidationError) -> str:
+    err = e.errors()[0]
+    field = ".".join(str(p) for p in err["loc"] if not isinstance(p, int))
+    return f"{field}: {err['msg']}" if field else err["msg"]
+
+
+def _validate_batch(lines: list[bytes], numbers: list[int]) -> list[OrderItemInput]:
+    # une ligne = un objet : valider les lignes jointes en un seul tableau JSON laissait
+    # passer « {...},{...} » sur une ligne (ou un objet réparti sur deux lignes) ;
+    # ligne par ligne, pydantic n'est pas plus lent (~190 ms pour 50 000 lignes dans les deux cas)
+    validate = OrderItemInput.model_validate_json
+    items = []
+    for number, line in zip(numbers, lines):
+        try:
+            items.append(validate(line))
+        except ValidationError as e:
+            raise StreamFormatError(number, _first_error(e)) from None
+    return items
+
+
+async def _lines(body: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, bytes]]:
+    """(numéro de ligne, ligne non vide), sans jamais garder plus d'une ligne incomplète."""
+    buffer = b""
+    number = 0
+    async for chunk in body:
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\n")
+        for line in complete:
+            number += 1
+            line = line.strip()
+            if line:
+                yield number, line
+        if len(buffer) > MAX_LINE_BYTES:
+            raise StreamFormatError(number + 1, f"line longer than {MAX_LINE_BYTES} bytes")
+    if buffer.strip():
+        yield number + 1, buffer.strip()
+
+
+async def compute_from_stream(body: AsyncIterator[bytes]) -> dict:
+    """Même réponse que /profit/compute, plus le nombre de lignes de commande lues."""
+    lines = _lines(body)
+    try:
+        number, raw = await anext(lines)
+    except StopAsyncIteration:
+        raise StreamFormatError(1, "empty body, expected a header line") from None
+    try:
+        header = ProfitStreamHeader.model_validate_json(raw)
+    except ValidationError as e:
+        raise StreamFormatError(number, _first_error(e)) from None
+
+    acc = ProfitAccumulator(cost_book(header.product_costs))
+    batch: list[bytes] = []
+    numbers: list[int] = []
+
+    def fold(batch: list[bytes], numbers: list[int]) -> None:
+        acc.add_items(_validate_batch(batch, numbers))
+
+    async for number, raw in lines:
+        batch.append(raw)
+        numbers.append(number)
+        if len(batch) >= STREAM_CHUNK_LINES:
+            # validation + agrégation hors de la boucle d'événements (~50 ms par lot)
+            await asyncio.to_thread(fold, batch, numbers)
+            batch, numbers = [], []
+    if batch:
+        await asyncio.to_thread(fold, batch, numbers)
+
+    return {
+        "business_id": header.business_id,
+        "snapshots": acc.snapshots(header.period_start, header.period_end),
+        "lines": acc.lines,
+    }
@@ -0,0 +1,63 @@
+"""
+Préchauffage après démarrage + état de readiness (/ready).
+
+Le lifespan lance warm_up() en tâche de fond : uvicorn ouvre le port sans attendre,
+pendant que le client OpenAI (import openai + httpx) se construit dans un thread.
+/health = le process vit ; /ready = 200 seulement une fois le préchauffage fini.
+"""
+
+import asyncio
+import os
+import time
+
+from app.insight_cache import insight_cache
+from app.insight_runs import insight_runs
+from app.openai_client import get_async_client
+from app.profit_store import profit_store
+
+# SHOPIFY_ENGINE_WARMUP=0 : aucun préchauffage, /ready répond 200 tout de suite
+WARMUP_ENABLED = os.getenv("SHOPIFY_ENGINE_WARMUP", "1") == "1"
+
+_state = {"ready": False, "started_at": time.time(), "warmup": {}}
+
+
+def _timed(name: str, fn) -> None:
+    t0 = time.perf_counter()
+    entry = {}
+    try:
+        fn()
+    except Exception as e:
+        # ex. OPENAI_API_KEY absente : les insights passeront par les templates de repli
+        entry["error"] = f"{type(e).__name__}: {e}"
+    entry["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    _state["warmup"][name] = entry
+
+
+async def warm_up() -> None:
+    try:
+        await asyncio.to_thread(_timed, "openai_async_client", get_async_client)
+        # ouverture SQLite + schéma du store de profit (/profit/sync, /profit/snapshots)
+        await asyncio.to_thread(_timed, "profit_store", lambda: profit_store.conn)
+        await asyncio.to_thread(_timed, "insight_cache", lambda: insight_cache.conn)
+        await asyncio.to_thread(_timed, "insight_runs", lambda: insight_runs.conn)
+    finally:
+        _state["ready"] = True
+
+
+def start_warm_up() -> asyncio.Task | None:
+    if not WARMUP_ENABLED:
+        _state["ready"] = True
+        return None
+    return asyncio.create_task(warm_up())
+
+
+def is_ready() -> bool:
+    return _state["ready"]
+
+
+def readiness() -> dict:
+    return {
+        "status": "ready" if _state["ready"] else "warming",
+        "uptime_s": round(time.time() - _state["started_at"], 3),
+        "warmup": _state["warmup"],
+    }
@@ -0,0 +1,59 @@
+"""
+Budget d'import (démarrage à froid) de app.main, mesuré dans des interpréteurs neufs.
+
+    cd kairos-shopify-engine && python -m benchmarks.bench_import [--budget-ms 800] [--runs 5]
+
+Code de sortie 1 si la médiane dépasse le budget, ou si openai est chargé à l'import
+(il doit l'être au premier appel LLM ou par le préchauffage, cf. app/openai_client.py).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+MODULE = "app.main"
+LAZY_MODULES = ("openai", "httpx")
+DEFAULT_BUDGET_MS = 800.0
+
+_PROBE = (
+    "import json, sys, time; t0 = time.perf_counter(); import {module}; "
+    "print(json.dumps({{'ms': (time.perf_counter() - t0) * 1000, "
+    "'loaded': [m for m in {lazy!r} if m in sys.modules]}}))"
+)
+
+
+def probe() -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=MODULE, lazy=LAZY_MODULES)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", DEFAULT_BUDGET_MS)))
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    probe()  # compile les .pyc, hors mesure
+    results = [probe() for _ in range(args.runs)]
+    median = statistics.median(r["ms"] for r in results)
+    loaded = sorted({m for r in results for m in r["loaded"]})
+    print(f"import {MODULE}: médiane {median:.1f} ms (min {min(r['ms'] for r in results):.1f}, budget {args.budget_ms:.0f})")
+
+    failed = False
+    if median > args.budget_ms:
+        print(f"ÉCHEC : {median:.1f} ms > budget {args.budget_ms:.0f} ms")
+        failed = True
+    if loaded:
+        print(f"ÉCHEC : chargé à l'import (doit être paresseux) : {', '.join(loaded)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Rédaction des insights : un appel LLM par fait (6 en parallèle) vs write_insights (appels groupés).
+
+    cd kairos-shopify-engine && python -m benchmarks.bench_insight_batch [--facts 40] [--latency-ms 900]
+
+Aucun appel OpenAI : un faux client compte les tokens de prompt (~4 caractères / token,
+même estimation que le découpage) et simule la latence d'une complétion
+(--latency-ms + --ms-per-output-token x tokens générés). Il renvoie un texte déterministe
+par fait : la parité vérifie que chaque fait reçoit le même texte dans les deux modes,
+puis qu'une entrée absente de la réponse groupée retombe sur _fallback pour ce fait seul.
+Cache désactivé. Code de sortie 1 si une vérification échoue.
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+from types import SimpleNamespace
+
+from app import insight_writer
+from app.insight_cache import InsightCache
+from app.insight_engine import detect
+from benchmarks.bench_insights import make_request
+
+_BLOCK = re.compile(r"^\[(\d+)\]\n(.*?)(?=\n\n\[\d+\]\n|\Z)", re.S | re.M)
+_OUTPUT_TOKENS_PER_TEXT = 70
+
+
+def fake_text(prompt: str) -> dict:
+    product = prompt.splitlines()[0]
+    return {"title": f"T {product}", "message": f"M {product}", "action": "Act now.", "next_step": "Check in 7 days."}
+
+
+class FakeAsyncClient:
+    def __init__(self, latency_ms: float, ms_per_output_token: float, drop: frozenset[str] = frozenset()) -> None:
+        self.latency_ms = latency_ms
+        self.ms_per_output_token = ms_per_output_token
+        self.drop = drop
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _respond(self, messages) -> tuple[SimpleNamespace, float]:
+        self.calls += 1
+        self.prompt_tokens += sum(len(m["content"]) // 4 + 1 for m in messages)
+        prompt = messages[-1]["content"]
+        blocks = _BLOCK.findall(prompt)
+        if blocks:
+            entries = [{"index": int(i), **fake_text(body)} for i, body in blocks if body not in self.drop]
+            content = json.dumps({"insights": entries})
+        else:
+            entries = [None]
+            content = json.dumps(fake_text(prompt))
+        delay = (self.latency_ms + self.ms_per_output_token * _OUTPUT_TOKENS_PER_TEXT * len(entries)) / 1000
+        response = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(total_tokens=len(prompt) // 4 + _OUTPUT_TOKENS_PER_TEXT * len(entries)),
+        )
+        return response, delay
+
+    async def create(self, model, messages, **kwargs):
+        response, delay = self._respond(messages)
+        await asyncio.sleep(delay)
+        return response
+
+
+def per_fact(facts: list[dict]) -> list[dict]:
+    """Ancien chemin de compute_insights : un appel par insight, 6 en parallèle."""
+    async def one(gate: asyncio.Semaphore, fact: dict) -> dict:
+        async with gate:
+            return (await insight_writer.write_insights([fact], business_id=1))[0]
+
+    async def all_facts() -> list[dict]:
+        gate = asyncio.Semaphore(6)
+        return await asyncio.gather(*(one(gate, f) for f in facts))
+
+    return asyncio.run(all_facts())
+
+
+def batched(facts: list[dict]) -> list[dict]:
+    return asyncio.run(insight_writer.write_insights(facts, business_id=1))
+
+
+def run(facts: list[dict], fn, client: FakeAsyncClient) -> tuple[list[dict], float]:
+    insight_writer.get_async_client = lambda: client
+    t0 = time.perf_counter()
+    out = fn(facts)
+    return out, (time.perf_counter() - t0) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--facts", type=int, default=40)
+    parser.add_argument("--latency-ms", type=float, default=900.0)
+    parser.add_argument("--ms-per-output-token", type=float, default=10.0)
+    args = parser.parse_args()
+
+    insight_writer.insight_cache = InsightCache(enabled=False)
+    facts = detect(make_request(100_000))[:args.facts]
+
+    rows = []
+    for label, fn in (("per fact", per_fact), ("batched", batched)):
+        client = FakeAsyncClient(args.latency_ms, args.ms_per_output_token)
+        out, ms = run(facts, fn, client)
+        rows.append(out)
+        print(f"{label:<9} {len(facts):>4} facts  {client.calls:>3} calls  "
+              f"~{client.prompt_tokens:>7,} prompt tokens  {ms:8.1f} ms (simulated latency)")
+
+    ok = rows[0] == rows[1]
+    print(f"parity (same text per fact): {'ok' if ok else 'FAIL'}")
+
+    if len(facts) <= insight_writer.BATCH_CHUNKS:
+        # un fait par appel (parallèle) : pas de réponse groupée à tronquer
+        return 0 if ok else 1
+
+    # une entrée manquante dans la réponse groupée -> repli pour ce fait uniquement
+    client = FakeAsyncClient(0, 0, drop=frozenset({insight_writer._build_prompt(facts[1])}))
+    partial, _ = run(facts, batched, client)
+    fallback_title = insight_writer._fallback(facts[1])[0]
+    isolated = partial[1]["title"] == fallback_title and partial[:1] + partial[2:] == rows[1][:1] + rows[1][2:]
+    print(f"missing entry falls back alone: {'ok' if isolated else 'FAIL'}")
+    return 0 if ok and isolated else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Enrichissement des insights sous charge : N marchands simultanés sur un seul worker.
+
+    cd kairos-shopify-engine && python -m benchmarks.bench_insight_concurrency [--merchants 50] [--facts 40]
+
+Faux client OpenAI asynchrone (cf. bench_insight_batch), cache désactivé. Les N marchands
+lancent write_insights en même temps, puis un petit marchand (2 faits) arrive quand la
+file est pleine. Affiche le pic de threads du process, le pic de complétions en vol
+(borné par --concurrency) et la latence du petit marchand comparée aux gros : avec le
+limiteur servi à tour de rôle par business, il ne passe pas derrière toute la file.
+Code de sortie 1 si la borne de concurrence est dépassée.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import threading
+import time
+
+from app import insight_writer, llm_deadline
+from app.insight_cache import InsightCache
+from app.insight_engine import detect
+from app.llm_breaker import CircuitBreaker
+from app.llm_limiter import LLMLimiter
+from benchmarks.bench_insight_batch import FakeAsyncClient
+from benchmarks.bench_insights import make_request
+
+
+class PeakClient(FakeAsyncClient):
+    """Compte le pic de complétions simultanées."""
+
+    def __init__(self, *args) -> None:
+        super().__init__(*args)
+        self.active = 0
+        self.peak = 0
+
+    async def create(self, model, messages, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            return await super().create(model, messages, **kwargs)
+        finally:
+            self.active -= 1
+
+
+async def run(args, facts: list[dict]) -> dict:
+    peak_threads = threading.active_count()
+    done = asyncio.Event()
+
+    async def sample_threads():
+        nonlocal peak_threads
+        while not done.is_set():
+            peak_threads = max(peak_threads, threading.active_count())
+            await asyncio.sleep(0.01)
+
+    async def merchant(business_id: int, merchant_facts: list[dict]) -> float:
+        t0 = time.perf_counter()
+        await insight_writer.write_insights(merchant_facts, business_id)
+        return time.perf_counter() - t0
+
+    sampler = asyncio.create_task(sample_threads())
+    big = [asyncio.create_task(merchant(b, facts)) for b in range(args.merchants)]
+    await asyncio.sleep(args.small_after_s)
+    small = await merchant(10_000, facts[:2])
+    big_s = await asyncio.gather(*big)
+    done.set()
+    await sampler
+    return {"big": big_s, "small": small, "peak_threads": peak_threads}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--merchants", type=int, default=50)
+    parser.add_argument("--facts", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--tpm", type=int, default=1_000_000)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--ms-per-output-token", type=float, default=2.0)
+    parser.add_argument("--small-after-s", type=float, default=1.0)
+    args = parser.parse_args()
+
+    insight_writer.insight_cache = InsightCache(enabled=False)
+    # équité seule : ni délestage ni disjoncteur (cf. bench_llm_breaker)
+    limiter = LLMLimiter(args.concurrency, args.tpm, shed_queue=0)
+    llm_deadline.llm_breaker = CircuitBreaker(enabled=False)
+    insight_writer.llm_limiter = limiter
+    client = PeakClient(args.latency_ms, args.ms_per_output_token)
+    insight_writer.get_async_client = lambda: client
+    facts = detect(make_request(100_000))[:args.facts]
+
+    t0 = time.perf_counter()
+    result = asyncio.run(run(args, facts))
+    wall = time.perf_counter() - t0
+    big = sorted(result["big"])
+    print(f"{args.merchants} merchants x {len(facts)} facts + 1 merchant x 2 facts   wall {wall:6.1f} s")
+    print(f"  completions {client.calls}  peak in flight {client.peak} (limit {args.concurrency})  "
+          f"peak threads {result['peak_threads']}")
+    print(f"  big merchants  median {statistics.median(big):6.1f} s   max {big[-1]:6.1f} s")
+    print(f"  small merchant (arrived after {args.small_after_s:.0f} s)  {result['small']:6.1f} s")
+    return 0 if client.peak <= args.concurrency else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
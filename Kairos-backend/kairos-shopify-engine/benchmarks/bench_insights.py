@@ -0,0 +1,174 @@
+"""
+Détection des insights : six détecteurs à passes séparées vs contexte partagé (app/insight_engine.py).
+
+    cd kairos-shopify-engine && python -m benchmarks.bench_insights [--sizes 10000,100000,1000000]
+
+Mesure uniquement la détection des faits bruts (write_insights / LLM exclus). Vérifie
+la parité stricte (mêmes faits, même ordre) puis affiche les temps.
+Code de sortie 1 si une taille diverge.
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from app.insight_engine import (
+    DISCOUNT_THRESHOLD, LOW_MARGIN_THRESHOLD, REFUND_IMPACT_THRESHOLD, detect,
+)
+from app.models import InsightRequest, OrderItemDetailInput, SnapshotInput
+from benchmarks.bench_profit import make_columns
+
+
+def legacy_detect(req) -> list[dict]:
+    """Copie conforme des anciens détecteurs (une passe chacun), dans l'ordre historique."""
+    facts = []
+
+    eligible = [s for s in req.snapshots if s.has_cost and s.gross_profit > 0]
+    if eligible:
+        top = max(eligible, key=lambda s: s.gross_profit)
+        facts.append({
+            "type": "true_top_product", "product_id": top.product_id, "product_name": top.product_name,
+            "severity": "info", "value": top.gross_profit,
+            "facts": {"gross_profit": round(top.gross_profit, 2), "gross_margin_pct": round(top.gross_margin_pct, 1),
+                      "units_sold": top.units_sold},
+        })
+
+    for s in req.snapshots:
+        if s.has_cost and s.gross_margin_pct < 0:
+            loss_per_unit = round(-s.gross_profit / s.units_sold, 2) if s.units_sold > 0 else 0
+            facts.append({
+                "type": "negative_margin_alert", "product_id": s.product_id, "product_name": s.product_name,
+                "severity": "critical", "value": round(s.gross_margin_pct, 1),
+                "facts": {"margin_percent": round(s.gross_margin_pct, 1), "total_loss": round(-s.gross_profit, 2),
+                          "loss_per_unit": loss_per_unit, "units_sold": s.units_sold},
+            })
+
+    for s in req.snapshots:
+        if s.has_cost and 0 <= s.gross_margin_pct < LOW_MARGIN_THRESHOLD:
+            facts.append({
+                "type": "low_margin_warning", "product_id": s.product_id, "product_name": s.product_name,
+                "severity": "warning", "value": round(s.gross_margin_pct, 1),
+                "facts": {"margin_percent": round(s.gross_margin_pct, 1), "gross_profit": round(s.gross_profit, 2),
+                          "threshold": LOW_MARGIN_THRESHOLD, "units_sold": s.units_sold},
+            })
+
+    for s in req.snapshots:
+        if not s.has_cost and s.units_sold > 0:
+            facts.append({
+                "type": "missing_cost_alert", "product_id": s.product_id, "product_name": s.product_name,
+                "severity": "warning", "value": s.units_sold,
+                "facts": {"units_sold": s.units_sold, "revenue": round(s.revenue, 2)},
+            })
+
+    refund_map: dict[str, float] = {}
+    revenue_map: dict[str, float] = {}
+    for item in req.order_items:
+        pid = item.product_id
+        refund_map[pid] = refund_map.get(pid, 0.0) + item.refunded_amount
+        revenue_map[pid] = revenue_map.get(pid, 0.0) + item.unit_price * item.quantity
+    name_map = {s.product_id: s.product_name for s in req.snapshots}
+    for pid, total_refund in refund_map.items():
+        revenue = revenue_map.get(pid, 0.0)
+        if revenue <= 0 or total_refund <= 0:
+            continue
+        refund_rate = total_refund / revenue
+        if refund_rate >= REFUND_IMPACT_THRESHOLD:
+            facts.append({
+                "type": "refund_impact", "product_id": pid, "product_name": name_map.get(pid, pid),
+                "severity": "warning", "value": round(refund_rate * 100, 2),
+                "facts": {"total_refund": round(total_refund, 2), "revenue": round(revenue, 2),
+                          "refund_rate": round(refund_rate * 100, 1)},
+            })
+
+    discount_map: dict[str, float] = {}
+    catalogue_revenue_map: dict[str, float] = {}
+    for item in req.order_items:
+        if item.original_price <= 0:
+            continue
+        pid = item.product_id
+        catalogue_revenue = item.original_price * item.quantity
+        discount = catalogue_revenue - item.unit_price * item.quantity
+        catalogue_revenue_map[pid] = catalogue_revenue_map.get(pid, 0.0) + catalogue_revenue
+        discount_map[pid] = discount_map.get(pid, 0.0) + discount
+    name_map = {s.product_id: s.product_name for s in req.snapshots}
+    for pid, total_discount in discount_map.items():
+        catalogue_rev = catalogue_revenue_map.get(pid, 0.0)
+        if catalogue_rev <= 0 or total_discount <= 0:
+            continue
+        discount_rate = total_discount / catalogue_rev
+        if discount_rate >= DISCOUNT_THRESHOLD:
+            facts.append({
+                "type": "discount_erosion", "product_id": pid, "product_name": name_map.get(pid, pid),
+                "severity": "info", "value": round(discount_rate * 100, 2),
+                "facts": {"total_discount": round(total_discount, 2), "catalogue_rev": round(catalogue_rev, 2),
+                          "discount_rate": round(discount_rate * 100, 1)},
+            })
+    return facts
+
+
+def make_request(n: int, seed: int = 7) -> InsightRequest:
+    """Lignes du catalogue de bench_profit : remises, prix catalogue parfois inconnus, remboursements."""
+    product_ids, quantities, unit_prices, costs = make_columns(n, seed)
+    rng = np.random.default_rng(seed + 3)
+    original = np.round(unit_prices * rng.choice([1.0, 1.0, 1.1, 1.3], n), 2)
+    original[rng.random(n) < 0.2] = 0.0
+    refunded = np.where(rng.random(n) < 0.05, np.round(unit_prices * quantities, 2), 0.0)
+    items = [
+        OrderItemDetailInput.model_construct(
+            product_id=p, quantity=q, unit_price=u, original_price=o, refunded_amount=r
+        )
+        for p, q, u, o, r in zip(product_ids, quantities.tolist(), unit_prices.tolist(), original.tolist(), refunded.tolist())
+    ]
+
+    revenue: dict[str, float] = {}
+    units: dict[str, int] = {}
+    for item in items:
+        revenue[item.product_id] = revenue.get(item.product_id, 0.0) + item.unit_price * item.quantity
+        units[item.product_id] = units.get(item.product_id, 0) + item.quantity
+    snapshots = []
+    for i, (pid, rev) in enumerate(revenue.items()):
+        # coûts tirés autour du revenu pour couvrir marges négatives, faibles et saines
+        cogs = rev * (0.6 + 0.5 * ((i * 7919) % 100) / 100) if pid in costs else 0.0
+        gp = rev - cogs
+        snapshots.append(SnapshotInput.model_construct(
+            product_id=pid, product_name=f"Product {i}", revenue=round(rev, 2), cogs=round(cogs, 2),
+            gross_profit=round(gp, 2), gross_margin_pct=round(gp / rev * 100, 2) if rev > 0 else 0.0,
+            units_sold=units[pid], has_cost=pid in costs,
+        ))
+    return InsightRequest.model_construct(
+        business_id=1, period_start="2026-01-01", period_end="2026-01-31", snapshots=snapshots, order_items=items
+    )
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, (time.perf_counter() - t0) * 1000
+
+
+def run_size(n: int) -> bool:
+    req = make_request(n)
+    expected, legacy_ms = _timed(legacy_detect, req)
+    got, fused_ms = _timed(detect, req)
+    ok = got == expected
+    print(
+        f"{n:>10,} lines  {len(req.snapshots):>6} snapshots  {len(got):>6} facts  "
+        f"legacy {legacy_ms:8.1f} ms  fused {fused_ms:8.1f} ms  "
+        f"x{legacy_ms / max(fused_ms, 1e-6):4.1f}  parity {'ok' if ok else 'FAIL'}",
+        flush=True,
+    )
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    args = parser.parse_args()
+    results = [run_size(int(s)) for s in args.sizes.split(",")]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
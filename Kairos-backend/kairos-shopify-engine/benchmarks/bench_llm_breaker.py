@@ -0,0 +1,201 @@
+"""
+Panne OpenAI simulée : rédaction des insights avec et sans disjoncteur, puis délestage.
+
+    cd kairos-shopify-engine && python -m benchmarks.bench_llm_breaker [--rate 20] [--outage-s 4]
+
+1) Charge continue (--rate runs /s, --facts faits chacun, budget --budget-ms) sur un
+   faux client asynchrone : sain, puis en panne pendant --outage-s (la moitié des appels
+   échoue après --fail-ms, l'autre ne répond jamais), puis rétabli. Temps réduits :
+   fenêtre 2 s, ouverture 1 s. Affiche, pendant la panne, la latence des runs et le
+   nombre d'appels envoyés à OpenAI ; puis le délai entre la fin de la panne et le
+   premier texte LLM servi, et les transitions d'état du disjoncteur.
+2) Rafale de --burst runs d'un coup sur un limiteur de 4 complétions : profondeur de
+   file et latence max, sans délestage puis avec un seuil de --shed-queue.
+3) Réponse dégradée du chat quand le disjoncteur est ouvert (sans appel au client).
+Code de sortie 1 si le disjoncteur ne s'ouvre pas, ne se referme pas après la panne,
+ou si le chat appelle le client alors qu'il est ouvert.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from app import insight_writer, llm_deadline, llm_service
+from app.chat_context_builder import build_context, degraded_answer
+from app.insight_cache import InsightCache
+from app.insight_engine import detect
+from app.llm_breaker import CircuitBreaker
+from app.llm_deadline import deadline_scope
+from app.llm_limiter import LLMLimiter
+from app.models import ChatRequest
+from benchmarks.bench_insight_batch import _BLOCK, fake_text
+from benchmarks.bench_insights import make_request
+
+
+class OutageClient:
+    def __init__(self, median_ms: float, fail_ms: float, outage: tuple[float, float], seed: int = 9) -> None:
+        self.median_s = median_ms / 1000
+        self.fail_s = fail_ms / 1000
+        self.outage = outage
+        self.rnd = random.Random(seed)
+        self.calls = 0
+        self.outage_calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, timeout=None, **kwargs):
+        self.calls += 1
+        now = time.monotonic()
+        if self.outage[0] <= now < self.outage[1]:
+            self.outage_calls += 1
+            if self.rnd.random() < 0.5:
+                await asyncio.sleep(self.fail_s)
+                raise RuntimeError("502 Bad Gateway")
+            await asyncio.sleep(3600)
+        await asyncio.sleep(self.median_s * self.rnd.lognormvariate(0, 0.3))
+        prompt = messages[-1]["content"]
+        blocks = _BLOCK.findall(prompt)
+        if blocks:
+            content = json.dumps({"insights": [{"index": int(i), **fake_text(body)} for i, body in blocks]})
+        else:
+            content = json.dumps(fake_text(prompt))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+def _install(breaker: CircuitBreaker, limiter: LLMLimiter, client) -> None:
+    llm_deadline.llm_breaker = breaker
+    insight_writer.llm_limiter = limiter
+    insight_writer.get_async_client = llm_service.get_async_client = lambda: client
+    llm_deadline._stats.clear()
+
+
+async def one_run(facts: list[dict], business_id: int, budget_s: float) -> tuple[float, float, int]:
+    t0 = time.monotonic()
+    with deadline_scope(budget_s):
+        out = await insight_writer.write_insights(facts, business_id)
+    llm_texts = sum(1 for o in out if o["title"].startswith("T "))
+    return t0, time.monotonic() - t0, llm_texts
+
+
+async def outage_load(facts: list[dict], args, client: OutageClient) -> list[tuple[float, float, int]]:
+    runs = []
+    end = client.outage[1] + args.recovery_s
+    business_id = 0
+    while time.monotonic() < end:
+        runs.append(asyncio.ensure_future(one_run(facts, business_id, args.budget_ms / 1000)))
+        business_id += 1
+        await asyncio.sleep(1 / args.rate)
+    return await asyncio.gather(*runs)
+
+
+def _q(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000 if ordered else 0.0
+
+
+def outage_mode(label: str, enabled: bool, facts: list[dict], args) -> tuple[bool, dict]:
+    breaker = CircuitBreaker(enabled=enabled, window_s=2.0, min_calls=10, open_s=1.0, probes=2, slow_call_s=1.0)
+    start = time.monotonic() + args.healthy_s
+    client = OutageClient(args.median_ms, args.fail_ms, (start, start + args.outage_s))
+    _install(breaker, LLMLimiter(concurrency=10_000, tokens_per_minute=10**12), client)
+    runs = asyncio.run(outage_load(facts, args, client))
+
+    during = [d for t0, d, _ in runs if client.outage[0] <= t0 < client.outage[1]]
+    recovered = [t0 + d for t0, d, texts in runs if t0 >= client.outage[1] and texts]
+    recovery_s = min(recovered) - client.outage[1] if recovered else float("inf")
+    print(
+        f"{label:<12} outage: runs {len(during):4d}  p50 {_q(during, 0.5):6.0f} ms  p90 {_q(during, 0.9):6.0f} ms  "
+        f"calls to OpenAI {client.outage_calls:5d}  |  first LLM text {recovery_s:5.2f} s after recovery",
+        flush=True,
+    )
+    metrics = breaker.metrics()
+    ok = recovery_s < args.recovery_s
+    if enabled:
+        print(f"             transitions {metrics['transitions']}  rejected {metrics['rejected']}  state {metrics['state']}")
+        ok = ok and metrics["transitions"].get("closed->open", 0) > 0 and metrics["state"] == "closed"
+    return ok, metrics
+
+
+async def burst(facts: list[dict], args, limiter: LLMLimiter) -> tuple[float, int, int]:
+    depth = 0
+
+    async def watch() -> None:
+        nonlocal depth
+        while True:
+            depth = max(depth, limiter._waiting)
+            await asyncio.sleep(0.005)
+
+    watcher = asyncio.ensure_future(watch())
+    runs = await asyncio.gather(*(one_run(facts, b, args.budget_ms / 1000 * 4) for b in range(args.burst)))
+    watcher.cancel()
+    return max(d for _, d, _ in runs), depth, sum(t for _, _, t in runs)
+
+
+def shedding(facts: list[dict], args) -> None:
+    for label, shed_queue in (("no shedding", 0), (f"shed at {args.shed_queue}", args.shed_queue)):
+        limiter = LLMLimiter(concurrency=4, tokens_per_minute=10**12, shed_queue=shed_queue)
+        client = OutageClient(args.median_ms, args.fail_ms, (0.0, 0.0))
+        _install(CircuitBreaker(), limiter, client)
+        slowest, depth, texts = asyncio.run(burst(facts, args, limiter))
+        print(
+            f"{label:<12} burst {args.burst} runs: max queue {depth:4d}  slowest run {slowest * 1000:6.0f} ms  "
+            f"calls {client.calls:4d}  shed {limiter.shed:4d}  LLM texts {texts}",
+            flush=True,
+        )
+
+
+def chat_while_open(args) -> bool:
+    breaker = CircuitBreaker(open_s=60.0)
+    breaker._move("open", "bench")
+    client = OutageClient(args.median_ms, args.fail_ms, (0.0, 0.0))
+    _install(breaker, LLMLimiter(), client)
+    req = ChatRequest.model_validate({
+        "business_id": 1,
+        "question": "Where am I losing money?",
+        "snapshots": [
+            {"product_id": "1", "product_name": "Cap", "revenue": 900, "cogs": 1000, "gross_profit": -100,
+             "gross_margin_pct": -11.1, "units_sold": 30, "has_cost": True},
+            {"product_id": "2", "product_name": "Hoodie", "revenue": 4000, "cogs": 2200, "gross_profit": 1800,
+             "gross_margin_pct": 45.0, "units_sold": 80, "has_cost": True},
+            {"product_id": "3", "product_name": "Mug", "revenue": 300, "cogs": 0, "gross_profit": 300,
+             "gross_margin_pct": 100.0, "units_sold": 25, "has_cost": False},
+        ],
+        "insights": [],
+    })
+    t0 = time.perf_counter()
+    answer = asyncio.run(llm_service.ask_llm(build_context(req), req.question, [], fallback=degraded_answer(req)))
+    print(f"chat while open ({(time.perf_counter() - t0) * 1000:.1f} ms, {client.calls} call): {answer}")
+    return client.calls == 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=float, default=20.0)
+    parser.add_argument("--facts", type=int, default=16)
+    parser.add_argument("--median-ms", type=float, default=150.0)
+    parser.add_argument("--fail-ms", type=float, default=800.0)
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--healthy-s", type=float, default=2.0)
+    parser.add_argument("--outage-s", type=float, default=4.0)
+    parser.add_argument("--recovery-s", type=float, default=4.0)
+    parser.add_argument("--burst", type=int, default=100)
+    parser.add_argument("--shed-queue", type=int, default=16)
+    args = parser.parse_args()
+
+    insight_writer.insight_cache = InsightCache(enabled=False)
+    facts = detect(make_request(100_000))[:args.facts]
+
+    ok = True
+    for label, enabled in (("no breaker", False), ("breaker", True)):
+        mode_ok, _ = outage_mode(label, enabled, facts, args)
+        ok = ok and mode_ok
+    shedding(facts, args)
+    ok = chat_while_open(args) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Latence de /insights/compute (rédaction) face à une queue lente : sans budget, budget seul, budget + hedge.
+
+    cd kairos-shopify-engine && python -m benchmarks.bench_llm_deadline [--runs 400] [--budget-ms 1500]
+
+Faux client asynchrone à latence lourde en queue (temps réduits pour que le bench tienne
+en quelques secondes) : médiane --median-ms, 8 % d'appels x8 plus lents, 1 % qui ne
+répondent jamais avant --hang-ms (socket bloquée). Chaque run rédige --facts faits
+(plusieurs complétions groupées), --parallel runs à la fois, cache désactivé.
+Affiche p50 / p90 / p99 / max par run et la part d'insights servis en texte de repli.
+Code de sortie 1 si, avec budget, un run dépasse le budget de plus de 10 %.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from app import insight_writer, llm_deadline
+from app.insight_cache import InsightCache
+from app.insight_engine import detect
+from app.llm_breaker import CircuitBreaker
+from app.llm_deadline import deadline_scope
+from app.llm_limiter import LLMLimiter
+from benchmarks.bench_insight_batch import _BLOCK, fake_text
+from benchmarks.bench_insights import make_request
+
+
+class TailClient:
+    def __init__(self, median_ms: float, hang_ms: float, seed: int = 5) -> None:
+        self.median_s = median_ms / 1000
+        self.hang_s = hang_ms / 1000
+        self.rnd = random.Random(seed)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, timeout=None, **kwargs):
+        self.calls += 1
+        r = self.rnd.random()
+        delay = self.median_s * self.rnd.lognormvariate(0, 0.3)
+        if r < 0.01:
+            delay = self.hang_s
+        elif r < 0.09:
+            delay *= 8
+        await asyncio.sleep(delay)
+        prompt = messages[-1]["content"]
+        blocks = _BLOCK.findall(prompt)
+        if blocks:
+            content = json.dumps({"insights": [{"index": int(i), **fake_text(body)} for i, body in blocks]})
+        else:
+            content = json.dumps(fake_text(prompt))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+async def one_run(facts: list[dict], business_id: int, budget_s: float) -> tuple[float, int]:
+    t0 = time.perf_counter()
+    with deadline_scope(budget_s):
+        out = await insight_writer.write_insights(facts, business_id)
+    fallbacks = sum(1 for o in out if not o["title"].startswith("T "))
+    return time.perf_counter() - t0, fallbacks
+
+
+async def run_mode(facts: list[dict], args, budget_s: float) -> tuple[list[float], int]:
+    latencies, fallbacks = [], 0
+    for start in range(0, args.runs, args.parallel):
+        batch = await asyncio.gather(*(
+            one_run(facts, b, budget_s) for b in range(start, min(start + args.parallel, args.runs))
+        ))
+        latencies += [l for l, _ in batch]
+        fallbacks += sum(f for _, f in batch)
+    return latencies, fallbacks
+
+
+def _q(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=400)
+    parser.add_argument("--parallel", type=int, default=20)
+    parser.add_argument("--facts", type=int, default=16)
+    parser.add_argument("--median-ms", type=float, default=150.0)
+    parser.add_argument("--hang-ms", type=float, default=20_000.0)
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    args = parser.parse_args()
+
+    insight_writer.insight_cache = InsightCache(enabled=False)
+    insight_writer.llm_limiter = LLMLimiter(concurrency=10_000, tokens_per_minute=10**12)
+    # budget et hedge seuls : les blocages simulés ouvriraient le disjoncteur (cf. bench_llm_breaker)
+    llm_deadline.llm_breaker = CircuitBreaker(enabled=False)
+    facts = detect(make_request(100_000))[:args.facts]
+    budget_s = args.budget_ms / 1000
+
+    modes = (
+        ("no budget", args.hang_ms / 1000 * 2, False),
+        ("budget", budget_s, False),
+        ("budget + hedge", budget_s, True),
+    )
+    ok = True
+    for label, budget, hedge in modes:
+        client = TailClient(args.median_ms, args.hang_ms)
+        insight_writer.get_async_client = lambda: client
+        llm_deadline.HEDGE_ENABLED = hedge
+        llm_deadline.LLM_CALL_TIMEOUT_S = budget
+        llm_deadline._stats.clear()
+        latencies, fallbacks = asyncio.run(run_mode(facts, args, budget))
+        total = args.runs * len(facts)
+        print(
+            f"{label:<15} p50 {_q(latencies, 0.5):7.0f} ms  p90 {_q(latencies, 0.9):7.0f} ms  "
+            f"p99 {_q(latencies, 0.99):7.0f} ms  max {max(latencies) * 1000:7.0f} ms  "
+            f"fallback {fallbacks / total:6.1%}  calls {client.calls}",
+            flush=True,
+        )
+        if label != "no budget" and max(latencies) > budget_s * 1.1:
+            ok = False
+    stats = llm_deadline.metrics().get("insights_batch", {})
+    print(f"  hedge stats: {stats.get('hedges')} hedges, {stats.get('hedge_wins')} won, p90 {stats.get('p90_ms')} ms")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
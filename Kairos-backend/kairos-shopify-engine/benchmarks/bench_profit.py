@@ -0,0 +1,224 @@
+"""
+/profit/compute : ancienne boucle par ligne vs moteur colonnaire (app/profit_engine.py).
+
+    cd kairos-shopify-engine && python -m benchmarks.bench_profit [--sizes 10000,1000000,10000000]
+
+Pour chaque taille : vérifie la parité (snapshots identiques, ordre compris) puis
+affiche les temps et le gain. Jusqu'à --models-max lignes, le chemin complet est
+mesuré à partir des modèles pydantic (ce que reçoit la route) ; au-delà, seules les
+colonnes sont générées (10M objets pydantic ne tiennent pas en mémoire ici).
+Second tableau : coûts datés (effective_date), chaque produit coûté changeant de prix
+jusqu'à --cost-changes fois dans l'année ; référence = bisect ligne par ligne dans
+l'historique trié du produit.
+Code de sortie 1 si une taille diverge.
+"""
+
+import argparse
+import random
+import sys
+import time
+from bisect import bisect_right
+from datetime import date
+
+import numpy as np
+
+from app.models import OrderItemInput, ProductCostInput
+from app.profit_engine import CostBook, cost_book, compute_snapshots, compute_snapshots_columnar
+
+PERIOD = ("2026-01-01", "2026-01-31")
+DEFAULT_SIZES = "10000,1000000,10000000"
+DEFAULT_DATED_SIZES = "10000,1000000"
+YEAR_START = date(2025, 1, 1).toordinal()
+CATALOG = 20_000
+COSTED_SHARE = 0.9
+
+
+def legacy_snapshots(product_ids, quantities, unit_prices, cost_map, period_start, period_end) -> list[dict]:
+    """Copie conforme de l'ancienne boucle de compute_profit (référence de parité)."""
+    revenue_map: dict[str, float] = {}
+    cogs_map: dict[str, float] = {}
+    units_map: dict[str, int] = {}
+    for pid, quantity, unit_price in zip(product_ids, quantities, unit_prices):
+        revenue_map[pid] = revenue_map.get(pid, 0.0) + unit_price * quantity
+        units_map[pid] = units_map.get(pid, 0) + quantity
+        cost = cost_map.get(pid)
+        if cost is not None:
+            cogs_map[pid] = cogs_map.get(pid, 0.0) + cost * quantity
+
+    snapshots = []
+    for pid, revenue in revenue_map.items():
+        cogs = cogs_map.get(pid, 0.0)
+        gross_profit = revenue - cogs
+        margin_pct = (gross_profit / revenue * 100) if revenue > 0 else 0.0
+        snapshots.append({
+            "product_id": pid,
+            "period_start": period_start,
+            "period_end": period_end,
+            "revenue": round(revenue, 2),
+            "cogs": round(cogs, 2),
+            "gross_profit": round(gross_profit, 2),
+            "gross_margin_pct": round(margin_pct, 2),
+            "units_sold": units_map[pid],
+            "has_cost": pid in cost_map,
+        })
+    return snapshots
+
+
+def make_columns(n: int, seed: int = 7):
+    """Catalogue de CATALOG produits (popularité inégale), prix à 2 décimales, quelques retours."""
+    rng = np.random.default_rng(seed)
+    catalog = [f"gid://shopify/Product/{100000 + i}" for i in range(CATALOG)]
+    codes = np.minimum(rng.zipf(1.3, n) - 1, CATALOG - 1)
+    product_ids = [catalog[c] for c in codes.tolist()]
+    quantities = rng.integers(1, 6, n)
+    quantities[rng.random(n) < 0.01] *= -1
+    unit_prices = np.round(rng.uniform(2, 400, n), 2)
+    unit_prices[rng.random(n) < 0.005] = 0.0
+
+    rnd = random.Random(seed)
+    costs = {pid: round(rnd.uniform(1, 150), 2) for pid in catalog if rnd.random() < COSTED_SHARE}
+    return product_ids, quantities, unit_prices, costs
+
+
+def make_cost_history(costs: dict[str, float], max_changes: int, seed: int = 7) -> list[ProductCostInput]:
+    """Coûts fournisseur datés : 1 à max_changes dates d'effet par produit, envoyés dans le désordre."""
+    rnd = random.Random(seed)
+    history = []
+    for pid, cost in costs.items():
+        for _ in range(rnd.randint(1, max_changes)):
+            effective = date.fromordinal(YEAR_START + rnd.randrange(365)).isoformat()
+            history.append(ProductCostInput(
+                product_id=pid, cost_per_unit=round(cost * rnd.uniform(0.8, 1.2), 2), effective_date=effective
+            ))
+    rnd.shuffle(history)
+    return history
+
+
+def legacy_dated_snapshots(product_ids, ordinals, quantities, unit_prices, history, period_start, period_end) -> list[dict]:
+    """Boucle par ligne + bisect dans l'historique trié du produit (mêmes règles que CostBook)."""
+    by_product: dict[str, list[tuple[int, int, float]]] = {}
+    for position, c in enumerate(history):
+        by_product.setdefault(c.product_id, []).append((date.fromisoformat(c.effective_date).toordinal(), position, c.cost_per_unit))
+    sorted_history = {}
+    for pid, entries in by_product.items():
+        entries.sort()
+        sorted_history[pid] = ([e[0] for e in entries], [e[2] for e in entries])
+
+    revenue_map: dict[str, float] = {}
+    cogs_map: dict[str, float] = {}
+    units_map: dict[str, int] = {}
+    for pid, day, quantity, unit_price in zip(product_ids, ordinals, quantities, unit_prices):
+        revenue_map[pid] = revenue_map.get(pid, 0.0) + unit_price * quantity
+        units_map[pid] = units_map.get(pid, 0) + quantity
+        entry = sorted_history.get(pid)
+        if entry is not None:
+            # avant la première date d'effet : coût le plus ancien
+            cost = entry[1][max(bisect_right(entry[0], day) - 1, 0)]
+            cogs_map[pid] = cogs_map.get(pid, 0.0) + cost * quantity
+    return [
+        {
+            "product_id": pid,
+            "period_start": period_start,
+            "period_end": period_end,
+            "revenue": round(revenue, 2),
+            "cogs": round(cogs_map.get(pid, 0.0), 2),
+            "gross_profit": round(revenue - cogs_map.get(pid, 0.0), 2),
+            "gross_margin_pct": round(((revenue - cogs_map.get(pid, 0.0)) / revenue * 100) if revenue > 0 else 0.0, 2),
+            "units_sold": units_map[pid],
+            "has_cost": pid in sorted_history,
+        }
+        for pid, revenue in revenue_map.items()
+    ]
+
+
+def run_dated_size(n: int, max_changes: int) -> bool:
+    product_ids, quantities, unit_prices, costs = make_columns(n)
+    ordinals = YEAR_START + np.random.default_rng(11).integers(-30, 365, n)  # quelques ventes avant tout coût daté
+    history = make_cost_history(costs, max_changes)
+    q_list, p_list, o_list = quantities.tolist(), unit_prices.tolist(), ordinals.tolist()
+    expected, legacy_ms = _timed(legacy_dated_snapshots, product_ids, o_list, q_list, p_list, history, *PERIOD)
+    del q_list, p_list, o_list
+
+    def engine():
+        return compute_snapshots_columnar(
+            product_ids, quantities, unit_prices, cost_book(history), *PERIOD, ordinals=ordinals
+        )
+
+    got, engine_ms = _timed(engine)
+    ok = got == expected
+    print(
+        f"{n:>10,} lines  {len(history):>7,} dated costs  "
+        f"legacy+bisect {legacy_ms:9.1f} ms  engine {engine_ms:8.1f} ms  "
+        f"x{legacy_ms / max(engine_ms, 1e-6):5.1f}  parity {'ok' if ok else 'FAIL'}",
+        flush=True,
+    )
+    return ok
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, (time.perf_counter() - t0) * 1000
+
+
+def run_size(n: int, models_max: int) -> bool:
+    product_ids, quantities, unit_prices, costs = make_columns(n)
+    row = {"lines": n}
+
+    if n <= models_max:
+        items = [
+            OrderItemInput(product_id=p, quantity=q, unit_price=u)
+            for p, q, u in zip(product_ids, quantities.tolist(), unit_prices.tolist())
+        ]
+        cost_items = [ProductCostInput(product_id=p, cost_per_unit=c) for p, c in costs.items()]
+
+        def legacy_from_models():
+            cost_map = {c.product_id: c.cost_per_unit for c in cost_items}
+            return legacy_snapshots(
+                [i.product_id for i in items], [i.quantity for i in items], [i.unit_price for i in items],
+                cost_map, *PERIOD,
+            )
+
+        expected, row["legacy_ms"] = _timed(legacy_from_models)
+        got, row["engine_ms"] = _timed(compute_snapshots, items, cost_items, *PERIOD)
+        del items, cost_items
+    else:
+        q_list, p_list = quantities.tolist(), unit_prices.tolist()
+        expected, row["legacy_ms"] = _timed(legacy_snapshots, product_ids, q_list, p_list, costs, *PERIOD)
+        del q_list, p_list
+        got, row["engine_ms"] = _timed(
+            compute_snapshots_columnar, product_ids, quantities, unit_prices, CostBook.from_map(costs), *PERIOD
+        )
+
+    ok = got == expected
+    source = "models" if n <= models_max else "columns"
+    print(
+        f"{n:>10,} lines  {len(got):>6} products  [{source}]  "
+        f"legacy {row['legacy_ms']:9.1f} ms  engine {row['engine_ms']:8.1f} ms  "
+        f"x{row['legacy_ms'] / max(row['engine_ms'], 1e-6):5.1f}  parity {'ok' if ok else 'FAIL'}",
+        flush=True,
+    )
+    if not ok:
+        diff = next(i for i, (a, b) in enumerate(zip(got, expected)) if a != b) if len(got) == len(expected) else None
+        print(f"  first difference at snapshot {diff}: {got[diff] if diff is not None else len(got)} != "
+              f"{expected[diff] if diff is not None else len(expected)}")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    parser.add_argument("--models-max", type=int, default=1_000_000)
+    parser.add_argument("--dated-sizes", default=DEFAULT_DATED_SIZES)
+    parser.add_argument("--cost-changes", type=int, default=24, help="0 = pas de scénario coûts datés")
+    args = parser.parse_args()
+
+    results = [run_size(int(s), args.models_max) for s in args.sizes.split(",")]
+    if args.cost_changes and args.dated_sizes:
+        print(f"dated costs (1-{args.cost_changes} changes per product)")
+        results += [run_dated_size(int(s), args.cost_changes) for s in args.dated_sizes.split(",")]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
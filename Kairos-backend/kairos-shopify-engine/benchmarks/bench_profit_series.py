@@ -0,0 +1,97 @@
+"""
+/profit/series (une passe, toutes granularités) vs un /profit/compute par seau.
+
+    cd kairos-shopify-engine && python -m benchmarks.bench_profit_series [--lines 1000000]
+
+Un an de lignes datées. Référence = ce que fait le dashboard aujourd'hui : pour chaque
+seau, filtrer les lignes du seau puis recalculer (moteur colonnaire, sans le coût JSON
+des allers-retours). Parité vérifiée seau par seau à 0,01 près (unités exactes).
+Code de sortie 1 si une série diverge.
+"""
+
+import argparse
+import math
+import sys
+import time
+from datetime import date
+from itertools import compress
+
+import numpy as np
+
+from app.profit_engine import CostBook, compute_snapshots_columnar
+from app.profit_series import compute_series_columnar
+from benchmarks.bench_profit import make_columns
+
+PERIOD = ("2025-01-01", "2025-12-31")
+GRANULARITIES = ["day", "week", "month"]
+_FIELDS = ("revenue", "cogs", "gross_profit", "gross_margin_pct")
+
+
+def make_dated(n: int, seed: int = 7):
+    product_ids, quantities, unit_prices, costs = make_columns(n, seed)
+    lo = date.fromisoformat(PERIOD[0]).toordinal()
+    ordinals = lo + np.random.default_rng(seed + 2).integers(0, 365, n)
+    return product_ids, ordinals, quantities, unit_prices, CostBook.from_map(costs)
+
+
+def per_bucket(product_ids, ordinals, quantities, unit_prices, costs, starts: list[str], ends: list[str]) -> list:
+    out = []
+    for start, end in zip(starts, ends):
+        mask = (ordinals >= date.fromisoformat(start).toordinal()) & (ordinals <= date.fromisoformat(end).toordinal())
+        out.append(compute_snapshots_columnar(
+            list(compress(product_ids, mask.tolist())), quantities[mask], unit_prices[mask], costs, start, end
+        ))
+    return out
+
+
+def same_series(series: dict, products: list[str], expected: list[list[dict]]) -> bool:
+    got: list[dict] = [{} for _ in expected]
+    for i, (b, p) in enumerate(zip(series["bucket"], series["product"])):
+        got[b][products[p]] = {f: series[f][i] for f in (*_FIELDS, "units_sold")}
+    for rows, snapshots in zip(got, expected):
+        if len(rows) != len(snapshots):
+            return False
+        for s in snapshots:
+            r = rows.get(s["product_id"])
+            if r is None or r["units_sold"] != s["units_sold"]:
+                return False
+            if any(not math.isclose(r[f], s[f], abs_tol=0.011) for f in _FIELDS):
+                return False
+    return True
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    product_ids, ordinals, quantities, unit_prices, costs = make_dated(args.lines)
+
+    t0 = time.perf_counter()
+    result = compute_series_columnar(
+        product_ids, ordinals, quantities, unit_prices, costs, *PERIOD, GRANULARITIES, []
+    )
+    series_ms = (time.perf_counter() - t0) * 1000
+    print(f"{args.lines:,} lines  /profit/series day+week+month in one pass: {series_ms:8.1f} ms")
+
+    ok = True
+    total_ms = 0.0
+    for g in GRANULARITIES:
+        s = result["series"][g]
+        t0 = time.perf_counter()
+        expected = per_bucket(product_ids, ordinals, quantities, unit_prices, costs, s["bucket_start"], s["bucket_end"])
+        ms = (time.perf_counter() - t0) * 1000
+        total_ms += ms
+        parity = same_series(s, result["products"], expected)
+        ok = ok and parity
+        print(
+            f"  {g:<5} {len(s['bucket_start']):>4} buckets  {len(s['bucket']):>9,} rows   "
+            f"per-bucket recompute {ms:9.1f} ms  parity {'ok' if parity else 'FAIL'}"
+        )
+    print(f"  speedup vs {sum(len(result['series'][g]['bucket_start']) for g in GRANULARITIES)} recomputes: "
+          f"x{total_ms / max(series_ms, 1e-6):.1f}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
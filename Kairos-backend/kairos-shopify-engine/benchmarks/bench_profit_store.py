@@ -0,0 +1,138 @@
+"""
+Store de profit incrémental (app/profit_store.py) vs recalcul complet d'une période.
+
+    cd kairos-shopify-engine && python -m benchmarks.bench_profit_store [--lines 1000000] [--sync 500]
+
+1. charge un an d'historique (--lines lignes) dans une base SQLite temporaire
+2. mesure une synchro de --sync lignes (80 % nouvelles, 20 % modifiées), puis son renvoi
+   (idempotence : tout doit revenir "unchanged")
+3. mesure la lecture d'un mois et de l'année depuis les seaux journaliers, comparée au
+   recalcul complet (moteur colonnaire) sur les mêmes lignes
+
+Les sommes par seaux ne sont pas faites dans le même ordre que le recalcul : la parité
+est vérifiée à 0,01 près sur les montants (unités et has_cost exacts).
+Code de sortie 1 si l'idempotence ou la parité échoue.
+"""
+
+import argparse
+import math
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from app.models import OrderLineInput
+from app.profit_engine import CostBook, compute_snapshots_columnar
+from app.profit_store import ProfitStore
+from benchmarks.bench_profit import make_columns
+
+BUSINESS_ID = 42
+YEAR = (date(2025, 1, 1), date(2025, 12, 31))
+LOAD_BATCH = 50_000
+
+
+def make_lines(n: int, seed: int = 7):
+    product_ids, quantities, unit_prices, costs = make_columns(n, seed)
+    days = np.random.default_rng(seed + 1).integers(0, 365, n)
+    order_dates = [(YEAR[0] + timedelta(days=d)).isoformat() for d in range(365)]
+    lines = [
+        OrderLineInput.model_construct(
+            line_key=f"li-{i}", order_date=order_dates[d], product_id=p, quantity=q, unit_price=u, removed=False
+        )
+        for i, (p, q, u, d) in enumerate(zip(product_ids, quantities.tolist(), unit_prices.tolist(), days.tolist()))
+    ]
+    return lines, CostBook.from_map(costs)
+
+
+def recompute(lines: list, costs: CostBook, start: str, end: str) -> list[dict]:
+    """Recalcul complet : filtre la période puis moteur colonnaire (ce que fait Node aujourd'hui)."""
+    kept = [l for l in lines if start <= l.order_date <= end]
+    return compute_snapshots_columnar(
+        [l.product_id for l in kept],
+        np.fromiter((l.quantity for l in kept), dtype=np.int64, count=len(kept)),
+        np.fromiter((l.unit_price for l in kept), dtype=np.float64, count=len(kept)),
+        costs, start, end,
+    )
+
+
+def same_snapshots(got: list[dict], expected: list[dict]) -> bool:
+    by_pid = {s["product_id"]: s for s in got}
+    if len(by_pid) != len(expected):
+        return False
+    for e in expected:
+        g = by_pid.get(e["product_id"])
+        if g is None or g["units_sold"] != e["units_sold"] or g["has_cost"] != e["has_cost"]:
+            return False
+        for field in ("revenue", "cogs", "gross_profit", "gross_margin_pct"):
+            if not math.isclose(g[field], e[field], abs_tol=0.011):
+                return False
+    return True
+
+
+def _ms(t0: float) -> float:
+    return (time.perf_counter() - t0) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--sync", type=int, default=500)
+    args = parser.parse_args()
+
+    lines, costs = make_lines(args.lines)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ProfitStore(Path(tmp) / "profit.sqlite")
+
+        t0 = time.perf_counter()
+        for start in range(0, len(lines), LOAD_BATCH):
+            store.apply_lines(BUSINESS_ID, lines[start:start + LOAD_BATCH], costs)
+        print(f"initial load  {args.lines:>10,} lines  {_ms(t0) / 1000:8.1f} s   {store.stats(BUSINESS_ID)}")
+
+        # synchro : nouvelles lignes en fin d'année + quelques lignes existantes modifiées
+        n_changed = args.sync // 5
+        fresh, _ = make_lines(args.sync - n_changed, seed=99)
+        delta = [
+            OrderLineInput.model_construct(**{**l.__dict__, "line_key": f"new-{i}", "order_date": "2025-12-31"})
+            for i, l in enumerate(fresh)
+        ]
+        for l in lines[:n_changed]:
+            delta.append(OrderLineInput.model_construct(**{**l.__dict__, "quantity": l.quantity + 1}))
+
+        t0 = time.perf_counter()
+        counts = store.apply_lines(BUSINESS_ID, delta, costs)
+        sync_ms = _ms(t0)
+        t0 = time.perf_counter()
+        replay = store.apply_lines(BUSINESS_ID, delta, costs)
+        replay_ms = _ms(t0)
+        print(f"sync          {len(delta):>10,} lines  {sync_ms:8.1f} ms  {counts}")
+        print(f"sync replay   {len(delta):>10,} lines  {replay_ms:8.1f} ms  {replay}")
+        idempotent = replay["unchanged"] == len(delta)
+
+        # l'historique complet, tel que Node le renverrait pour un recalcul
+        changed = {l.line_key: l for l in delta}
+        current = [changed.pop(l.line_key, l) for l in lines] + list(changed.values())
+
+        ok = idempotent
+        for label, start, end in (("month", "2025-06-01", "2025-06-30"), ("year", YEAR[0].isoformat(), YEAR[1].isoformat())):
+            t0 = time.perf_counter()
+            got = store.snapshots(BUSINESS_ID, start, end)
+            store_ms = _ms(t0)
+            t0 = time.perf_counter()
+            expected = recompute(current, costs, start, end)
+            full_ms = _ms(t0)
+            parity = same_snapshots(got, expected)
+            ok = ok and parity
+            print(
+                f"snapshots {label:<5} {len(got):>6} products  store {store_ms:8.1f} ms  "
+                f"full recompute {full_ms:8.1f} ms  parity {'ok' if parity else 'FAIL'}"
+            )
+    if not idempotent:
+        print("FAIL: replaying a sync changed the aggregates")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
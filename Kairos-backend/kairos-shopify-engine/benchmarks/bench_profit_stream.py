@@ -0,0 +1,145 @@
+"""
+/profit/compute-stream : mémoire crête du serveur sur un gros historique NDJSON.
+
+    cd kairos-shopify-engine && python -m benchmarks.bench_profit_stream [--lines 5000000] [--budget-mb 512]
+
+Lance uvicorn dans un sous-process, envoie l'historique en chunked (généré à la volée),
+puis lit VmHWM du serveur.
+Les snapshots reçus sont comparés à l'ancienne boucle, rejouée sur les mêmes lignes.
+Code de sortie 1 si la parité échoue ou si la mémoire crête dépasse le budget.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_profit import CATALOG, COSTED_SHARE, PERIOD, legacy_snapshots
+
+SEND_CHUNK_BYTES = 1 << 16
+
+
+def _catalog(seed: int):
+    rnd = random.Random(seed)
+    catalog = [f"gid://shopify/Product/{100000 + i}" for i in range(CATALOG)]
+    costs = {pid: round(rnd.uniform(1, 150), 2) for pid in catalog if rnd.random() < COSTED_SHARE}
+    return catalog, costs
+
+
+def order_lines(n: int, seed: int):
+    """(product_id, quantity, unit_price) déterministes, générés paresseusement."""
+    catalog, _ = _catalog(seed)
+    rnd = random.Random(seed + 1)
+    weights = [1 / (i + 1) for i in range(CATALOG)]
+    picks = rnd.choices(range(CATALOG), weights=weights, k=min(n, 1 << 16))
+    for i in range(n):
+        quantity = rnd.randint(1, 5) * (-1 if rnd.random() < 0.01 else 1)
+        yield catalog[picks[i % len(picks)] if i % 3 else rnd.randrange(CATALOG)], quantity, round(rnd.uniform(2, 400), 2)
+
+
+def ndjson_body(n: int, seed: int):
+    _, costs = _catalog(seed)
+    header = {
+        "business_id": 1,
+        "period_start": PERIOD[0],
+        "period_end": PERIOD[1],
+        "product_costs": [{"product_id": p, "cost_per_unit": c} for p, c in costs.items()],
+    }
+    buffer = [json.dumps(header) + "\n"]
+    size = len(buffer[0])
+    for pid, quantity, unit_price in order_lines(n, seed):
+        line = f'{{"product_id":"{pid}","quantity":{quantity},"unit_price":{unit_price!r}}}\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= SEND_CHUNK_BYTES:
+            yield "".join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _wait_ready(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=5_000_000)
+    parser.add_argument("--budget-mb", type=float, default=512.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    port = _free_port()
+    env = dict(os.environ, SHOPIFY_ENGINE_WARMUP="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        _wait_ready(port)
+        idle_mb = _peak_rss_mb(server.pid)
+        t0 = time.perf_counter()
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+        conn.request(
+            "POST", "/profit/compute-stream", body=ndjson_body(args.lines, args.seed),
+            headers={"Content-Type": "application/x-ndjson"}, encode_chunked=True,
+        )
+        resp = conn.getresponse()
+        payload = json.loads(resp.read())
+        elapsed = time.perf_counter() - t0
+        peak_mb = _peak_rss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+    if resp.status != 200:
+        print(f"FAIL: HTTP {resp.status} {payload}")
+        return 1
+
+    _, costs = _catalog(args.seed)
+    rows = list(zip(*order_lines(args.lines, args.seed))) if args.lines else [(), (), ()]
+    expected = legacy_snapshots(*rows, costs, *PERIOD)
+    ok = payload["snapshots"] == expected and payload["lines"] == args.lines
+
+    print(
+        f"{args.lines:,} lines  {len(payload['snapshots'])} products  {elapsed:.1f} s "
+        f"({args.lines / max(elapsed, 1e-9):,.0f} lines/s)  server RSS idle {idle_mb:.0f} MB, "
+        f"peak {peak_mb:.0f} MB (budget {args.budget_mb:.0f})  parity {'ok' if ok else 'FAIL'}"
+    )
+    failed = not ok
+    if peak_mb > args.budget_mb:
+        print(f"FAIL: peak RSS {peak_mb:.0f} MB > budget {args.budget_mb:.0f} MB")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
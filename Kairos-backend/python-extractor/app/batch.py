@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import zipfile
+from pathlib import PurePosixPath
+from tempfile import SpooledTemporaryFile
+from typing import Any, Optional
+
+from app.extractor.extractor import resolve_file_type
+from app.extractor.streaming import StreamSink, make_sink
+
+# -----------------------------------------------------------------------------
+# Extraction par lot (/extract-batch): plusieurs fichiers ou une archive ZIP
+# -----------------------------------------------------------------------------
+# EXTRACTOR_BATCH_MAX_BYTES : budget d'octets par lot (s'applique a l'upload, et
+#                             separement aux octets decompresses lus dans les archives)
+# EXTRACTOR_BATCH_MAX_FILES : nb max de fichiers (membres d'archive compris)
+# EXTRACTOR_ZIP_MEMORY_LIMIT: une archive plus grosse est spoolee telle quelle sur disque
+#                             (jamais decompressee sur disque)
+BATCH_MAX_BYTES = int(os.getenv("EXTRACTOR_BATCH_MAX_BYTES", str(256 * 1024 * 1024)))
+BATCH_MAX_FILES = int(os.getenv("EXTRACTOR_BATCH_MAX_FILES", "100"))
+ZIP_MEMORY_LIMIT = int(os.getenv("EXTRACTOR_ZIP_MEMORY_LIMIT", str(32 * 1024 * 1024)))
+
+MEMBER_CHUNK_BYTES = 64 * 1024
+ON_ERROR_POLICIES = ("continue", "abort")
+
+
+class BatchMemberError(Exception):
+    """Erreur isolee a un fichier du lot (ligne NDJSON "error", le lot continue)."""
+
+    def __init__(self, code: str) -> None:
+        super().__init__(code)
+        self.code = code
+
+
+class ByteBudget:
+    """Octets restants pour le lot; partage par tous les membres."""
+
+    def __init__(self, max_bytes: int, used: int = 0) -> None:
+        self.max_bytes = max_bytes
+        self.used = used
+        self._lock = threading.Lock()  # membres lus en parallele (threads)
+
+    def take(self, n: int) -> None:
+        with self._lock:
+            self.used += n
+            if self.used > self.max_bytes:
+                raise BatchMemberError("BATCH_BYTE_BUDGET_EXCEEDED")
+
+
+class ZipSink(StreamSink):
+    """Archive recue en flux: memoire jusqu'a ZIP_MEMORY_LIMIT puis fichier temporaire."""
+
+    file_type = "zip"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._file = SpooledTemporaryFile(max_size=ZIP_MEMORY_LIMIT)
+
+    def feed(self, chunk: bytes) -> bool:
+        super().feed(chunk)
+        self._file.write(chunk)
+        return False
+
+    def finish(self, max_chars: int) -> tuple[str, list]:
+        # une archive n'a pas de texte propre: ses membres sont extraits un par un (open_zip)
+        raise BatchMemberError("NESTED_ZIP")
+
+    def open_zip(self) -> zipfile.ZipFile:
+        self._file.seek(0)
+        try:
+            return zipfile.ZipFile(self._file)
+        except zipfile.BadZipFile:
+            raise BatchMemberError("INVALID_ZIP")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class SkippedSink(StreamSink):
+    """Partie refusee a l'ouverture (type non supporte...): octets comptes, rien n'est garde."""
+
+    def __init__(self, error: str) -> None:
+        super().__init__()
+        self.saturated = True
+        self.error = error
+
+    def finish(self, max_chars: int) -> tuple[str, list]:
+        raise BatchMemberError(self.error)
+
+
+def is_zip_upload(filename: Optional[str], content_type: Optional[str]) -> bool:
+    ctype = (content_type or "").split(";")[0].strip().lower()
+    return (filename or "").lower().endswith(".zip") or ctype in ("application/zip", "application/x-zip-compressed")
+
+
+def open_batch_sink(filename: Optional[str], content_type: Optional[str], profile: bool = False) -> StreamSink:
+    if is_zip_upload(filename, content_type):
+        return ZipSink()
+    try:
+        return make_sink(resolve_file_type(None, filename or ""), profile=profile)
+    except ValueError:
+        return SkippedSink("UNSUPPORTED_FILE_TYPE")
+
+
+def zip_members(zf: zipfile.ZipFile) -> list[zipfile.ZipInfo]:
+    """Fichiers de l'archive (dossiers, metadonnees macOS et fichiers caches ignores)."""
+    members = []
+    for info in zf.infolist():
+        path = PurePosixPath(info.filename)
+        if info.is_dir() or "__MACOSX" in path.parts or path.name.startswith("."):
+            continue
+        members.append(info)
+    return members
+
+
+def read_zip_member(
+    zf: zipfile.ZipFile,
+    info: zipfile.ZipInfo,
+    budget: ByteBudget,
+    profile: bool = False,
+) -> StreamSink:
+    """
+    Decompresse un membre morceau par morceau dans son sink (thread, hors boucle async).
+    Arret des que le sink est sature: seuls les octets lus comptent dans le budget.
+    """
+    if info.flag_bits & 0x1:
+        raise BatchMemberError("ENCRYPTED_MEMBER")
+    try:
+        sink = make_sink(resolve_file_type(None, info.filename), profile=profile)
+    except ValueError:
+        raise BatchMemberError("UNSUPPORTED_FILE_TYPE")
+
+    try:
+        with zf.open(info) as f:
+            while True:
+                chunk = f.read(MEMBER_CHUNK_BYTES)
+                if not chunk:
+                    break
+                budget.take(len(chunk))
+                if sink.feed(chunk):
+                    break
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError, EOFError):
+        sink.close()
+        raise BatchMemberError("INVALID_ZIP_MEMBER")
+    except BaseException:
+        sink.close()
+        raise
+    return sink
+
+
+def ndjson_line(obj: dict[str, Any]) -> bytes:
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
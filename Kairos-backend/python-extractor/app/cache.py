@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+# -----------------------------------------------------------------------------
+# Cache d'extraction adresse par contenu (SHA-256 de l'upload + file_type)
+# -----------------------------------------------------------------------------
+# On stocke le contenu extrait + les tables, une seule fois: max_chars et mode sont
+# appliques a la lecture (slice + detection), sans relancer l'extraction.
+# TXT/CSV sont stockes au plafond (MAX_CHARS_CAP). Un PDF est extrait pour le max_chars
+# demande (arret anticipe conserve): l'entree note ce nombre ("chars") et ne sert que les
+# requetes qui en demandent au plus autant; une demande plus longue re-extrait et remplace.
+#
+# EXTRACTOR_CACHE_ENABLED      : "0" pour desactiver
+# EXTRACTOR_CACHE_MEMORY_ITEMS : entrees gardees en LRU memoire (par worker uvicorn)
+# EXTRACTOR_CACHE_DIR          : tier disque partage entre workers
+# EXTRACTOR_CACHE_DISK_BYTES   : taille max du tier disque (eviction des plus anciens acces)
+CACHE_ENABLED = os.getenv("EXTRACTOR_CACHE_ENABLED", "1") == "1"
+CACHE_MEMORY_ITEMS = int(os.getenv("EXTRACTOR_CACHE_MEMORY_ITEMS", "256"))
+CACHE_DIR = Path(os.getenv("EXTRACTOR_CACHE_DIR", str(Path(tempfile.gettempdir()) / "kairos-extractor-cache")))
+CACHE_DISK_BYTES = int(os.getenv("EXTRACTOR_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+
+
+def cache_key(sha256_hex: str, file_type: str, variant: str = "") -> str:
+    """variant: resultat different pour le meme contenu (ex: "profile" pour un CSV profile)."""
+    return f"{file_type}-{variant}-{sha256_hex}" if variant else f"{file_type}-{sha256_hex}"
+
+
+def _covers(entry: dict, max_chars: Optional[int]) -> bool:
+    # entrees sans "chars": contenu complet, ou stocke au plafond
+    chars = entry.get("chars")
+    return chars is None or max_chars is None or chars >= max_chars
+
+
+class ExtractionCache:
+    def __init__(
+        self,
+        directory: Path = CACHE_DIR,
+        memory_items: int = CACHE_MEMORY_ITEMS,
+        disk_bytes: int = CACHE_DISK_BYTES,
+        enabled: bool = CACHE_ENABLED,
+    ) -> None:
+        self.directory = directory
+        self.memory_items = memory_items
+        self.disk_bytes = disk_bytes
+        self.enabled = enabled
+        self._memory: OrderedDict[str, dict] = OrderedDict()
+        self._disk_usage: Optional[int] = None
+        self._lock = threading.Lock()
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "too_short": 0,
+            "stores": 0,
+            "evictions": 0,
+            "bypassed": 0,
+        }
+
+    # --- lecture ---
+    def get(self, key: str, max_chars: Optional[int] = None) -> Optional[dict]:
+        """
+        Retourne {"text": ..., "tables": [...], "profile": {...}|None, "chars": int|None} ou None.
+        None aussi si l'entree est tronquee a moins de max_chars caracteres.
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                if not _covers(entry, max_chars):
+                    self.counters["too_short"] += 1
+                    return None
+                self.counters["memory_hits"] += 1
+                return entry
+
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)  # date d'acces pour l'eviction
+        except (OSError, ValueError):
+            with self._lock:
+                self.counters["misses"] += 1
+            return None
+
+        with self._lock:
+            self._remember(key, entry)
+            if not _covers(entry, max_chars):
+                self.counters["too_short"] += 1
+                return None
+            self.counters["disk_hits"] += 1
+        return entry
+
+    # --- ecriture ---
+    def put(
+        self, key: str, text: str, tables: list, profile: Optional[dict] = None, chars: Optional[int] = None
+    ) -> None:
+        """chars: max_chars de l'extraction si le contenu a ete tronque, None s'il est complet."""
+        if not self.enabled:
+            return
+
+        entry = {"text": text, "tables": tables, "profile": profile, "chars": chars}
+        payload = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+
+        with self._lock:
+            self._remember(key, entry)
+            self.counters["stores"] += 1
+
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self._path(key)
+            existed = path.exists()
+            # Ecriture atomique: plusieurs workers uvicorn partagent le repertoire
+            fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_name, path)
+        except OSError:
+            return
+
+        with self._lock:
+            if self._disk_usage is not None and not existed:
+                self._disk_usage += len(payload)
+        self._evict_disk()
+
+    def bypass(self) -> None:
+        """Upload non hachable en entier (lecture arretee tot): pas de cache."""
+        with self._lock:
+            self.counters["bypassed"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "memory_items": len(self._memory),
+                "disk_bytes": self._disk_usage,
+                **self.counters,
+            }
+
+    # --- interne ---
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _remember(self, key: str, entry: dict) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _scan_disk(self) -> list[tuple[float, int, Path]]:
+        files = []
+        for p in self.directory.glob("*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, p))
+        return files
+
+    def _evict_disk(self) -> None:
+        with self._lock:
+            if self._disk_usage is not None and self._disk_usage <= self.disk_bytes:
+                return
+
+        files = self._scan_disk()
+        total = sum(size for _, size, _ in files)
+        evicted = 0
+        for _, size, p in sorted(files):
+            if total <= self.disk_bytes:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self._disk_usage = total
+            self.counters["evictions"] += evicted
+
+
+extraction_cache = ExtractionCache()
@@ -1,4 +1,11 @@
-from __future__ import annotations 
+from __future__ import annotations
+
+import json
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Optional
 
 FINANCE_KEYWORDS = {
     "strong": [
@@ -14,15 +21,103 @@ FINANCE_KEYWORDS = {
     ],
 }
 
+# Poids d'un mot-cle (distinct) par niveau dans le score
+FINANCE_WEIGHTS = {"strong": 3, "medium": 1}
+
+# Fichier JSON optionnel pour etendre les listes sans toucher au code:
+# {"keywords": {"strong": [...], "medium": [...], "autre_niveau": [...]},
+#  "weights": {"autre_niveau": 2}}
+FINANCE_KEYWORDS_FILE = os.getenv("KAIROS_FINANCE_KEYWORDS_FILE")
+
+
+def _load_config(path: Optional[str]) -> tuple[dict[str, list[str]], dict[str, int]]:
+    keywords = {tier: list(kws) for tier, kws in FINANCE_KEYWORDS.items()}
+    weights = dict(FINANCE_WEIGHTS)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            extra = json.load(f)
+        for tier, kws in extra.get("keywords", {}).items():
+            keywords.setdefault(tier, []).extend(kws)
+        weights.update(extra.get("weights", {}))
+    return keywords, weights
+
+
+def _trie_regex(words: list[str]) -> str:
+    """
+    Alternance factorisee par prefixes (trie): le moteur ne teste qu'une branche par
+    caractere, le cout reste ~constant quand on ajoute des centaines de mots.
+    """
+    trie: dict = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node: dict) -> str:
+        end = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 and not end else "(?:" + "|".join(branches) + ")"
+        return body + "?" if end else body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Un seul passage sur le texte: toutes les occurrences (mots entiers, "s" final de
+    pluriel accepte) de tous les mots-cles.
+    """
+
+    def __init__(self, keywords: dict[str, list[str]], weights: dict[str, int]) -> None:
+        self.tiers = list(keywords)
+        self.weights = weights
+        # mot-cle -> (niveau, rang dans sa liste) ; le premier niveau qui le declare gagne
+        self.index: dict[str, tuple[str, int]] = {}
+        for tier, kws in keywords.items():
+            for rank, kw in enumerate(kws):
+                self.index.setdefault(kw.lower(), (tier, rank))
+        # Mots entiers seulement: "account" ne matche plus "accountability", ni "date" "update".
+        # Un "s" final est accepte (factures, montants, payments) et compte pour le mot-cle:
+        # l'ancien scan par sous-chaine comptait ces pluriels. Les autres flexions
+        # (invoiced, dated...) ne sont plus comptees.
+        # Le texte est passe en minuscules une fois (plus rapide que re.IGNORECASE).
+        # Le lookahead sur les premieres lettres evite d'entrer dans le trie a chaque debut de mot.
+        first = "".join(re.escape(ch) for ch in sorted({kw[0] for kw in self.index}))
+        self.pattern = re.compile(r"\b(?=[" + first + r"])(" + _trie_regex(list(self.index)) + r")s?\b")
+
+    def count(self, text: str) -> Counter:
+        """mot-cle -> nombre d'occurrences (pluriels en "s" compris)."""
+        return Counter(self.pattern.findall(text.lower()))
+
+    def scan(self, text: str) -> dict[str, list[int]]:
+        """mot-cle -> positions (debut) de chaque occurrence."""
+        hits: dict[str, list[int]] = {}
+        for m in self.pattern.finditer(text.lower()):
+            hits.setdefault(m.group(1), []).append(m.start())
+        return hits
+
+
+@lru_cache(maxsize=1)
+def get_matcher() -> KeywordMatcher:
+    return KeywordMatcher(*_load_config(FINANCE_KEYWORDS_FILE))
+
+
 def detect_finance_like(text: str) -> tuple[bool, float,list[str]]:
-    t =(text or "").lower()
-    strong_hits =[kw for kw in FINANCE_KEYWORDS["strong"] if kw in t]
-    medium_hits =[kw for kw in FINANCE_KEYWORDS["medium"] if kw in t]
-    
-    score = len(strong_hits) * 3+ len(medium_hits) *1
+    matcher = get_matcher()
+    hits = matcher.count(text or "")
+
+    # Mots-cles distincts par niveau, dans l'ordre des listes
+    by_tier: dict[str, list[str]] = {tier: [] for tier in matcher.tiers}
+    for kw in sorted(hits, key=lambda k: matcher.index[k][1]):
+        by_tier[matcher.index[kw][0]].append(kw)
+
+    score = sum(len(kws) * matcher.weights.get(tier, 1) for tier, kws in by_tier.items())
     confidence = min(score / 10.0, 1.0)
-    
+
     is_finance = confidence >= 0.3
-    detected = (strong_hits[:3] + medium_hits[:2])[:5]
-    
-    return is_finance, round(confidence, 2), detected
\ No newline at end of file
+    detected = (by_tier.get("strong", [])[:3] + by_tier.get("medium", [])[:2])[:5]
+
+    return is_finance, round(confidence, 2), detected
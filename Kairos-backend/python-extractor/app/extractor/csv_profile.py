@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import heapq
+import re
+from array import array
+from collections import Counter
+from operator import itemgetter
+from typing import Optional
+from zlib import crc32
+
+# -----------------------------------------------------------------------------
+# Profil CSV en flux (memoire constante)
+# -----------------------------------------------------------------------------
+# Les lignes sont accumulees par lots de PROFILE_BATCH_ROWS puis transposees en
+# colonnes (map + itemgetter, cote C). Colonnes numeriques: conversion du lot en array('d')
+# puis min/max/somme sur le tableau. Autres colonnes: top-k approximatif
+# (compteur tronque) + nb de valeurs distinctes estime (KMV, k plus petits hash).
+PROFILE_BATCH_ROWS = 8192
+TYPE_SAMPLE = 256          # valeurs par lot utilisees pour deviner le type
+TYPE_SAMPLE_MAX = 4096     # au-dela, le type est considere comme connu (plus de vote)
+TYPE_MAJORITY = 0.9        # part des valeurs echantillonnees requise pour date/decimal
+TOP_K = 10
+TOP_K_CAPACITY = 5000      # compteurs gardes pour le top-k (tronque au double)
+KMV_K = 256                # precision de l'estimation des distincts (~6% d'erreur)
+FREE_TEXT_AVG_LEN = 40
+CATEGORY_MAX_DISTINCT_RATIO = 0.5
+
+_DATE_RE = re.compile(
+    r"^\s*(?:\d{4}[-/]\d{1,2}[-/]\d{1,2}|\d{1,2}[-/]\d{1,2}[-/]\d{2,4})(?:[ T]\d{1,2}:\d{2}(?::\d{2})?.*)?\s*$"
+)
+_ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+_NUMBER_RE = re.compile(r"^\s*[-+(]?\s*[$€£]?\s*[-+]?\d[\d\s .,']*\)?\s*[$€£%]?\s*$")
+_HASH_SPACE = float(1 << 32)
+
+
+def parse_decimal(raw: str) -> Optional[float]:
+    """
+    '1 234,56 $' -> 1234.56 ; '(12.50)' -> -12.5 ; '1,234.56' -> 1234.56.
+    Retourne None si la valeur n'est pas un nombre.
+    """
+    if not _NUMBER_RE.match(raw):
+        return None
+    s = raw.strip()
+    negative = s.startswith("(") and s.endswith(")")
+    s = re.sub(r"[\s $€£%()'+]", "", s)
+    if "," in s and "." in s:
+        # le dernier separateur est la decimale
+        if s.rfind(",") > s.rfind("."):
+            s = s.replace(".", "").replace(",", ".")
+        else:
+            s = s.replace(",", "")
+    elif s.count(",") > 1:
+        s = s.replace(",", "")  # 1,234,567
+    elif "," in s:
+        head, _, tail = s.partition(",")
+        # 1,234 -> milliers ; 12,50 -> decimale
+        s = head + tail if len(tail) == 3 and len(head.lstrip("-")) <= 3 else head + "." + tail
+    try:
+        value = float(s)
+    except ValueError:
+        return None
+    return -value if negative else value
+
+
+class _Column:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.values = 0
+        self.nulls = 0
+        self.votes = {"date": 0, "decimal": 0, "other": 0}
+        self.sampled_len = 0
+        self.sampled = 0
+        self.kind: Optional[str] = None   # fige au premier lot non vide: "decimal" | "other"
+        # numerique
+        self.num_count = 0
+        self.num_invalid = 0
+        self.num_min: Optional[float] = None
+        self.num_max: Optional[float] = None
+        self.num_sum = 0.0
+        # texte / categorie / date
+        self.top: Counter = Counter()
+        self.high_cardinality = False
+        # distincts exacts (len(top)) tant que le compteur n'est pas tronque, KMV ensuite
+        self.kmv: list[int] = []          # tas max (valeurs negees) des KMV_K plus petits hash
+        self.kmv_set: set[int] = set()
+        self.iso_dates = True
+        self.str_min: Optional[str] = None
+        self.str_max: Optional[str] = None
+
+    # --- type ---
+    def _vote(self, sample: list[str]) -> None:
+        for v in sample:
+            if _DATE_RE.match(v):
+                self.votes["date"] += 1
+                if self.iso_dates and not _ISO_DATE_RE.match(v.strip()):
+                    self.iso_dates = False
+            elif parse_decimal(v) is not None:
+                self.votes["decimal"] += 1
+            else:
+                self.votes["other"] += 1
+            self.sampled_len += len(v)
+        self.sampled += len(sample)
+
+    # --- lot ---
+    def add(self, values: list[str]) -> None:
+        self.values += len(values)
+        non_null = list(filter(str.strip, values))
+        self.nulls += len(values) - len(non_null)
+        if not non_null:
+            return
+
+        if self.sampled < TYPE_SAMPLE_MAX:
+            self._vote(non_null[:TYPE_SAMPLE])
+        if self.kind is None:
+            decimal_share = self.votes["decimal"] / max(self.sampled, 1)
+            self.kind = "decimal" if decimal_share >= TYPE_MAJORITY else "other"
+
+        if self.kind == "decimal":
+            self._add_numbers(non_null)
+        else:
+            self._add_strings(non_null)
+
+    def _add_numbers(self, non_null: list[str]) -> None:
+        try:
+            # chemin rapide: tout le lot est deja au format float Python
+            batch = array("d", map(float, non_null))
+        except ValueError:
+            batch = array("d")
+            for v in non_null:
+                x = parse_decimal(v)
+                if x is None:
+                    self.num_invalid += 1
+                else:
+                    batch.append(x)
+        if not batch:
+            return
+        self.num_count += len(batch)
+        self.num_sum += sum(batch)
+        lo, hi = min(batch), max(batch)
+        self.num_min = lo if self.num_min is None else min(self.num_min, lo)
+        self.num_max = hi if self.num_max is None else max(self.num_max, hi)
+
+    def _add_strings(self, non_null: list[str]) -> None:
+        if self.votes["date"] >= TYPE_MAJORITY * self.sampled:
+            lo, hi = min(non_null), max(non_null)
+            self.str_min = lo if self.str_min is None else min(self.str_min, lo)
+            self.str_max = hi if self.str_max is None else max(self.str_max, hi)
+
+        if self.high_cardinality:
+            # texte libre: plus de compteur, seulement l'estimation des distincts
+            self._add_kmv(set(non_null))
+            return
+
+        if self.kmv_set:
+            # compteur deja tronque: les distincts passent par l'estimation
+            distinct = set(non_null)
+            self._add_kmv(distinct)
+            if len(distinct) > CATEGORY_MAX_DISTINCT_RATIO * len(non_null) > TYPE_SAMPLE:
+                # top-k inutile (et couteux) sur du texte libre
+                self.high_cardinality = True
+                self.top.clear()
+                return
+
+        self.top.update(non_null)
+        if len(self.top) > 2 * TOP_K_CAPACITY:
+            if not self.kmv_set:
+                self._add_kmv(self.top)  # toutes les valeurs vues jusqu'ici
+            self.top = Counter(dict(self.top.most_common(TOP_K_CAPACITY)))
+
+    def _add_kmv(self, distinct) -> None:
+        """KMV: garder les KMV_K plus petits hash jamais vus."""
+        # crc32 plutot que hash(): stable d'un process a l'autre (pool, cache)
+        for h in heapq.nsmallest(KMV_K, [crc32(v.encode()) for v in distinct]):
+            if h in self.kmv_set:
+                continue
+            if len(self.kmv) < KMV_K:
+                heapq.heappush(self.kmv, -h)
+                self.kmv_set.add(h)
+            elif h < -self.kmv[0]:
+                self.kmv_set.discard(-heapq.heappushpop(self.kmv, -h))
+                self.kmv_set.add(h)
+
+    # --- resultat ---
+    def approx_distinct(self) -> int:
+        if not self.kmv_set:
+            return len(self.top)  # exact tant que le compteur n'a pas ete tronque
+        if len(self.kmv) < KMV_K:
+            return len(self.kmv)
+        kth = -self.kmv[0] / _HASH_SPACE
+        return int((KMV_K - 1) / kth) if kth > 0 else len(self.kmv)
+
+    def infer_type(self) -> str:
+        sampled = max(self.sampled, 1)
+        if self.kind == "decimal":
+            return "decimal"
+        if self.votes["date"] / sampled >= TYPE_MAJORITY:
+            return "date"
+        non_null = self.values - self.nulls
+        avg_len = self.sampled_len / sampled
+        if (
+            self.high_cardinality
+            or avg_len > FREE_TEXT_AVG_LEN
+            or (non_null > 20 and self.approx_distinct() > CATEGORY_MAX_DISTINCT_RATIO * non_null)
+        ):
+            return "free_text"
+        return "category"
+
+    def to_dict(self) -> dict:
+        col_type = self.infer_type() if self.sampled else "empty"
+        out: dict = {
+            "name": self.name,
+            "type": col_type,
+            "nulls": self.nulls,
+            "non_null": self.values - self.nulls,
+        }
+        if col_type == "decimal":
+            out.update({
+                "min": self.num_min,
+                "max": self.num_max,
+                "sum": round(self.num_sum, 6),
+                "invalid": self.num_invalid,
+            })
+            return out
+
+        out["approx_distinct"] = self.approx_distinct()
+        if col_type == "date" and self.iso_dates:
+            out.update({"min": self.str_min, "max": self.str_max})
+        if col_type == "category":
+            out["top_values"] = [[v, c] for v, c in self.top.most_common(TOP_K)]
+        return out
+
+
+class CsvProfiler:
+    """Alimente ligne par ligne (add_row) ou par paquets (add_rows) ; la 1re ligne est l'en-tete."""
+
+    def __init__(self, batch_rows: int = PROFILE_BATCH_ROWS) -> None:
+        self.batch_rows = batch_rows
+        self.header: Optional[list[str]] = None
+        self.columns: list[_Column] = []
+        self.row_count = 0
+        self._batch: list[list[str]] = []
+
+    def add_row(self, row: list[str]) -> None:
+        if self.header is None:
+            self.header = row
+            self.columns = [_Column(name) for name in row]
+            return
+        self.row_count += 1
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_rows:
+            self._flush()
+
+    def add_rows(self, rows: list[list[str]]) -> None:
+        if self.header is None and rows:
+            self.add_row(rows[0])
+            rows = rows[1:]
+        self.row_count += len(rows)
+        self._batch.extend(rows)
+        if len(self._batch) >= self.batch_rows:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._batch:
+            return
+        width = len(self.columns)
+        # lignes courtes completees par des vides ; colonnes en trop ignorees
+        batch = self._batch
+        if min(map(len, batch)) < width:
+            batch = [r if len(r) >= width else r + [""] * (width - len(r)) for r in batch]
+        for i, col in enumerate(self.columns):
+            col.add(list(map(itemgetter(i), batch)))
+        self._batch = []
+
+    def result(self) -> dict:
+        self._flush()
+        return {
+            "row_count": self.row_count,
+            "columns": [c.to_dict() for c in self.columns],
+        }
@@ -1,29 +1,61 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Optional, Literal
+from typing import Optional, Literal, BinaryIO, Union
 import csv
-from pypdf import PdfReader
+from itertools import islice
 
 from app.detectors.finance import detect_finance_like
+from app.metrics import stage
+from app.extractor.csv_profile import PROFILE_BATCH_ROWS, CsvProfiler
+from app.extractor.pdf_engine import extract_pdf_serial
+from app.extractor.txt_sample import sample_txt
 
 ExtractMode = Literal["auto", "text_only", "tables_only"]
 
+SUPPORTED_TYPES = {"txt", "csv", "pdf"}
+CSV_MAX_ROWS = 200
 
-def _extract_txt(file_path: Path, max_chars: int) -> tuple[str, list]:
-    text = file_path.read_text(encoding="utf-8", errors="ignore")
-    return text[:max_chars], []
 
+def _extract_txt(file_path: Path, max_chars: int, strategy: Optional[str] = None) -> tuple[str, list, dict]:
+    # Lecture bornee (cf. txt_sample): jamais plus de ~max_chars octets par fenetre
+    with stage("txt_read"), file_path.open("rb") as f:
+        text, stats = sample_txt(f, file_path.stat().st_size, max_chars, strategy)
+    return text, [], stats
 
-def _extract_csv(file_path: Path, max_chars: int) -> tuple[str, list]:
-    rows: list[list[str]] = []
-    with file_path.open("r", encoding="utf-8", errors="ignore", newline="") as f:
+
+def _extract_csv(file_path: Path, max_chars: int, profile: bool = False) -> tuple[str, list, Optional[dict]]:
+    with stage("csv_read"), file_path.open("r", encoding="utf-8", errors="ignore", newline="") as f:
         reader = csv.reader(f)
-        for i, row in enumerate(reader):
-            if i >= 200:
+        rows: list[list[str]] = list(islice(reader, CSV_MAX_ROWS))
+        if not profile:
+            text, tables = csv_rows_result(rows, max_chars)
+            return text, tables, None
+
+        # Profil: le reste du fichier est lu par paquets, sans garder les lignes
+        profiler = CsvProfiler()
+        profiler.add_rows(rows)
+        total_rows = len(rows)
+        while True:
+            chunk = list(islice(reader, PROFILE_BATCH_ROWS))
+            if not chunk:
                 break
-            rows.append(row)
+            profiler.add_rows(chunk)
+            total_rows += len(chunk)
+
+    text, tables = csv_rows_result(rows, max_chars)
+    return text, with_total_rows(tables, total_rows), profiler.result()
+
+
+def with_total_rows(tables: list, total_rows: int) -> list:
+    """Profil complet: total_rows devient le vrai nombre de lignes (au lieu du plafond de 200)."""
+    if tables:
+        tables[0]["total_rows"] = total_rows
+    return tables
 
+
+def csv_rows_result(rows: list[list[str]], max_chars: int) -> tuple[str, list]:
+    """Construit (text_sample, tables_preview) a partir des premieres lignes CSV."""
     if not rows:
         return "", []
 
@@ -44,32 +76,11 @@ def _extract_csv(file_path: Path, max_chars: int) -> tuple[str, list]:
     return text, [table]
 
 
-def _extract_pdf(file_path: Path, max_chars: int) -> tuple[str, list]:
+def _extract_pdf(source: Union[Path, BinaryIO, bytes, str], max_chars: int) -> tuple[str, list, dict]:
     # PDF text-layer extraction (no OCR)
-
-    reader = PdfReader(str(file_path))
-    chunks: list[str] = []
-    current_len = 0
-
-    for page in reader.pages:
-        try:
-            page_text = page.extract_text() or ""
-        except Exception:
-            page_text = ""
-
-        if not page_text:
-            continue
-
-        remaining = max_chars - current_len
-        if remaining <= 0:
-            break
-
-        snippet = page_text[:remaining]
-        chunks.append(snippet)
-        current_len += len(snippet)
-
-    text = "\n\n".join(chunks)
-    return text, []
+    # source: chemin sur disque, bytes ou fichier binaire deja ouvert (upload en memoire / spool)
+    # Lecture page par page avec arret des que max_chars est atteint (+ budgets, cf. pdf_engine)
+    return extract_pdf_serial(source, max_chars)
 
 
 def extract_document(
@@ -77,23 +88,104 @@ def extract_document(
     file_type: Optional[str] = None,
     max_chars: int = 35_000,
     mode: ExtractMode = "auto",
+    profile: bool = False,
+    txt_strategy: Optional[str] = None,
 ) -> dict:
     # 1) Determine file_type
+    file_type = resolve_file_type(file_type, file_path.name)
+
+    # 2) Extract
+    extra_limits = None
+    csv_profile = None
+    if file_type == "txt":
+        text_sample, tables_preview, txt_stats = _extract_txt(file_path, max_chars, txt_strategy)
+        extra_limits = {"txt": txt_stats}
+    elif file_type == "csv":
+        # profile=True: tout le fichier est lu (memoire constante) pour profiler les colonnes
+        text_sample, tables_preview, csv_profile = _extract_csv(file_path, max_chars, profile)
+    else:
+        text_sample, tables_preview, pdf_stats = _extract_pdf(file_path, max_chars)
+        extra_limits = {"pdf": pdf_stats}
+
+    return build_result(
+        file_type=file_type,
+        name=file_path.name,
+        size_bytes=file_path.stat().st_size,
+        text_sample=text_sample,
+        tables_preview=tables_preview,
+        max_chars=max_chars,
+        mode=mode,
+        extra_limits=extra_limits,
+        profile=csv_profile,
+    )
+
+
+def finalize_extraction(
+    file_type: str,
+    name: str,
+    size_bytes: int,
+    source: Union[bytes, str, tuple],
+    max_chars: int = 35_000,
+    mode: ExtractMode = "auto",
+    content_chars: Optional[int] = None,
+) -> dict:
+    """
+    Fin d'extraction pour un upload deja recu (execute dans le pool de processus).
+    source: PDF en memoire (bytes) ou spoole (chemin str), sinon (text_sample, tables_preview,
+    profil CSV ou None) deja produits par le sink TXT/CSV.
+    content_chars: si fourni, le PDF est extrait jusqu'a cette borne et le contenu complet
+    est renvoye sous "_content" (pour le cache), la reponse restant coupee a max_chars.
+    """
+    extra_limits = None
+    csv_profile = None
+    if file_type == "pdf":
+        text_sample, tables_preview, pdf_stats = _extract_pdf(source, max(max_chars, content_chars or 0))
+        extra_limits = {"pdf": pdf_stats}
+    else:
+        text_sample, tables_preview, csv_profile = source
+
+    result = build_result(
+        file_type=file_type,
+        name=name,
+        size_bytes=size_bytes,
+        text_sample=text_sample,
+        tables_preview=tables_preview,
+        max_chars=max_chars,
+        mode=mode,
+        extra_limits=extra_limits,
+        profile=csv_profile,
+    )
+    timed_out = bool(extra_limits) and extra_limits["pdf"]["stopped_by"] == "time_budget"
+    if content_chars is not None and not timed_out:
+        # texte partiel (budget temps) non deterministe: pas de mise en cache
+        result["_content"] = {"text": text_sample[:content_chars], "tables": tables_preview, "profile": csv_profile}
+    return result
+
+
+def resolve_file_type(file_type: Optional[str], filename: str) -> str:
     if not file_type:
-        file_type = file_path.suffix.lower().replace(".", "")
+        file_type = Path(filename or "").suffix.lower().replace(".", "")
     else:
         file_type = file_type.lower().replace(".", "")
 
-    if file_type not in {"txt", "csv", "pdf"}:
+    if file_type not in SUPPORTED_TYPES:
         raise ValueError(f"Unsupported file type (for now): {file_type}")
+    return file_type
 
-    # 2) Extract
-    if file_type == "txt":
-        text_sample, tables_preview = _extract_txt(file_path, max_chars)
-    elif file_type == "csv":
-        text_sample, tables_preview = _extract_csv(file_path, max_chars)
-    else:
-        text_sample, tables_preview = _extract_pdf(file_path, max_chars)
+
+def build_result(
+    file_type: str,
+    name: str,
+    size_bytes: int,
+    text_sample: str,
+    tables_preview: list,
+    max_chars: int,
+    mode: ExtractMode = "auto",
+    extra_limits: Optional[dict] = None,
+    profile: Optional[dict] = None,
+) -> dict:
+    """Applique le mode + la detection finance et construit la reponse brute (snake_case)."""
+    text_sample = text_sample[:max_chars]
 
     # 3) Mode handling
     if mode == "text_only":
@@ -102,16 +194,17 @@ def extract_document(
         text_sample = ""
 
     # 4) Meta detection
-    finance_like, confidence, detected_keywords = detect_finance_like(text_sample)
+    with stage("detect"):
+        finance_like, confidence, detected_keywords = detect_finance_like(text_sample)
     kind_guess = "finance" if finance_like else "general"
     if not text_sample.strip() and not tables_preview:
         kind_guess = "unknown"
 
-    return {
+    result = {
         "file": {
             "type": file_type,
-            "size_bytes": file_path.stat().st_size,
-            "name": file_path.name,
+            "size_bytes": size_bytes,
+            "name": name,
         },
         "meta": {
             "kind_guess": kind_guess,
@@ -124,5 +217,9 @@ def extract_document(
         "limits": {
             "max_chars": max_chars,
             "truncated": len(text_sample) >= max_chars,
+            **(extra_limits or {}),
         },
-    }
\ No newline at end of file
+    }
+    if profile is not None:
+        result["profile"] = profile
+    return result
\ No newline at end of file
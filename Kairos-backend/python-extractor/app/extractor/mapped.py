@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import csv
+import io
+import mmap
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+from app.extractor.extractor import (
+    CSV_MAX_ROWS,
+    ExtractMode,
+    _extract_csv,
+    build_result,
+    csv_rows_result,
+)
+from app.extractor.txt_sample import sample_txt
+from app.metrics import stage
+
+# -----------------------------------------------------------------------------
+# Extraction "en place" (fichier deja sous KAIROS_STORAGE_ROOT, lu via mmap)
+# -----------------------------------------------------------------------------
+# Les bornes (texte, lignes CSV) sont cherchees sur le buffer mappe: seules les
+# fenetres utiles sont decodees en str, le reste du fichier n'est jamais copie.
+CSV_WINDOW_LINES = 256         # lignes physiques de la 1re fenetre CSV (doublee si besoin)
+
+
+@contextmanager
+def mapped_file(path: Union[str, Path]) -> Iterator[Union[mmap.mmap, bytes]]:
+    """mmap en lecture seule (b"" pour un fichier vide: mmap refuse une longueur 0)."""
+    with open(path, "rb") as f:
+        if f.seek(0, io.SEEK_END) == 0:
+            yield b""
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mm
+        finally:
+            mm.close()
+
+
+def _line_bound(buf: Union[mmap.mmap, bytes], lines: int) -> int:
+    """Offset juste apres la `lines`-ieme fin de ligne (len(buf) si le fichier est plus court)."""
+    end = 0
+    for _ in range(lines):
+        i = buf.find(b"\n", end)
+        if i < 0:
+            return len(buf)
+        end = i + 1
+    return end
+
+
+def mapped_csv_rows(buf: Union[mmap.mmap, bytes], max_rows: int = CSV_MAX_ROWS) -> list[list[str]]:
+    """
+    Premieres lignes CSV: on coupe le buffer a une fin de ligne puis on parse cette
+    fenetre seulement. Si un champ entre guillemets deborde de la fenetre, elle est doublee.
+    """
+    lines = max(CSV_WINDOW_LINES, max_rows + 1)
+    while True:
+        end = _line_bound(buf, lines)
+        window = buf[:end].decode("utf-8", errors="ignore")
+        reader = csv.reader(io.StringIO(window, newline=""))
+        if end >= len(buf):
+            return list(islice(reader, max_rows))
+        try:
+            # une ligne de plus que necessaire: la derniere gardee est forcement complete
+            rows = list(islice(reader, max_rows + 1))
+        except csv.Error:
+            rows = []
+        if len(rows) > max_rows:
+            return rows[:max_rows]
+        lines *= 2
+
+
+def extract_mapped(
+    path: str,
+    file_type: str,
+    max_chars: int = 35_000,
+    mode: ExtractMode = "auto",
+    profile: bool = False,
+    txt_strategy: Optional[str] = None,
+) -> dict:
+    """TXT/CSV lus en place (execute dans le pool de processus). Meme resultat que extract_document."""
+    file_path = Path(path)
+    csv_profile: Optional[dict] = None
+    extra_limits = None
+    if file_type == "csv" and profile:
+        # profil: tout le fichier est parcouru de toute facon, lecture bufferisee classique
+        text_sample, tables_preview, csv_profile = _extract_csv(file_path, max_chars, profile=True)
+    else:
+        with mapped_file(file_path) as buf, stage(f"{file_type}_read"):
+            if file_type == "txt":
+                # mmap supporte seek/read: meme lecture bornee que _extract_txt
+                stream = buf if isinstance(buf, mmap.mmap) else io.BytesIO(buf)
+                text_sample, txt_stats = sample_txt(stream, len(buf), max_chars, txt_strategy)
+                tables_preview = []
+                extra_limits = {"txt": txt_stats}
+            elif file_type == "csv":
+                text_sample, tables_preview = csv_rows_result(mapped_csv_rows(buf), max_chars)
+            else:
+                raise ValueError(f"Unsupported file type for mapped read: {file_type}")
+
+    return build_result(
+        file_type=file_type,
+        name=file_path.name,
+        size_bytes=file_path.stat().st_size,
+        text_sample=text_sample,
+        tables_preview=tables_preview,
+        max_chars=max_chars,
+        mode=mode,
+        extra_limits=extra_limits,
+        profile=csv_profile,
+    )
@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import mmap
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, Future
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Callable, Optional, Union
+
+from app.metrics import stage
+
+if TYPE_CHECKING:
+    from pypdf import PdfReader
+
+# -----------------------------------------------------------------------------
+# Moteur PDF: extraction page par page, en parallele, avec budgets
+# -----------------------------------------------------------------------------
+# EXTRACTOR_PDF_MAX_PAGES        : pages examinees au maximum par document
+# EXTRACTOR_PDF_TIME_BUDGET_S    : budget temps mur par document (texte partiel au-dela)
+# EXTRACTOR_PDF_PAGES_PER_TASK   : pages par tache envoyee a un worker
+# EXTRACTOR_PDF_PARALLEL_MIN_PAGES: en dessous, tout le document est lu par un seul worker
+PDF_MAX_PAGES = int(os.getenv("EXTRACTOR_PDF_MAX_PAGES", "500"))
+PDF_TIME_BUDGET_S = float(os.getenv("EXTRACTOR_PDF_TIME_BUDGET_S", "20"))
+PDF_PAGES_PER_TASK = int(os.getenv("EXTRACTOR_PDF_PAGES_PER_TASK", "4"))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("EXTRACTOR_PDF_PARALLEL_MIN_PAGES", "8"))
+
+PdfSource = Union[Path, str, bytes, BinaryIO]
+
+# Un reader par fichier et par worker: les taches suivantes du meme document
+# ne reparsent pas la xref (fichier mappe, pas copie: cache court quand meme).
+_READERS: "OrderedDict[str, PdfReader]" = OrderedDict()
+_READERS_MAX = 2
+
+
+def _map_file(path: Union[Path, str], size: int) -> Union[mmap.mmap, str]:
+    """
+    Fichier sur disque -> mmap (pypdf copierait sinon tout le fichier en memoire).
+    Le mmap vit aussi longtemps que le reader qui le reference. Pas de mmap sous Windows:
+    un fichier mappe n'y est plus supprimable (spool PDF de l'upload).
+    """
+    if size == 0 or os.name == "nt":
+        return str(path)
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _open_reader(source: PdfSource) -> PdfReader:
+    # import a la demande: un process qui ne lit aucun PDF ne charge pas pypdf (~60 ms)
+    from pypdf import PdfReader
+
+    if isinstance(source, bytes):
+        return PdfReader(io.BytesIO(source))
+    if not isinstance(source, (str, Path)):
+        return PdfReader(source)
+
+    st = os.stat(source)
+    key = f"{source}:{st.st_mtime_ns}:{st.st_size}"
+    reader = _READERS.get(key)
+    if reader is None:
+        reader = PdfReader(_map_file(source, st.st_size))
+        _READERS[key] = reader
+        while len(_READERS) > _READERS_MAX:
+            _READERS.popitem(last=False)
+    _READERS.move_to_end(key)
+    return reader
+
+
+def _page_text(reader: PdfReader, index: int) -> tuple[int, str, float]:
+    t0 = time.perf_counter()
+    try:
+        text = reader.pages[index].extract_text() or ""
+    except Exception:
+        text = ""
+    return index, text, (time.perf_counter() - t0) * 1000
+
+
+def extract_pages(source: PdfSource, start: int, end: int) -> list[tuple[int, str, float]]:
+    """Tache worker: texte des pages [start, end) -> [(index, texte, ms)]."""
+    reader = _open_reader(source)
+    return [_page_text(reader, i) for i in range(start, min(end, len(reader.pages)))]
+
+
+class PdfTextCollector:
+    """
+    Assemble le texte dans l'ordre des pages (pages vides ignorees, "\\n\\n" entre
+    pages, chaque page coupee au reste de max_chars) et tient les stats/budgets.
+    """
+
+    def __init__(self, max_chars: int, max_pages: int, time_budget_s: float) -> None:
+        self.max_chars = max_chars
+        self.max_pages = max_pages
+        self.time_budget_s = time_budget_s
+        self.deadline = time.monotonic() + time_budget_s
+        self.pages_total = 0
+        self.chunks: list[str] = []
+        self.length = 0
+        self.pages: list[dict] = []
+        self.stopped_by: Optional[str] = None
+
+    @property
+    def full(self) -> bool:
+        return self.length >= self.max_chars
+
+    @property
+    def pages_to_scan(self) -> int:
+        return min(self.pages_total, self.max_pages)
+
+    def add(self, index: int, text: str, ms: float) -> bool:
+        """Ajoute une page (dans l'ordre). Retourne True quand il faut arreter."""
+        self.pages.append({"page": index + 1, "ms": round(ms, 2), "chars": len(text)})
+        if text and not self.full:
+            snippet = text[: self.max_chars - self.length]
+            self.chunks.append(snippet)
+            self.length += len(snippet)
+        if self.full:
+            self.stopped_by = "max_chars"
+            return True
+        return False
+
+    def out_of_time(self) -> bool:
+        if time.monotonic() >= self.deadline:
+            self.stopped_by = "time_budget"
+            return True
+        return False
+
+    def finish(self) -> tuple[str, dict]:
+        if self.stopped_by is None and self.pages_total > self.max_pages:
+            self.stopped_by = "max_pages"
+        stats = {
+            "pages_total": self.pages_total,
+            "pages_scanned": len(self.pages),
+            "pages_with_text": sum(1 for p in self.pages if p["chars"]),
+            "max_pages": self.max_pages,
+            "time_budget_ms": int(self.time_budget_s * 1000),
+            "stopped_by": self.stopped_by,
+            "page_timings": self.pages,
+        }
+        return "\n\n".join(self.chunks), stats
+
+
+def extract_pdf_serial(
+    source: PdfSource,
+    max_chars: int,
+    max_pages: int = PDF_MAX_PAGES,
+    time_budget_s: float = PDF_TIME_BUDGET_S,
+) -> tuple[str, list, dict]:
+    """Extraction dans le process courant (petits documents, ou deja dans un worker)."""
+    collector = PdfTextCollector(max_chars, max_pages, time_budget_s)
+    with stage("pdf_parse"):
+        reader = _open_reader(source)
+        collector.pages_total = len(reader.pages)
+
+        for i in range(collector.pages_to_scan):
+            if collector.add(*_page_text(reader, i)) or collector.out_of_time():
+                break
+
+    text, stats = collector.finish()
+    return text, [], stats
+
+
+def plan_pdf(source: PdfSource, max_chars: int, max_pages: int, time_budget_s: float) -> dict:
+    """
+    Premiere tache worker: compte les pages et lit le debut du document.
+    Si le document est court (ou que le debut suffit), l'extraction est terminee ici.
+    """
+    started_at = time.time()
+    reader = _open_reader(source)
+    pages_total = len(reader.pages)
+    first = pages_total if pages_total <= PDF_PARALLEL_MIN_PAGES else PDF_PAGES_PER_TASK
+    first = min(first, max_pages)
+
+    collector = PdfTextCollector(max_chars, max_pages, time_budget_s)
+    collector.pages_total = pages_total
+    results = []
+    for i in range(first):
+        item = _page_text(reader, i)
+        results.append(item)
+        if collector.add(*item) or collector.out_of_time():
+            break
+    done = collector.stopped_by is not None or first >= collector.pages_to_scan
+    return {
+        "pages_total": pages_total,
+        "pages": results,
+        "done": done,
+        "stopped_by": collector.stopped_by,
+        "started_at": started_at,
+    }
+
+
+def _release_soon(loop: asyncio.AbstractEventLoop, admission) -> None:
+    """Callback de fin de tache (thread du pool): la place est rendue dans la boucle."""
+    try:
+        loop.call_soon_threadsafe(admission.release)
+    except RuntimeError:
+        pass  # boucle fermee (arret du serveur): plus personne ne compte les places
+
+
+async def extract_pdf_parallel(
+    executor: Executor,
+    source: PdfSource,
+    max_chars: int,
+    spill_to_path=None,
+    workers: int = 1,
+    max_pages: int = PDF_MAX_PAGES,
+    time_budget_s: float = PDF_TIME_BUDGET_S,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    admission=None,
+) -> tuple[str, list, dict]:
+    """
+    Orchestration (process principal): les pages sont distribuees aux workers par
+    paquets, dans l'ordre, avec une fenetre de 2 paquets par worker. Le texte est
+    assemble dans l'ordre et tout s'arrete des que max_chars est atteint, que le
+    budget temps est epuise, ou apres max_pages pages.
+
+    spill_to_path: callable retournant un chemin disque pour la source, appele seulement
+    si le document doit etre partage entre plusieurs workers (source en memoire).
+    on_progress: appele avec (pages lues, pages a lire) apres chaque paquet.
+    admission: file du pool (try_acquire/release). La place du job couvre un paquet en
+    cours; chaque paquet de plus en prend une, rendue quand le worker l'a fini. File
+    pleine: la fenetre se reduit (jamais sous un paquet).
+    """
+    collector = PdfTextCollector(max_chars, max_pages, time_budget_s)
+    submitted_at = time.time()
+    plan = await asyncio.wrap_future(
+        executor.submit(plan_pdf, source, max_chars, max_pages, time_budget_s)
+    )
+    collector.pages_total = plan["pages_total"]
+    for item in plan["pages"]:
+        if collector.add(*item):
+            break
+    collector.stopped_by = collector.stopped_by or plan["stopped_by"]
+    if on_progress is not None:
+        on_progress(len(collector.pages), collector.pages_to_scan)
+
+    if not plan["done"] and collector.stopped_by is None and not collector.out_of_time():
+        if isinstance(source, bytes) and spill_to_path is not None:
+            # Une source en memoire serait picklee vers chaque tache et reparsee en entier
+            # par chacune (pas de reader en cache pour des bytes); sur disque, chaque worker
+            # garde un reader mappe. Mesure (200 pages, 4 workers): 1415 ms -> 613 ms,
+            # ecriture comprise. Seuls les PDF en memoire qui partent en eventail sont ecrits.
+            source = spill_to_path()
+
+        next_page = len(plan["pages"])
+        end_page = collector.pages_to_scan
+        window = max(1, workers) * 2
+        pending: list[Future] = []
+        loop = asyncio.get_running_loop()
+
+        def submit_next() -> bool:
+            nonlocal next_page
+            if next_page >= end_page:
+                return False
+            extra = bool(pending) and admission is not None
+            if extra and not admission.try_acquire():
+                return False
+            stop = min(next_page + PDF_PAGES_PER_TASK, end_page)
+            future = executor.submit(extract_pages, source, next_page, stop)
+            if extra:
+                # rendue quand le worker a fini (ou a l'annulation d'un paquet pas encore lance)
+                future.add_done_callback(lambda _f: _release_soon(loop, admission))
+            pending.append(future)
+            next_page = stop
+            return True
+
+        def fill_window() -> None:
+            while len(pending) < window and submit_next():
+                pass
+
+        fill_window()
+
+        try:
+            while pending:
+                remaining = collector.deadline - time.monotonic()
+                try:
+                    batch = await asyncio.wait_for(asyncio.wrap_future(pending[0]), max(remaining, 0))
+                except asyncio.TimeoutError:
+                    collector.stopped_by = "time_budget"
+                    break
+                pending.pop(0)
+                stop = any(collector.add(*item) for item in batch) or collector.out_of_time()
+                if on_progress is not None:
+                    on_progress(len(collector.pages), collector.pages_to_scan)
+                if stop:
+                    break
+                fill_window()
+        finally:
+            # Pages plus utiles: on libere les workers (les taches deja lancees finissent seules)
+            for f in pending:
+                f.cancel()
+
+    text, stats = collector.finish()
+    stats["queue_wait_ms"] = int(max(plan["started_at"] - submitted_at, 0) * 1000)
+    return text, [], stats
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import abc
+import codecs
+import csv
+import os
+import re
+import tempfile
+from collections import deque
+
+from app.extractor.csv_profile import CsvProfiler
+from app.extractor.extractor import CSV_MAX_ROWS, _extract_pdf, csv_rows_result, with_total_rows
+from app.extractor.txt_sample import utf8_text_decoder
+
+# -----------------------------------------------------------------------------
+# Extraction par morceaux (upload multipart -> extracteur, sans fichier temporaire)
+# -----------------------------------------------------------------------------
+# Borne haute de max_chars (cf. ExtractRequest). Les sinks TXT/CSV collectent
+# jusqu'a cette borne: max_chars peut arriver APRES le fichier dans le multipart.
+MAX_CHARS_CAP = 100_000
+
+# Au-dela de cette taille, un PDF (acces aleatoire requis par pypdf) est spoole sur disque.
+PDF_MEMORY_LIMIT = int(os.getenv("EXTRACTOR_PDF_MEMORY_LIMIT", str(32 * 1024 * 1024)))
+
+# Memes fins de ligne que csv.reader avec newline=""
+_CSV_LINE_RE = re.compile(r"[^\r\n]*(?:\r\n|\r|\n)")
+# Garde-fou: un guillemet orphelin ne doit pas faire bufferiser tout le fichier
+_MAX_RECORD_LINES = 1000
+
+
+class StreamSink(abc.ABC):
+    """
+    Recoit l'upload par morceaux (feed) et produit (text_sample, tables_preview) a la fin.
+    `saturated` passe a True quand la suite du fichier ne changerait plus le resultat.
+    """
+
+    file_type = ""
+
+    def __init__(self) -> None:
+        self.bytes_received = 0
+        self.saturated = False
+
+    def feed(self, chunk: bytes) -> bool:
+        self.bytes_received += len(chunk)
+        return self.saturated
+
+    @abc.abstractmethod
+    def finish(self, max_chars: int) -> tuple[str, list]:
+        """(text_sample, tables_preview) une fois l'upload entierement recu."""
+
+    def source(self, max_chars: int):
+        """Entree picklable de finalize_extraction (execute dans le pool de processus)."""
+        text, tables = self.finish(max_chars)
+        return text, tables, None
+
+    def close(self) -> None:
+        pass
+
+
+class TxtSink(StreamSink):
+    file_type = "txt"
+
+    def __init__(self, max_chars: int = MAX_CHARS_CAP) -> None:
+        super().__init__()
+        self._max_chars = max_chars
+        self._decoder = utf8_text_decoder()
+        self._parts: list[str] = []
+        self._length = 0
+
+    def feed(self, chunk: bytes) -> bool:
+        super().feed(chunk)
+        if self.saturated:
+            return True
+
+        text = self._decoder.decode(chunk)
+        self._parts.append(text)
+        self._length += len(text)
+        if self._length >= self._max_chars:
+            self.saturated = True
+        return self.saturated
+
+    def finish(self, max_chars: int) -> tuple[str, list]:
+        if not self.saturated:
+            self._parts.append(self._decoder.decode(b"", final=True))
+        return "".join(self._parts)[:max_chars], []
+
+
+class _LineQueue:
+    """Iterateur alimente a la main: csv.reader y lit des lignes deja completes."""
+
+    def __init__(self) -> None:
+        self.lines: deque[str] = deque()
+
+    def __iter__(self) -> "_LineQueue":
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+class CsvSink(StreamSink):
+    file_type = "csv"
+
+    def __init__(self, max_rows: int = CSV_MAX_ROWS, profile: bool = False) -> None:
+        super().__init__()
+        self._max_rows = max_rows
+        # profile=True: on lit tout le fichier (jamais sature), seules max_rows lignes sont gardees
+        self.profiler = CsvProfiler() if profile else None
+        self.total_rows = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        self._pending = ""
+        # Lignes physiques d'un enregistrement dont les guillemets ne sont pas encore fermes
+        self._record: list[str] = []
+        self._quotes = 0
+        self._queue = _LineQueue()
+        self._reader = csv.reader(self._queue)
+        self.rows: list[list[str]] = []
+
+    def feed(self, chunk: bytes) -> bool:
+        super().feed(chunk)
+        if self.saturated:
+            return True
+
+        text = self._pending + self._decoder.decode(chunk)
+        # Un "\r" en fin de morceau peut etre la moitie d'un "\r\n"
+        end = len(text) - 1 if text.endswith("\r") else len(text)
+
+        pos = 0
+        for m in _CSV_LINE_RE.finditer(text, 0, end):
+            pos = m.end()
+            self._push_line(m.group())
+            if self.saturated:
+                break
+        self._pending = text[pos:]
+        return self.saturated
+
+    def _push_line(self, line: str) -> None:
+        self._record.append(line)
+        self._quotes += line.count('"')
+        if self._quotes % 2 and len(self._record) < _MAX_RECORD_LINES:
+            return  # champ entre guillemets sur plusieurs lignes
+
+        self._queue.lines.extend(self._record)
+        self._record = []
+        self._quotes = 0
+        self._take_rows()
+
+    def _take_rows(self) -> None:
+        for row in self._reader:
+            self.total_rows += 1
+            if len(self.rows) < self._max_rows:
+                self.rows.append(row)
+            if self.profiler is not None:
+                self.profiler.add_row(row)
+        if self.profiler is None and len(self.rows) >= self._max_rows:
+            self.saturated = True
+
+    def finish(self, max_chars: int) -> tuple[str, list]:
+        if not self.saturated:
+            tail = self._pending + self._decoder.decode(b"", final=True)
+            if tail:
+                self._record.append(tail)
+            if self._record:
+                self._queue.lines.extend(self._record)
+                self._record = []
+                try:
+                    self._take_rows()
+                except csv.Error:
+                    pass  # guillemet jamais ferme en fin de fichier
+                del self.rows[self._max_rows:]
+        text, tables = csv_rows_result(self.rows, max_chars)
+        if self.profiler is not None:
+            tables = with_total_rows(tables, self.total_rows)
+        return text, tables
+
+    def source(self, max_chars: int):
+        text, tables = self.finish(max_chars)
+        return text, tables, self.profiler.result() if self.profiler is not None else None
+
+
+class PdfSink(StreamSink):
+    file_type = "pdf"
+
+    def __init__(self, memory_limit: int = PDF_MEMORY_LIMIT) -> None:
+        super().__init__()
+        # Reste en memoire tant que le PDF est petit, bascule sur disque sinon.
+        # Fichier nomme (et non SpooledTemporaryFile) pour que le worker puisse le rouvrir.
+        self._memory_limit = memory_limit
+        self._memory = bytearray()
+        self._file = None
+
+    @property
+    def spooled_to_disk(self) -> bool:
+        return self._file is not None
+
+    def feed(self, chunk: bytes) -> bool:
+        super().feed(chunk)
+        if self._file is None and len(self._memory) + len(chunk) > self._memory_limit:
+            self._file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
+            self._file.write(self._memory)
+            self._memory = bytearray()
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._memory += chunk
+        return False
+
+    def source(self, max_chars: int):
+        if self._file is not None:
+            self._file.flush()
+            return self._file.name
+        return bytes(self._memory)
+
+    def spill_to_path(self) -> str:
+        """Force le passage sur disque (document partage entre plusieurs workers)."""
+        if self._file is None:
+            self._file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
+            self._file.write(self._memory)
+            self._memory = bytearray()
+        self._file.flush()
+        return self._file.name
+
+    def finish(self, max_chars: int) -> tuple[str, list]:
+        text, tables, _ = _extract_pdf(self.source(max_chars), max_chars)
+        return text, tables
+
+    def close(self) -> None:
+        self._memory = bytearray()
+        if self._file is not None:
+            self._file.close()
+            try:
+                os.unlink(self._file.name)
+            except OSError:
+                pass
+            self._file = None
+
+
+def make_sink(file_type: str, profile: bool = False) -> StreamSink:
+    if file_type == "txt":
+        return TxtSink()
+    if file_type == "csv":
+        return CsvSink(profile=profile)
+    if file_type == "pdf":
+        return PdfSink()
+    raise ValueError(f"Unsupported file type (for now): {file_type}")
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import codecs
+import io
+import os
+from typing import BinaryIO, Literal, Optional
+
+# -----------------------------------------------------------------------------
+# Lecture bornee des TXT (memoire constante, quelle que soit la taille du fichier)
+# -----------------------------------------------------------------------------
+# head     : les max_chars premiers caracteres (comportement historique)
+# head_tail: debut + fin du fichier
+# spread   : debut + fenetres reparties dans le fichier + fin
+# Un fichier dont tout le texte decode tient dans max_chars est lu en entier ("full"):
+# verifie en lisant jusqu'a la fin, tente seulement sous 4 octets par caractere demande.
+#
+# EXTRACTOR_TXT_STRATEGY      : strategie par defaut
+# EXTRACTOR_TXT_SAMPLE_SHARE  : part de max_chars donnee aux fenetres hors debut
+# EXTRACTOR_TXT_SPREAD_WINDOWS: fenetres interieures pour "spread"
+TxtStrategy = Literal["head", "head_tail", "spread"]
+
+TXT_STRATEGY = os.getenv("EXTRACTOR_TXT_STRATEGY", "head")
+TXT_SAMPLE_SHARE = float(os.getenv("EXTRACTOR_TXT_SAMPLE_SHARE", "0.3"))
+TXT_SPREAD_WINDOWS = int(os.getenv("EXTRACTOR_TXT_SPREAD_WINDOWS", "4"))
+
+WINDOW_SEPARATOR = "\n[...]\n"
+_UTF8_MAX_BYTES = 4
+_UTF8_MARGIN = 3  # octets de continuation possibles apres la coupe
+
+
+def utf8_text_decoder() -> io.IncrementalNewlineDecoder:
+    """Meme decodage que read_text(encoding="utf-8", errors="ignore"): fins de ligne -> "\n"."""
+    return io.IncrementalNewlineDecoder(codecs.getincrementaldecoder("utf-8")(errors="ignore"), translate=True)
+
+
+def _read_chars(f: BinaryIO, start: int, end: int, want: int) -> tuple[str, int]:
+    """
+    Au plus `want` caracteres a partir de l'octet `start` (sans depasser `end`).
+    Lit ce qu'il faut + une petite marge: ~want octets pour du texte surtout ASCII.
+    Un debut au milieu d'un caractere multi-octets est ignore par le decodeur.
+    """
+    decoder = utf8_text_decoder()
+    parts: list[str] = []
+    length = 0
+    pos = start
+    f.seek(start)
+    while length < want and pos < end:
+        chunk = f.read(min(want - length + _UTF8_MARGIN, end - pos))
+        if not chunk:
+            break
+        pos += len(chunk)
+        text = decoder.decode(chunk, final=pos >= end)
+        parts.append(text)
+        length += len(text)
+    return "".join(parts)[:want], pos - start
+
+
+def sample_txt(
+    f: BinaryIO,
+    size: int,
+    max_chars: int,
+    strategy: Optional[str] = None,
+) -> tuple[str, dict]:
+    """
+    Retourne (texte, stats) ; stats va dans limits["txt"].
+    `f` doit supporter seek/read (fichier ouvert en binaire, mmap).
+    """
+    strategy = strategy or TXT_STRATEGY
+    if strategy not in ("head", "head_tail", "spread"):
+        raise ValueError(f"Unsupported txt strategy: {strategy}")
+
+    if size <= max_chars * _UTF8_MAX_BYTES:
+        # peut tenir dans max_chars: un caractere de plus dit si la fin du fichier est atteinte
+        text, read = _read_chars(f, 0, size, max_chars + 1)
+        if read >= size and len(text) <= max_chars:
+            return text, {"file_bytes": size, "bytes_read": read, "strategy": "full", "windows": [[0, read]]}
+
+    if strategy == "head":
+        text, read = _read_chars(f, 0, size, max_chars)
+        windows = [[0, read]]
+    else:
+        n_inner = TXT_SPREAD_WINDOWS if strategy == "spread" else 0
+        others_chars = int(max_chars * TXT_SAMPLE_SHARE)
+        head_chars = max_chars - others_chars
+        # les separateurs comptent dans max_chars
+        window_chars = max((others_chars - (n_inner + 1) * len(WINDOW_SEPARATOR)) // (n_inner + 1), 0)
+
+        starts = [size * (i + 1) // (n_inner + 1) for i in range(n_inner)]
+        starts.append(max(size - window_chars, 0))  # fenetre de fin
+
+        chunks = []
+        head, read = _read_chars(f, 0, size, head_chars)
+        chunks.append(head)
+        windows = [[0, read]]
+        for start in starts:
+            if start < windows[-1][1]:
+                start = windows[-1][1]  # pas de chevauchement avec la fenetre precedente
+            text, read = _read_chars(f, start, size, window_chars)
+            if text:
+                chunks.append(text)
+                windows.append([start, start + read])
+        text = WINDOW_SEPARATOR.join(chunks)[:max_chars]
+
+    return text, {
+        "file_bytes": size,
+        "bytes_read": sum(end - start for start, end in windows),
+        "strategy": strategy,
+        "windows": windows,
+    }
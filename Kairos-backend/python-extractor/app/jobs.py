@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+# -----------------------------------------------------------------------------
+# Jobs d'extraction asynchrones (/extract-jobs)
+# -----------------------------------------------------------------------------
+# Etat + resultat dans SQLite (partage entre workers uvicorn), file d'attente en
+# memoire dans le process qui a recu l'upload. Ce process ecrit la progression et un
+# battement de coeur (heartbeat_at) dans la ligne du job toutes les
+# EXTRACTOR_JOBS_HEARTBEAT_S: les autres workers voient l'avancement, et un job actif
+# dont le battement date de plus de EXTRACTOR_JOBS_STALE_S (process mort) passe en
+# echec (INTERRUPTED) au lieu de retenir les doublons qui s'y rattacheraient.
+#
+# EXTRACTOR_JOBS_DB        : fichier SQLite
+# EXTRACTOR_JOBS_TTL_S     : duree de retention d'un job (et de son resultat)
+# EXTRACTOR_JOB_RUNNERS    : jobs traites en parallele par process (defaut: EXTRACTOR_WORKERS)
+# EXTRACTOR_JOBS_MAX_QUEUED: jobs en attente acceptes par process -> 429 au-dela
+# EXTRACTOR_JOBS_HEARTBEAT_S: intervalle d'ecriture de la progression / du battement
+# EXTRACTOR_JOBS_STALE_S   : battement plus vieux -> job actif considere orphelin
+JOBS_DB = Path(os.getenv("EXTRACTOR_JOBS_DB", str(Path(tempfile.gettempdir()) / "kairos-extractor-jobs.sqlite")))
+JOBS_TTL_S = float(os.getenv("EXTRACTOR_JOBS_TTL_S", "3600"))
+JOB_RUNNERS = int(os.getenv("EXTRACTOR_JOB_RUNNERS", os.getenv("EXTRACTOR_WORKERS", str(os.cpu_count() or 1))))
+JOBS_MAX_QUEUED = int(os.getenv("EXTRACTOR_JOBS_MAX_QUEUED", "100"))
+JOBS_HEARTBEAT_S = float(os.getenv("EXTRACTOR_JOBS_HEARTBEAT_S", "2"))
+JOBS_STALE_S = float(os.getenv("EXTRACTOR_JOBS_STALE_S", "30"))
+
+ACTIVE_STATES = ("queued", "running")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    dedup_key   TEXT NOT NULL,
+    name        TEXT,
+    file_type   TEXT,
+    state       TEXT NOT NULL,
+    pages_done  INTEGER,
+    pages_total INTEGER,
+    error       TEXT,
+    result      TEXT,
+    owner_pid   INTEGER,
+    heartbeat_at REAL,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL,
+    expires_at  REAL NOT NULL
+);
+-- un seul job actif par contenu/parametres: les doublons s'y rattachent
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_key ON jobs(dedup_key) WHERE state IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS jobs_key ON jobs(dedup_key, state);
+CREATE INDEX IF NOT EXISTS jobs_expires ON jobs(expires_at);
+"""
+
+_COLUMNS = "id, name, file_type, state, pages_done, pages_total, error, created_at, updated_at, expires_at"
+
+# colonnes ajoutees apres coup: ALTER TABLE sur une base existante
+_ADDED_COLUMNS = {"owner_pid": "INTEGER", "heartbeat_at": "REAL"}
+
+# job actif sans battement recent: son process n'est plus la
+_STALE = "state IN ('queued', 'running') AND COALESCE(heartbeat_at, updated_at) < ?"
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobStore:
+    def __init__(self, path: Path = JOBS_DB, ttl_s: float = JOBS_TTL_S, stale_s: float = JOBS_STALE_S) -> None:
+        self.path = path
+        self.ttl_s = ttl_s
+        self.stale_s = stale_s
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            present = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in _ADDED_COLUMNS.items():
+                if column not in present:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            self._conn = conn
+        return self._conn
+
+    def create_or_attach(self, dedup_key: str, name: str, file_type: str) -> tuple[str, bool]:
+        """
+        Retourne (job_id, cree). Un job actif ou termine (non expire) de meme cle est reutilise;
+        un job actif orphelin (process mort) est d'abord passe en echec.
+        """
+        now = time.time()
+        with self._lock, self.conn:
+            self._fail_stale("dedup_key = ?", (dedup_key,), now)
+            row = self.conn.execute(
+                "SELECT id FROM jobs WHERE dedup_key = ? AND state IN ('queued', 'running', 'done')"
+                " AND expires_at > ? ORDER BY created_at DESC LIMIT 1",
+                (dedup_key, now),
+            ).fetchone()
+            if row is not None:
+                return row["id"], False
+            job_id = uuid.uuid4().hex
+            try:
+                self.conn.execute(
+                    "INSERT INTO jobs (id, dedup_key, name, file_type, state, owner_pid, heartbeat_at,"
+                    " created_at, updated_at, expires_at) VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?, ?)",
+                    (job_id, dedup_key, name, file_type, os.getpid(), now, now, now, now + self.ttl_s),
+                )
+            except sqlite3.IntegrityError:
+                # cree entre-temps par un autre worker uvicorn
+                row = self.conn.execute(
+                    "SELECT id FROM jobs WHERE dedup_key = ? AND state IN ('queued', 'running')", (dedup_key,)
+                ).fetchone()
+                return row["id"], False
+            return job_id, True
+
+    def update(self, job_id: str, state: str, **fields: Any) -> None:
+        """Transition d'etat; un etat final repousse l'expiration (le resultat vit ttl_s)."""
+        now = time.time()
+        values = {"state": state, "updated_at": now, **fields}
+        if state in ACTIVE_STATES:
+            values["heartbeat_at"] = now
+        else:
+            values["expires_at"] = now + self.ttl_s
+        if "result" in values:
+            values["result"] = json.dumps(values["result"], ensure_ascii=False)
+        assignments = ", ".join(f"{k} = ?" for k in values)
+        with self._lock, self.conn:
+            self.conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*values.values(), job_id))
+
+    def _fail_stale(self, where: str, params: tuple, now: float) -> None:
+        """Sous self._lock, dans une transaction."""
+        self.conn.execute(
+            f"UPDATE jobs SET state = 'failed', error = 'INTERRUPTED', updated_at = ?, expires_at = ?"
+            f" WHERE {where} AND {_STALE}",
+            (now, now + self.ttl_s, *params, now - self.stale_s),
+        )
+
+    def heartbeat(self, job_ids: list[str], progress: dict[str, dict]) -> None:
+        """Battement des jobs actifs de ce process, avec la progression des jobs en cours."""
+        now = time.time()
+        with self._lock, self.conn:
+            for job_id in job_ids:
+                live = progress.get(job_id) or {}
+                self.conn.execute(
+                    "UPDATE jobs SET heartbeat_at = ?, pages_done = COALESCE(?, pages_done),"
+                    " pages_total = COALESCE(?, pages_total) WHERE id = ? AND state IN ('queued', 'running')",
+                    (now, live.get("pages_done"), live.get("pages_total"), job_id),
+                )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock, self.conn:
+            self._fail_stale("id = ?", (job_id,), now)
+            row = self.conn.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE id = ? AND expires_at > ?", (job_id, now)
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def result(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT result FROM jobs WHERE id = ? AND state = 'done' AND expires_at > ?", (job_id, time.time())
+            ).fetchone()
+        return json.loads(row["result"]) if row is not None and row["result"] else None
+
+    def purge_expired(self) -> int:
+        with self._lock, self.conn:
+            return self.conn.execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def fail_orphans(self, job_ids: list[str]) -> None:
+        """Jobs de ce process jamais termines (arret): marques en echec."""
+        for job_id in job_ids:
+            self.update(job_id, "failed", error="INTERRUPTED")
+
+
+Work = Callable[[Callable[[int, int], None]], Awaitable[dict]]
+
+
+class JobRunner:
+    """
+    File asyncio videe par `runners` taches en parallele. Chaque job est une coroutine
+    `work(on_progress)` qui retourne le resultat final (dict JSON).
+    """
+
+    def __init__(self, store: JobStore, runners: int = JOB_RUNNERS, max_queued: int = JOBS_MAX_QUEUED) -> None:
+        self.store = store
+        self.runners = max(1, runners)
+        self.max_queued = max_queued
+        self.progress: dict[str, dict] = {}  # job_id -> {"pages_done", "pages_total"}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+        self._pending: dict[str, Callable[[], None]] = {}  # job_id -> nettoyage si jamais execute
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    def _ensure_started(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._drain()) for _ in range(self.runners)]
+            self._heartbeat = asyncio.create_task(self._beat())
+        return self._queue
+
+    def submit(self, job_id: str, work: Work, cleanup: Callable[[], None]) -> None:
+        queue = self._ensure_started()
+        if queue.qsize() >= self.max_queued:
+            raise JobQueueFull()
+        self._pending[job_id] = cleanup
+        queue.put_nowait((job_id, work))
+
+    async def _drain(self) -> None:
+        assert self._queue is not None
+        while True:
+            job_id, work = await self._queue.get()
+            try:
+                await self._run(job_id, work)
+            finally:
+                self._queue.task_done()
+
+    async def _beat(self) -> None:
+        """Ecrit progression + battement des jobs de ce process, au plus toutes les JOBS_HEARTBEAT_S."""
+        while True:
+            await asyncio.sleep(JOBS_HEARTBEAT_S)
+            job_ids = [*self._pending, *self.progress]
+            if not job_ids:
+                continue
+            try:
+                await run_in_threadpool(self.store.heartbeat, job_ids, dict(self.progress))
+            except sqlite3.Error:
+                # base occupee: le prochain battement rattrape
+                pass
+
+    async def _run(self, job_id: str, work: Work) -> None:
+        cleanup = self._pending.pop(job_id, None)
+        self.progress[job_id] = {"pages_done": None, "pages_total": None}
+
+        def on_progress(done: int, total: int) -> None:
+            self.progress[job_id] = {"pages_done": done, "pages_total": total}
+
+        try:
+            await run_in_threadpool(self.store.update, job_id, "running")
+            result = await work(on_progress)
+        except asyncio.CancelledError:
+            await run_in_threadpool(self.store.update, job_id, "failed", error="INTERRUPTED")
+            raise
+        except Exception as e:
+            error = getattr(e, "detail", None) or type(e).__name__
+            await run_in_threadpool(self.store.update, job_id, "failed", error=str(error))
+        else:
+            progress = self.progress.get(job_id, {})
+            await run_in_threadpool(self.store.update, job_id, "done", result=result, **progress)
+        finally:
+            self.progress.pop(job_id, None)
+            if cleanup is not None:
+                cleanup()
+            # menage opportuniste des jobs expires
+            await run_in_threadpool(self.store.purge_expired)
+
+    def status(self, job_id: str) -> Optional[dict]:
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        live = self.progress.get(job_id)
+        if live is not None:
+            job.update(live)
+        return job
+
+    def stats(self) -> dict:
+        return {
+            "runners": self.runners,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": len(self.progress),
+        }
+
+    async def shutdown(self) -> None:
+        tasks = [*self._tasks, *([self._heartbeat] if self._heartbeat is not None else [])]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._heartbeat = None
+        # jobs restes dans la file: leurs uploads ne survivent pas au process
+        orphans = list(self._pending)
+        for cleanup in self._pending.values():
+            cleanup()
+        self._pending.clear()
+        self._queue = None
+        if orphans:
+            await run_in_threadpool(self.store.fail_orphans, orphans)
+
+
+job_store = JobStore()
+job_runner = JobRunner(job_store)
@@ -1,18 +1,44 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import time
-import tempfile
-import shutil
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Optional, Literal, Any, Dict
 
-from fastapi import FastAPI, HTTPException, Header, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Header, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
 
 from dotenv import load_dotenv
 from app.security import verify_secret, is_path_allowed
 from app.extractor import extract_document
+from app.batch import (
+    BATCH_MAX_BYTES,
+    BATCH_MAX_FILES,
+    ON_ERROR_POLICIES,
+    BatchMemberError,
+    ByteBudget,
+    SkippedSink,
+    ZipSink,
+    ndjson_line,
+    open_batch_sink,
+    read_zip_member,
+    zip_members,
+)
+from app.cache import extraction_cache, cache_key
+from app.jobs import JobQueueFull, job_runner, job_store
+from app import metrics
+from app.metrics import SERVER_TIMING, add_stage, collect_stages, observe_extraction, server_timing, stage, stages_ms
+from app.extractor.extractor import build_result, finalize_extraction, resolve_file_type
+from app.extractor.mapped import extract_mapped
+from app.extractor.pdf_engine import extract_pdf_parallel
+from app.extractor.streaming import MAX_CHARS_CAP, StreamSink, make_sink
+from app.upload_stream import StreamingForm, StreamedPart, UploadFormError
+from app.workers import extraction_pool, PoolSaturated, JobDeadlineExceeded
+from app.warmup import readiness, start_warm_up
 
 load_dotenv()
 
@@ -33,7 +59,27 @@ UPLOADS_ROOT = (STORAGE_ROOT / "uploads").resolve()
 
 DEBUG = os.getenv("EXTRACTOR_DEBUG", "0") == "1"
 
-app = FastAPI(title="Kairos Extractor", version="0.2.0")
+
+async def _warm_job_store() -> None:
+    # ouverture SQLite + schema (sinon fait par la premiere requete /extract-jobs)
+    await run_in_threadpool(lambda: job_store.conn)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # en arriere-plan: le port s'ouvre sans attendre les workers (cf. app/warmup.py)
+    warmup = start_warm_up([
+        ("pool_workers", extraction_pool.warm_up),
+        ("job_store", _warm_job_store),
+    ])
+    yield
+    if warmup is not None:
+        warmup.cancel()
+    await job_runner.shutdown()
+    extraction_pool.shutdown()
+
+
+app = FastAPI(title="Kairos Extractor", version="0.2.0", lifespan=lifespan)
 
 
 # -----------------------------------------------------------------------------
@@ -44,6 +90,10 @@ class ExtractRequest(BaseModel):
     file_type: Optional[str] = Field(None, description="txt|csv|pdf| (xlsx plus tard)")
     max_chars: int = Field(35000, ge=1000, le=100000)
     mode: Literal["auto", "text_only", "tables_only"] = "auto"
+    profile: bool = Field(False, description="CSV: profil de colonnes sur tout le fichier")
+    txt_strategy: Optional[Literal["head", "head_tail", "spread"]] = Field(
+        None, description="TXT: fenetres lues (defaut: EXTRACTOR_TXT_STRATEGY)"
+    )
 
 
 @app.get("/health")
@@ -53,9 +103,49 @@ def health():
         "service": "Kairos Extractor",
         "storage_root": str(STORAGE_ROOT),
         "uploads_root": str(UPLOADS_ROOT),
+        "pool": extraction_pool.stats(),
+        "cache": extraction_cache.stats(),
+        "jobs": job_runner.stats(),
     }
 
 
+@app.get("/ready")
+def ready():
+    """Sonde de readiness: 503 tant que le prechauffage n'est pas termine (/health = liveness)."""
+    return JSONResponse(readiness.snapshot(), status_code=200 if readiness.ready else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Format texte Prometheus (registre de ce worker uvicorn, cf. app/metrics.py)."""
+    pool = extraction_pool.stats()
+    metrics.POOL_IN_FLIGHT.set(pool["in_flight"])
+    metrics.POOL_CAPACITY.set(extraction_pool.capacity)
+    for event, n in dict(extraction_cache.counters).items():
+        metrics.CACHE_EVENTS.set_total(n, event=event)
+    jobs = job_runner.stats()
+    metrics.JOBS.set(jobs["queued"], state="queued")
+    metrics.JOBS.set(jobs["running"], state="running")
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+def _timing(
+    raw_result: Dict[str, Any],
+    mode: str,
+    t0: float,
+    stages: dict,
+    bytes_read: int,
+    cache_hit: bool = False,
+    response: Optional[Response] = None,
+) -> Dict[str, Any]:
+    """Fin d'extraction: metriques + Server-Timing optionnel. Retourne les champs de temps de la reponse."""
+    elapsed = time.time() - t0
+    observe_extraction(raw_result, mode, elapsed, stages, bytes_read, cache_hit)
+    if response is not None and SERVER_TIMING:
+        response.headers["Server-Timing"] = server_timing(stages, elapsed * 1000)
+    return {"processing_time_ms": int(elapsed * 1000), "stages_ms": stages_ms(stages)}
+
+
 def to_camel_response(result: Dict[str, Any]) -> Dict[str, Any]:
     """
     Normalise sla réponse en camelCase pour Node/TS.
@@ -75,6 +165,7 @@ def to_camel_response(result: Dict[str, Any]) -> Dict[str, Any]:
         "textSample": text_sample,
         "tablesPreview": tables_preview,
         "limits": result.get("limits", {}),
+        **({"profile": result["profile"]} if result.get("profile") is not None else {}),
     }
 
 
@@ -83,59 +174,603 @@ def _debug_print(*args: Any):
         print(*args)
 
 
+# -----------------------------------------------------------------------------
+# A) Path-based extract (fichier deja sous KAIROS_STORAGE_ROOT/uploads)
+# -----------------------------------------------------------------------------
+# Node et Python partagent le volume uploads: pas de transfert HTTP du fichier.
+# TXT/CSV sont lus via mmap dans le pool (cf. extractor/mapped.py), les PDF passent
+# par le moteur page par page (chaque worker mappe le fichier).
+@app.post("/extract")
+async def extract_endpoint(
+    req: ExtractRequest,
+    response: Response,
+    x_kairos_extractor_key: str = Header(..., alias="X-KAIROS-EXTRACTOR-KEY"),
+):
+    t0 = time.time()
+
+    if not verify_secret(x_kairos_extractor_key):
+        raise HTTPException(status_code=403, detail="INVALID_SECRET")
+
+    full_path = STORAGE_ROOT / req.storage_path
+    if not is_path_allowed(full_path):
+        raise HTTPException(status_code=403, detail="PATH_NOT_ALLOWED")
+    full_path = full_path.resolve()
+    if not full_path.is_file():
+        raise HTTPException(status_code=404, detail="FILE_NOT_FOUND")
 
+    try:
+        file_type = resolve_file_type(req.file_type, full_path.name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    _debug_print("[PY] extract called", req.storage_path, file_type)
+
+    with collect_stages() as stages:
+        if file_type == "pdf":
+            text, tables, pdf_stats, pool_timing = await extract_pdf_in_pool(str(full_path), req.max_chars)
+            raw_result = build_result(
+                file_type="pdf",
+                name=full_path.name,
+                size_bytes=full_path.stat().st_size,
+                text_sample=text,
+                tables_preview=tables,
+                max_chars=req.max_chars,
+                mode=req.mode,
+                extra_limits={"pdf": pdf_stats},
+            )
+        else:
+            raw_result, pool_timing = await run_in_pool(
+                extract_mapped,
+                str(full_path),
+                file_type,
+                max_chars=req.max_chars,
+                mode=req.mode,
+                profile=req.profile,
+                txt_strategy=req.txt_strategy,
+            )
+
+    # TXT: seules les fenetres lues comptent; sinon tout le fichier est (potentiellement) parcouru
+    txt_stats = raw_result["limits"].get("txt")
+    bytes_read = txt_stats["bytes_read"] if txt_stats else raw_result["file"]["size_bytes"]
+    return {
+        "ok": True,
+        "storage_path": req.storage_path,
+        **to_camel_response(raw_result),
+        **_timing(raw_result, req.mode, t0, stages, bytes_read, response=response),
+        **pool_timing,
+    }
 
 
 # -----------------------------------------------------------------------------
 # B) Upload-based extract (Node stream -> Python)
 # -----------------------------------------------------------------------------
+# Le multipart est lu en flux (request.stream()): TXT/CSV sont parses au fil des
+# morceaux et la lecture s'arrete des que max_chars / le plafond de lignes CSV est
+# atteint. Les PDF restent en memoire, puis spool disque au-dela de PDF_MEMORY_LIMIT.
+# Pour profiter de l'arret anticipe, le client doit envoyer les champs AVANT le fichier.
+def _parse_max_chars(raw: Optional[str]) -> int:
+    try:
+        return int(raw) if raw is not None else 35000
+    except ValueError:
+        raise HTTPException(status_code=400, detail="INVALID_MAX_CHARS")
+
+
+def _busy() -> HTTPException:
+    return HTTPException(status_code=429, detail="EXTRACTOR_BUSY", headers={"Retry-After": "1"})
+
+
+async def run_in_pool(fn, *args, **kwargs):
+    """Execute une extraction dans le pool de processus; traduit saturation/deadline en HTTP."""
+    try:
+        return await extraction_pool.run(fn, *args, **kwargs)
+    except PoolSaturated:
+        raise _busy()
+    except JobDeadlineExceeded:
+        raise HTTPException(status_code=504, detail="EXTRACTION_TIMEOUT")
+
+
+async def extract_pdf_in_pool(
+    source, max_chars: int, spill_to_path=None, on_progress=None
+) -> tuple[str, list, dict, dict]:
+    """
+    PDF multi-pages: pages reparties sur les workers du pool (cf. pdf_engine).
+    Retourne (texte, tables, stats pdf, {"queue_wait_ms", "run_ms"}).
+    """
+    t0 = time.time()
+    try:
+        with extraction_pool.slot():
+            text, tables, stats = await asyncio.wait_for(
+                extract_pdf_parallel(
+                    extraction_pool.executor,
+                    source,
+                    max_chars,
+                    spill_to_path=spill_to_path,
+                    workers=extraction_pool.workers,
+                    on_progress=on_progress,
+                    admission=extraction_pool,
+                ),
+                extraction_pool.timeout_s,
+            )
+    except PoolSaturated:
+        raise _busy()
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="EXTRACTION_TIMEOUT")
+
+    queue_wait_ms = stats.pop("queue_wait_ms", 0)
+    total_ms = int((time.time() - t0) * 1000)
+    run_ms = max(total_ms - queue_wait_ms, 0)
+    # pages lues dans les workers: le temps mur de l'orchestration tient lieu d'etape pdf_parse
+    add_stage("queue_wait", queue_wait_ms)
+    add_stage("pdf_parse", run_ms)
+    return text, tables, stats, {"queue_wait_ms": queue_wait_ms, "run_ms": run_ms}
+
+
+async def extract_from_sink(
+    sink: StreamSink,
+    name: str,
+    sha256: Optional[str],
+    max_chars: int,
+    mode: str,
+    profile: bool = False,
+    on_progress=None,
+) -> tuple[Dict[str, Any], Dict[str, int], bool]:
+    """
+    Fin d'extraction d'un fichier recu par un sink (upload, membre d'archive, job).
+    Retourne (resultat brut snake_case, {"queue_wait_ms", "run_ms"}, cache_hit).
+    on_progress(pages lues, pages a lire): PDF seulement.
+    """
+    # Cache par contenu: meme fichier (sha256 + type) -> pas de re-extraction
+    key = None
+    if extraction_cache.enabled:
+        if sha256:
+            key = cache_key(sha256, sink.file_type, "profile" if profile else "")
+        else:
+            extraction_cache.bypass()
+    cached = None
+    if key:
+        with stage("cache"):
+            cached = await run_in_threadpool(extraction_cache.get, key, max_chars)
+
+    if cached is not None:
+        raw_result = build_result(
+            file_type=sink.file_type,
+            name=name,
+            size_bytes=sink.bytes_received,
+            text_sample=cached["text"],
+            tables_preview=cached["tables"],
+            max_chars=max_chars,
+            mode=mode,
+            profile=cached.get("profile"),
+        )
+        return raw_result, {"queue_wait_ms": 0, "run_ms": 0}, True
+
+    if sink.file_type == "pdf":
+        # PDF: pages en parallele sur le pool, arret des que le texte suffit (cache compris:
+        # l'entree est tronquee a max_chars et ne sert que les demandes plus courtes)
+        text, tables, pdf_stats, pool_timing = await extract_pdf_in_pool(
+            sink.source(max_chars), max_chars, spill_to_path=sink.spill_to_path, on_progress=on_progress
+        )
+        raw_result = build_result(
+            file_type="pdf",
+            name=name,
+            size_bytes=sink.bytes_received,
+            text_sample=text,
+            tables_preview=tables,
+            max_chars=max_chars,
+            mode=mode,
+            extra_limits={"pdf": pdf_stats},
+        )
+        if key and pdf_stats["stopped_by"] != "time_budget":
+            with stage("cache"):
+                chars = max_chars if pdf_stats["stopped_by"] == "max_chars" else None
+                await run_in_threadpool(extraction_cache.put, key, text, tables, None, chars)
+        return raw_result, pool_timing, False
+
+    # TXT/CSV: detection dans le pool de processus
+    raw_result, pool_timing = await run_in_pool(
+        finalize_extraction,
+        file_type=sink.file_type,
+        name=name,
+        size_bytes=sink.bytes_received,
+        source=sink.source(max_chars if key is None else MAX_CHARS_CAP),
+        max_chars=max_chars,
+        mode=mode,  # "auto" | "text_only" | "tables_only"
+        content_chars=MAX_CHARS_CAP if key else None,
+    )
+    content = raw_result.pop("_content", None)
+    if key and content is not None:
+        with stage("cache"):
+            await run_in_threadpool(
+                extraction_cache.put, key, content["text"], content["tables"], content["profile"]
+            )
+    return raw_result, pool_timing, False
+
+
+def _profile_requested(raw: Optional[str]) -> bool:
+    return (raw or "").strip().lower() in ("1", "true", "yes")
+
+
+def _open_upload_sink(part: StreamedPart, fields: Dict[str, str]):
+    file_type = resolve_file_type(fields.get("file_type"), part.filename or "")
+    return make_sink(file_type, profile=_profile_requested(fields.get("profile")))
+
+
 @app.post("/extract-upload")
 async def extract_upload_endpoint(
-    file: UploadFile = File(...),
-    max_chars: int = Form(35000),
-    mode: str = Form("auto"),
-    file_type: Optional[str] = Form(None),
+    request: Request,
+    response: Response,
     x_kairos_extractor_key: str = Header(..., alias="X-KAIROS-EXTRACTOR-KEY"),
 ):
-    print("[PY] extract-upload called", file.filename, file.content_type)
-
     t0 = time.time()
 
-    # 1) Secret
+    # 1) Secret (avant de lire le corps)
     if not verify_secret(x_kairos_extractor_key):
         raise HTTPException(status_code=403, detail="INVALID_SECRET")
 
-    # 2) Save temp
-    suffix = Path(file.filename or "").suffix
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        shutil.copyfileobj(file.file, tmp)
-        tmp_path = Path(tmp.name)
-
+    # File pleine: 429 avant de recevoir l'upload
     try:
-        raw_result = extract_document(
-            file_path=tmp_path,
-            file_type=file_type,
-            max_chars=max_chars,
-            mode=mode,  # "auto" | "text_only" | "tables_only"
-        )
+        extraction_pool.check_admission()
+    except PoolSaturated:
+        raise _busy()
+
+    with collect_stages() as stages:
+        # 2) Stream multipart -> sink
+        try:
+            form = StreamingForm(request.headers.get("content-type", ""), open_file=_open_upload_sink)
+            with stage("upload"):
+                await form.consume(request.stream())
+        except (UploadFormError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        if not form.files:
+            raise HTTPException(status_code=400, detail="MISSING_FILE")
+
+        upload = form.files[0]
+        sink = upload.sink
+        _debug_print("[PY] extract-upload called", upload.filename, upload.content_type)
+
+        try:
+            max_chars = _parse_max_chars(form.fields.get("max_chars"))
+            mode = form.fields.get("mode", "auto")
+            file_type = form.fields.get("file_type")
+            if file_type and file_type.lower().replace(".", "") != sink.file_type:
+                # file_type recu apres le fichier et en contradiction avec le sink choisi
+                raise HTTPException(status_code=400, detail="FILE_TYPE_SENT_AFTER_FILE")
+            profile = sink.file_type == "csv" and _profile_requested(form.fields.get("profile"))
+            if profile and sink.profiler is None:
+                # profile recu apres le fichier: le CSV n'a pas ete lu en entier
+                raise HTTPException(status_code=400, detail="PROFILE_SENT_AFTER_FILE")
+
+            # 3) Cache + extraction (pool)
+            raw_result, pool_timing, cache_hit = await extract_from_sink(
+                sink, upload.filename or "", upload.sha256, max_chars, mode, profile
+            )
 
-        result = to_camel_response(raw_result)
+            if sink.file_type == "txt":
+                # upload lu en flux: debut seulement, taille reelle connue si lu jusqu'au bout
+                raw_result["limits"]["txt"] = {
+                    "file_bytes": sink.bytes_received if not form.stopped_early else None,
+                    "bytes_read": sink.bytes_received,
+                    "strategy": "head",
+                }
+            raw_result["limits"]["stream_complete"] = not form.stopped_early
+            raw_result["limits"]["cache_hit"] = cache_hit
 
-        ms = int((time.time() - t0) * 1000)
+            result = to_camel_response(raw_result)
+            timing = _timing(raw_result, mode, t0, stages, sink.bytes_received, cache_hit, response)
+            return {
+                "ok": True,
+                "storage_path": None,
+                "uploaded_file": {
+                    "name": upload.filename,
+                    "type": sink.file_type,
+                    # octets effectivement lus (fichier partiel si stream_complete=False)
+                    "size_bytes": sink.bytes_received,
+                },
+                **result,
+                **timing,
+                **pool_timing,
+            }
+
+        finally:
+            sink.close()
+
+
+# -----------------------------------------------------------------------------
+# C) Batch extract (plusieurs fichiers ou une archive ZIP -> NDJSON)
+# -----------------------------------------------------------------------------
+# Le corps est lu en entier (TXT/CSV bornes par leurs sinks, PDF/ZIP spooles), puis
+# chaque fichier / membre d'archive est extrait en parallele sur le pool. Une ligne
+# NDJSON est emise par fichier des qu'il est termine, puis une ligne "summary".
+# on_error=continue: une erreur ne concerne que son fichier; abort: le lot s'arrete.
+def _open_batch_part(part: StreamedPart, fields: Dict[str, str]):
+    return open_batch_sink(part.filename, part.content_type, profile=_profile_requested(fields.get("profile")))
+
+
+def _batch_error(index: int, name: str, code: str) -> Dict[str, Any]:
+    return {"type": "error", "index": index, "name": name, "ok": False, "error": code}
+
+
+async def _batch_stream(form: StreamingForm, max_chars: int, mode: str, on_error: str, profile: bool, t0: float):
+    budget = ByteBudget(BATCH_MAX_BYTES)
+    slots = asyncio.Semaphore(extraction_pool.workers)
+    archives = []
+    ready: list[Dict[str, Any]] = []  # erreurs connues avant extraction
+    members: list[tuple[int, str, Any, Optional[str]]] = []  # (index, nom, sink ou (zip, info), sha256)
+
+    def add(name: str, item: Any = None, sha256: Optional[str] = None, error: Optional[str] = None) -> None:
+        index = len(ready) + len(members)
+        if error is None and index >= BATCH_MAX_FILES:
+            error = "BATCH_MAX_FILES_EXCEEDED"
+        if error is not None:
+            ready.append(_batch_error(index, name, error))
+        else:
+            members.append((index, name, item, sha256))
+
+    async def extract_member(index: int, name: str, item: Any, sha256: Optional[str]) -> Dict[str, Any]:
+        async with slots:
+            started = time.time()
+            sink = item if isinstance(item, StreamSink) else None
+            try:
+                # un collecteur par fichier (tache dediee: les etapes des autres membres n'y tombent pas)
+                with collect_stages() as stages:
+                    if sink is None:
+                        zf, info = item
+                        with stage("upload"):
+                            sink = await run_in_threadpool(read_zip_member, zf, info, budget, profile)
+                    raw_result, pool_timing, cache_hit = await extract_from_sink(
+                        sink, name, sha256, max_chars, mode, getattr(sink, "profiler", None) is not None
+                    )
+            except BatchMemberError as e:
+                return _batch_error(index, name, e.code)
+            except HTTPException as e:
+                return _batch_error(index, name, str(e.detail))
+            except Exception as e:
+                _debug_print("[PY] extract-batch member failed", name, repr(e))
+                return _batch_error(index, name, "EXTRACTION_FAILED")
+            finally:
+                if sink is not None:
+                    sink.close()
+
+        raw_result["limits"]["cache_hit"] = cache_hit
         return {
+            "type": "result",
+            "index": index,
+            "name": name,
             "ok": True,
-            "storage_path": None,
-            "uploaded_file": {
-                "name": file.filename,
-                "type": (file_type or suffix.replace(".", "") or "unknown"),
-                "size_bytes": tmp_path.stat().st_size,
-            },
-            **result,
-            "processing_time_ms": ms,
+            "uploaded_file": {"name": name, "type": sink.file_type, "size_bytes": sink.bytes_received},
+            **to_camel_response(raw_result),
+            **_timing(raw_result, mode, started, stages, sink.bytes_received, cache_hit),
+            **pool_timing,
         }
 
+    tasks: list[asyncio.Task] = []
+    counts = {"ok": 0, "failed": 0}
+    aborted = False
+    try:
+        # 1) Inventaire: fichiers directs + membres des archives (dans l'ordre du formulaire)
+        for part in form.files:
+            name = part.filename or ""
+            sink = part.sink
+            if part.over_budget:
+                add(name, error="BATCH_BYTE_BUDGET_EXCEEDED")
+            elif isinstance(sink, SkippedSink):
+                add(name, error=sink.error)
+            elif isinstance(sink, ZipSink):
+                try:
+                    zf = await run_in_threadpool(sink.open_zip)
+                except BatchMemberError as e:
+                    add(name, error=e.code)
+                    continue
+                archives.append(zf)
+                for info in zip_members(zf):
+                    add(f"{name}/{info.filename}", (zf, info))
+            else:
+                add(name, sink, part.sha256)
+
+        # 2) Extraction en parallele, une ligne par fichier termine
+        tasks = [asyncio.create_task(extract_member(*m)) for m in members]
+        for line in ready:
+            counts["failed"] += 1
+            yield ndjson_line(line)
+            if on_error == "abort":
+                aborted = True
+                break
+        if not aborted:
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                counts["ok" if line["ok"] else "failed"] += 1
+                yield ndjson_line(line)
+                if not line["ok"] and on_error == "abort":
+                    aborted = True
+                    break
     finally:
-        try:
-            tmp_path.unlink()
-        except Exception:
-            pass
+        # abort / client deconnecte: les extractions restantes sont annulees
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for zf in archives:
+            zf.close()
+        for part in form.files:
+            part.sink.close()
+
+    yield ndjson_line({
+        "type": "summary",
+        "files": len(ready) + len(members),
+        "ok": counts["ok"],
+        "failed": counts["failed"],
+        "aborted": aborted,
+        # corps coupe par le budget: les fichiers suivants n'ont pas ete recus
+        "upload_truncated": form.over_budget,
+        "bytes_uploaded": form.file_bytes,
+        "bytes_decompressed": budget.used,
+        "processing_time_ms": int((time.time() - t0) * 1000),
+    })
+
+
+@app.post("/extract-batch")
+async def extract_batch_endpoint(
+    request: Request,
+    x_kairos_extractor_key: str = Header(..., alias="X-KAIROS-EXTRACTOR-KEY"),
+):
+    t0 = time.time()
+
+    if not verify_secret(x_kairos_extractor_key):
+        raise HTTPException(status_code=403, detail="INVALID_SECRET")
+
+    try:
+        extraction_pool.check_admission()
+    except PoolSaturated:
+        raise _busy()
+
+    try:
+        form = StreamingForm(
+            request.headers.get("content-type", ""),
+            open_file=_open_batch_part,
+            stop_when_saturated=False,
+            max_file_bytes=BATCH_MAX_BYTES,
+        )
+        await form.consume(request.stream())
+    except (UploadFormError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        if not form.files:
+            raise HTTPException(status_code=400, detail="MISSING_FILE")
+        max_chars = _parse_max_chars(form.fields.get("max_chars"))
+        mode = form.fields.get("mode", "auto")
+        on_error = form.fields.get("on_error", "continue")
+        if on_error not in ON_ERROR_POLICIES:
+            raise HTTPException(status_code=400, detail="INVALID_ON_ERROR")
+    except HTTPException:
+        for part in form.files:
+            part.sink.close()
+        raise
+
+    _debug_print("[PY] extract-batch called", len(form.files), "file(s)")
+    return StreamingResponse(
+        _batch_stream(form, max_chars, mode, on_error, _profile_requested(form.fields.get("profile")), t0),
+        media_type="application/x-ndjson",
+    )
+
+
+# -----------------------------------------------------------------------------
+# D) Async jobs (upload -> job id tout de suite, extraction en arriere-plan)
+# -----------------------------------------------------------------------------
+# Meme multipart que /extract-upload. Le corps est lu en entier (sha256 complet):
+# une soumission du meme contenu avec les memes parametres se rattache au job
+# existant (en cours, ou termine et pas encore expire) au lieu d'en relancer un.
+def _job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "ok": True,
+        "job_id": job["id"],
+        "state": job["state"],  # queued | running | done | failed
+        "name": job["name"],
+        "file_type": job["file_type"],
+        "progress": {"pages_done": job["pages_done"], "pages_total": job["pages_total"]},
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "expires_at": job["expires_at"],
+    }
+
+
+@app.post("/extract-jobs", status_code=202)
+async def create_extract_job(
+    request: Request,
+    x_kairos_extractor_key: str = Header(..., alias="X-KAIROS-EXTRACTOR-KEY"),
+):
+    if not verify_secret(x_kairos_extractor_key):
+        raise HTTPException(status_code=403, detail="INVALID_SECRET")
+
+    try:
+        form = StreamingForm(
+            request.headers.get("content-type", ""),
+            open_file=_open_upload_sink,
+            stop_when_saturated=False,  # hash complet pour la deduplication
+        )
+        await form.consume(request.stream())
+    except (UploadFormError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not form.files:
+        raise HTTPException(status_code=400, detail="MISSING_FILE")
+
+    upload = form.files[0]
+    sink = upload.sink
+    queued = False
+    try:
+        max_chars = _parse_max_chars(form.fields.get("max_chars"))
+        mode = form.fields.get("mode", "auto")
+        file_type = form.fields.get("file_type")
+        if file_type and file_type.lower().replace(".", "") != sink.file_type:
+            raise HTTPException(status_code=400, detail="FILE_TYPE_SENT_AFTER_FILE")
+        profile = getattr(sink, "profiler", None) is not None
+        name = upload.filename or ""
+
+        dedup_key = f"{cache_key(upload.sha256, sink.file_type, 'profile' if profile else '')}:{max_chars}:{mode}"
+        job_id, created = await run_in_threadpool(job_store.create_or_attach, dedup_key, name, sink.file_type)
+
+        if created:
+            async def work(on_progress) -> Dict[str, Any]:
+                t0 = time.time()
+                with collect_stages() as stages:
+                    raw_result, pool_timing, cache_hit = await extract_from_sink(
+                        sink, name, upload.sha256, max_chars, mode, profile, on_progress=on_progress
+                    )
+                raw_result["limits"]["cache_hit"] = cache_hit
+                return {
+                    "ok": True,
+                    "storage_path": None,
+                    "uploaded_file": {"name": name, "type": sink.file_type, "size_bytes": sink.bytes_received},
+                    **to_camel_response(raw_result),
+                    **_timing(raw_result, mode, t0, stages, sink.bytes_received, cache_hit),
+                    **pool_timing,
+                }
+
+            try:
+                job_runner.submit(job_id, work, cleanup=sink.close)
+            except JobQueueFull:
+                await run_in_threadpool(job_store.update, job_id, "failed", error="EXTRACTOR_BUSY")
+                raise _busy()
+            queued = True
+
+        _debug_print("[PY] extract-jobs", job_id, "created" if created else "attached", upload.filename)
+        job = await run_in_threadpool(job_runner.status, job_id)
+        return {**_job_view(job), "deduplicated": not created}
+    finally:
+        if not queued:
+            sink.close()
+
+
+@app.get("/extract-jobs/{job_id}")
+async def get_extract_job(
+    job_id: str,
+    x_kairos_extractor_key: str = Header(..., alias="X-KAIROS-EXTRACTOR-KEY"),
+):
+    if not verify_secret(x_kairos_extractor_key):
+        raise HTTPException(status_code=403, detail="INVALID_SECRET")
+    job = await run_in_threadpool(job_runner.status, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="JOB_NOT_FOUND")
+    return _job_view(job)
+
+
+@app.get("/extract-jobs/{job_id}/result")
+async def get_extract_job_result(
+    job_id: str,
+    x_kairos_extractor_key: str = Header(..., alias="X-KAIROS-EXTRACTOR-KEY"),
+):
+    if not verify_secret(x_kairos_extractor_key):
+        raise HTTPException(status_code=403, detail="INVALID_SECRET")
+    job = await run_in_threadpool(job_runner.status, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="JOB_NOT_FOUND")
+    if job["state"] == "failed":
+        raise HTTPException(status_code=422, detail=f"JOB_FAILED: {job['error']}")
+    if job["state"] != "done":
+        raise HTTPException(status_code=409, detail="JOB_NOT_READY", headers={"Retry-After": "1"})
+    result = await run_in_threadpool(job_store.result, job_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="JOB_NOT_FOUND")
+    return {**result, "job_id": job_id}
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+# -----------------------------------------------------------------------------
+# Instrumentation: temps par etape + metriques Prometheus (/metrics)
+# -----------------------------------------------------------------------------
+# Etapes: chaque requete ouvre un collecteur (collect_stages) et le code d'extraction
+# chronometre ses etapes avec `with stage("pdf_parse"):`. Dans un worker du pool, le
+# collecteur est ouvert par workers._timed_call et fusionne dans celui de la requete.
+# Sans collecteur actif (benchmarks, appels directs), stage() ne fait rien.
+#
+# Metriques: registre en memoire, format texte Prometheus ecrit a la main (pas de
+# dependance). Un registre par process: avec plusieurs workers uvicorn, chaque scrape
+# ne voit que le worker qui repond.
+#
+# EXTRACTOR_SERVER_TIMING: "1" pour renvoyer les etapes dans l'en-tete Server-Timing
+SERVER_TIMING = os.getenv("EXTRACTOR_SERVER_TIMING", "0") == "1"
+
+# Etapes connues (ordre de l'en-tete Server-Timing)
+STAGES = ("upload", "cache", "queue_wait", "txt_read", "csv_read", "pdf_parse", "detect")
+MODES = ("auto", "text_only", "tables_only")
+
+# secondes: de la lecture d'un petit CSV jusqu'au budget temps PDF / deadline du pool
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+_stages: ContextVar[Optional[dict]] = ContextVar("extractor_stages", default=None)
+
+
+# --- temps par etape ---
+@contextmanager
+def collect_stages() -> Iterator[dict]:
+    """Collecteur {etape: ms} pour le contexte courant (requete, membre de lot, tache pool)."""
+    stages: dict[str, float] = {}
+    token = _stages.set(stages)
+    try:
+        yield stages
+    finally:
+        _stages.reset(token)
+
+
+def add_stage(name: str, ms: float) -> None:
+    stages = _stages.get()
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + ms
+
+
+def merge_stages(other: dict) -> None:
+    """Etapes mesurees ailleurs (worker du pool) -> collecteur courant."""
+    for name, ms in other.items():
+        add_stage(name, ms)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    if _stages.get() is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_stage(name, (time.perf_counter() - t0) * 1000)
+
+
+def stages_ms(stages: dict) -> dict:
+    return {name: round(ms, 2) for name, ms in stages.items()}
+
+
+def server_timing(stages: dict, total_ms: float) -> str:
+    """Valeur de l'en-tete Server-Timing (etapes connues d'abord, puis "total")."""
+    names = sorted(stages, key=lambda n: STAGES.index(n) if n in STAGES else len(STAGES))
+    parts = [f"{name};dur={stages[name]:.1f}" for name in names]
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
+
+
+# --- metriques Prometheus ---
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+_INF = 'le="+Inf"'
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.labels)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()) -> None:
+        super().__init__(name, help_text, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, value: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def set_total(self, value: float, **labels: Any) -> None:
+        """Total tenu ailleurs (ex: compteurs du cache), recopie au moment du scrape."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labels, k)} {_number(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        self.set_total(value, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, list] = {}  # key -> [compteurs par bucket..., somme, total]
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, list(s)) for k, s in self._series.items())
+        lines = self.header()
+        for key, series in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                le = _labels(self.labels, key, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labels, key, _INF)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: list[_Metric] = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+_TYPE_MODE = ("file_type", "mode")
+
+EXTRACTIONS = REGISTRY.add(Counter(
+    "kairos_extractor_extractions_total", "Extractions terminees.", ("file_type", "mode", "cache")))
+EXTRACTION_SECONDS = REGISTRY.add(Histogram(
+    "kairos_extractor_extraction_seconds", "Duree d'une extraction (reception comprise).", _TYPE_MODE))
+STAGE_SECONDS = REGISTRY.add(Histogram(
+    "kairos_extractor_stage_seconds", "Duree par etape d'extraction.", ("stage",) + _TYPE_MODE))
+INPUT_BYTES = REGISTRY.add(Counter(
+    "kairos_extractor_input_bytes_total", "Octets de fichier traites (recus ou lus).", _TYPE_MODE))
+PDF_PAGES = REGISTRY.add(Counter(
+    "kairos_extractor_pdf_pages_total", "Pages PDF lues.", _TYPE_MODE))
+CSV_ROWS = REGISTRY.add(Counter(
+    "kairos_extractor_csv_rows_total", "Lignes CSV lues.", _TYPE_MODE))
+TEXT_CHARS = REGISTRY.add(Counter(
+    "kairos_extractor_text_chars_total", "Caracteres de texte renvoyes.", _TYPE_MODE))
+
+POOL_IN_FLIGHT = REGISTRY.add(Gauge(
+    "kairos_extractor_pool_in_flight", "Jobs en cours ou en file dans le pool de processus."))
+POOL_CAPACITY = REGISTRY.add(Gauge(
+    "kairos_extractor_pool_capacity", "Workers + profondeur de file du pool."))
+CACHE_EVENTS = REGISTRY.add(Counter(
+    "kairos_extractor_cache_events_total", "Evenements du cache d'extraction.", ("event",)))
+JOBS = REGISTRY.add(Gauge(
+    "kairos_extractor_jobs", "Jobs asynchrones de ce process.", ("state",)))
+
+
+def observe_extraction(
+    raw_result: dict,
+    mode: str,
+    seconds: float,
+    stages: dict,
+    bytes_read: int,
+    cache_hit: bool = False,
+) -> None:
+    """Une extraction terminee -> histogrammes et compteurs (labels file_type, mode)."""
+    labels = {
+        "file_type": raw_result["file"]["type"],
+        "mode": mode if mode in MODES else "other",  # mode du multipart: valeur libre
+    }
+    EXTRACTIONS.inc(cache="hit" if cache_hit else "miss", **labels)
+    EXTRACTION_SECONDS.observe(seconds, **labels)
+    for name, ms in stages.items():
+        STAGE_SECONDS.observe(ms / 1000, stage=name, **labels)
+    INPUT_BYTES.inc(bytes_read, **labels)
+    TEXT_CHARS.inc(len(raw_result.get("text_sample", "")), **labels)
+    if cache_hit:
+        return
+    pdf_stats = raw_result["limits"].get("pdf")
+    if pdf_stats:
+        PDF_PAGES.inc(pdf_stats["pages_scanned"], **labels)
+    tables = raw_result.get("tables_preview") or []
+    if labels["file_type"] == "csv" and tables:
+        CSV_ROWS.inc(tables[0]["total_rows"], **labels)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import hashlib
+from typing import AsyncIterator, Callable, Optional
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from app.extractor.streaming import StreamSink
+
+# Un champ texte (max_chars, mode, file_type...) n'a rien a faire au-dela de quelques Ko
+FIELD_MAX_BYTES = 64 * 1024
+
+
+class UploadFormError(ValueError):
+    pass
+
+
+class StreamedPart:
+    def __init__(self, name: str, filename: Optional[str], content_type: Optional[str]) -> None:
+        self.name = name
+        self.filename = filename
+        self.content_type = content_type
+        self.sink: Optional[StreamSink] = None
+        self.value = bytearray()
+        # SHA-256 calcule pendant la reception (cle du cache d'extraction)
+        self.hasher = hashlib.sha256()
+        self.complete = False
+        self.over_budget = False  # coupee par max_file_bytes (cf. StreamingForm)
+
+    @property
+    def sha256(self) -> Optional[str]:
+        """Hash du fichier complet, None si la lecture a ete arretee avant la fin."""
+        return self.hasher.hexdigest() if self.complete else None
+
+
+class StreamingForm:
+    """
+    Lit un corps multipart/form-data morceau par morceau (request.stream()).
+
+    - les champs texte sont gardes en memoire (bornes a FIELD_MAX_BYTES)
+    - chaque partie fichier est poussee dans le sink retourne par `open_file(part, fields)`
+      au fil de l'eau, sans fichier temporaire
+    - `stop_when_saturated`: on arrete de lire le corps des que tous les sinks sont
+      satures ET que les champs ont ete recus avant le fichier (sinon on continue a
+      lire, sans parser, pour recuperer les champs envoyes apres le fichier)
+    - `max_file_bytes`: budget total des parties fichier; au-dela, la partie en cours
+      reste incomplete (`over_budget`) et la lecture du corps s'arrete
+    """
+
+    def __init__(
+        self,
+        content_type: str,
+        open_file: Callable[[StreamedPart, dict[str, str]], StreamSink],
+        stop_when_saturated: bool = True,
+        max_file_bytes: Optional[int] = None,
+    ) -> None:
+        ctype, params = parse_options_header(content_type or "")
+        boundary = params.get(b"boundary")
+        if ctype != b"multipart/form-data" or not boundary:
+            raise UploadFormError("EXPECTED_MULTIPART_FORM_DATA")
+
+        self.fields: dict[str, str] = {}
+        self.files: list[StreamedPart] = []
+        self.stopped_early = False
+        self.file_bytes = 0
+        self.over_budget = False
+
+        self._open_file = open_file
+        self._stop_when_saturated = stop_when_saturated
+        self._max_file_bytes = max_file_bytes
+        self._fields_before_file = False
+        self._part: Optional[StreamedPart] = None
+        self._headers: dict[str, str] = {}
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._parser = MultipartParser(
+            boundary,
+            callbacks={
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+            },
+        )
+
+    # --- callbacks python-multipart (synchrones, appeles depuis parser.write) ---
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+        self._part = None
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        key = self._header_field.decode("latin-1").lower()
+        self._headers[key] = self._header_value.decode("latin-1")
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+
+    def _on_headers_finished(self) -> None:
+        if self.over_budget:
+            return  # parties suivantes ignorees (lecture arretee apres ce morceau)
+        _, params = parse_options_header(self._headers.get("content-disposition", ""))
+        name = params.get(b"name", b"").decode("utf-8", "replace")
+        filename = params.get(b"filename")
+        part = StreamedPart(
+            name=name,
+            filename=filename.decode("utf-8", "replace") if filename is not None else None,
+            content_type=self._headers.get("content-type"),
+        )
+        if part.filename is not None:
+            if not self.files and self.fields:
+                self._fields_before_file = True
+            part.sink = self._open_file(part, dict(self.fields))
+            self.files.append(part)
+        self._part = part
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        part = self._part
+        if part is None:
+            return
+        if part.sink is not None:
+            self.file_bytes += end - start
+            if self._max_file_bytes is not None and self.file_bytes > self._max_file_bytes:
+                self.over_budget = part.over_budget = True
+                return
+            part.hasher.update(data[start:end])
+            if not part.sink.saturated:
+                part.sink.feed(data[start:end])
+            else:
+                part.sink.bytes_received += end - start
+            return
+        if len(part.value) + (end - start) > FIELD_MAX_BYTES:
+            raise UploadFormError(f"FIELD_TOO_LARGE: {part.name}")
+        part.value += data[start:end]
+
+    def _on_part_end(self) -> None:
+        part = self._part
+        if part is not None and part.sink is None:
+            self.fields[part.name] = part.value.decode("utf-8", "replace")
+        elif part is not None:
+            part.complete = not part.over_budget
+        self._part = None
+
+    # --- lecture ---
+    def _can_stop(self) -> bool:
+        return (
+            self._stop_when_saturated
+            and self._fields_before_file
+            and bool(self.files)
+            and all(f.complete or (f.sink is not None and f.sink.saturated) for f in self.files)
+            and not all(f.complete for f in self.files)
+        )
+
+    async def consume(self, stream: AsyncIterator[bytes]) -> None:
+        async for chunk in stream:
+            if not chunk:
+                continue
+            self._parser.write(chunk)
+            if self.over_budget or self._can_stop():
+                self.stopped_early = True
+                return
+        self._parser.finalize()
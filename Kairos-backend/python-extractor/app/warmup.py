@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Optional
+
+# -----------------------------------------------------------------------------
+# Demarrage a froid: prechauffage en arriere-plan + etat de /ready
+# -----------------------------------------------------------------------------
+# Le lifespan lance warm_up() dans une tache et rend la main tout de suite: uvicorn
+# ouvre le port pendant que les workers du pool demarrent (spawn + import pypdf).
+# /health repond des le debut (process vivant); /ready passe a 200 une fois le
+# prechauffage termine (l'autoscaler n'envoie du trafic qu'a ce moment-la).
+#
+# EXTRACTOR_WARMUP: "0" pour ne rien prechauffer (/ready est alors pret d'emblee)
+WARMUP_ENABLED = os.getenv("EXTRACTOR_WARMUP", "1") == "1"
+
+
+class Readiness:
+    def __init__(self) -> None:
+        self.ready = False
+        self.started_at = time.time()
+        self.steps: dict[str, dict] = {}  # etape -> {"ms", "error"?}
+
+    def mark_ready(self) -> None:
+        self.ready = True
+
+    def snapshot(self) -> dict:
+        return {
+            "status": "ready" if self.ready else "warming",
+            "uptime_s": round(time.time() - self.started_at, 3),
+            "warmup": self.steps,
+        }
+
+
+readiness = Readiness()
+
+
+async def warm_up(steps: list[tuple[str, Callable[[], Awaitable[object]]]], state: Optional[Readiness] = None) -> None:
+    """
+    Execute les etapes dans l'ordre. Une etape en echec est notee mais ne bloque pas
+    /ready: le service sert quand meme (ex: CSV/TXT sans workers prechauffes).
+    """
+    state = state or readiness
+    try:
+        for name, step in steps:
+            t0 = time.perf_counter()
+            entry: dict = {}
+            try:
+                result = await step()
+                if result is not None:
+                    entry["result"] = result
+            except Exception as e:
+                entry["error"] = f"{type(e).__name__}: {e}"
+                print("[PY] warmup step failed", name, entry["error"])
+            entry["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            state.steps[name] = entry
+    finally:
+        state.mark_ready()
+
+
+def start_warm_up(steps: list[tuple[str, Callable[[], Awaitable[object]]]]) -> Optional[asyncio.Task]:
+    """A appeler dans le lifespan. Sans prechauffage, le service est pret immediatement."""
+    if not WARMUP_ENABLED:
+        readiness.mark_ready()
+        return None
+    return asyncio.create_task(warm_up(steps))
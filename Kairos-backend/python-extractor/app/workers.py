@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+from app.metrics import add_stage, collect_stages, merge_stages
+
+# -----------------------------------------------------------------------------
+# Pool de processus pour l'extraction (CPU-bound: pypdf, csv, detection)
+# -----------------------------------------------------------------------------
+# EXTRACTOR_WORKERS      : nb de processus (defaut: nb de coeurs)
+# EXTRACTOR_QUEUE_DEPTH  : jobs en attente acceptes en plus de ceux en cours -> 429 au-dela
+# EXTRACTOR_JOB_TIMEOUT_S: deadline par job (attente + execution) -> 504 au-dela
+EXTRACTOR_WORKERS = int(os.getenv("EXTRACTOR_WORKERS", str(os.cpu_count() or 1)))
+EXTRACTOR_QUEUE_DEPTH = int(os.getenv("EXTRACTOR_QUEUE_DEPTH", "16"))
+EXTRACTOR_JOB_TIMEOUT_S = float(os.getenv("EXTRACTOR_JOB_TIMEOUT_S", "60"))
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+class JobDeadlineExceeded(Exception):
+    pass
+
+
+def _timed_call(fn: Callable[..., Any], args: tuple, kwargs: dict, deadline: float) -> tuple[Any, float, float, dict]:
+    """Execute dans le worker. Retourne (resultat, debut, fin, {etape: ms}); debut/fin en temps mur."""
+    started = time.time()
+    if started > deadline:
+        # Le job a passe sa deadline dans la file: inutile de le lancer
+        raise JobDeadlineExceeded()
+    with collect_stages() as stages:
+        result = fn(*args, **kwargs)
+    return result, started, time.time(), stages
+
+
+def _warm_worker() -> int:
+    """Tache de demarrage: charge les modules lourds dans le worker (pypdf, extracteurs)."""
+    import pypdf  # noqa: F401
+    import app.extractor.mapped  # noqa: F401
+
+    return os.getpid()
+
+
+def _release_soon(loop: asyncio.AbstractEventLoop, pool: ExtractionPool) -> None:
+    """Callback de fin de job (thread du pool): la place est rendue dans la boucle."""
+    try:
+        loop.call_soon_threadsafe(pool.release)
+    except RuntimeError:
+        pass  # boucle fermee (arret du serveur): plus personne ne compte les places
+
+
+class ExtractionPool:
+    def __init__(
+        self,
+        workers: int = EXTRACTOR_WORKERS,
+        queue_depth: int = EXTRACTOR_QUEUE_DEPTH,
+        timeout_s: float = EXTRACTOR_JOB_TIMEOUT_S,
+    ) -> None:
+        self.workers = max(1, workers)
+        self.queue_depth = max(0, queue_depth)
+        self.timeout_s = timeout_s
+        self.in_flight = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_depth
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: pas de fork d'un process qui a deja des threads (threadpool anyio)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def check_admission(self) -> None:
+        """A appeler avant de lire un upload: refuse tot plutot qu'apres le transfert."""
+        if self.in_flight >= self.capacity:
+            raise PoolSaturated()
+
+    @contextmanager
+    def slot(self):
+        """Occupe une place de la file pour un job orchestre a la main (ex: PDF multi-pages)."""
+        self.check_admission()
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    def try_acquire(self) -> bool:
+        """
+        Place de plus pour une tache lancee en eventail par un job deja admis (paquets de
+        pages PDF); False si la file est pleine. A rendre avec release() a la fin de la tache.
+        """
+        if self.in_flight >= self.capacity:
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+
+    async def run(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        timeout_s: Optional[float] = None,
+        **kwargs: Any,
+    ) -> tuple[Any, dict]:
+        """
+        Soumet fn(*args, **kwargs) au pool.
+        Retourne (resultat, {"queue_wait_ms", "run_ms"}).
+        Leve PoolSaturated si la file est pleine, JobDeadlineExceeded si la deadline passe.
+        """
+        timeout_s = self.timeout_s if timeout_s is None else timeout_s
+        submitted = time.time()
+        deadline = submitted + timeout_s
+
+        self.check_admission()
+        self.in_flight += 1
+        try:
+            future = self.executor.submit(_timed_call, fn, args, kwargs, deadline)
+        except BaseException:
+            self.in_flight -= 1
+            raise
+        # La place est rendue quand le job finit vraiment, pas a la deadline: un job deja
+        # lance continue dans son worker et l'occupe; l'admission doit le voir (-> 429)
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda _f: _release_soon(loop, self))
+        try:
+            result, started, ended, stages = await asyncio.wait_for(asyncio.wrap_future(future), timeout_s)
+        except asyncio.TimeoutError:
+            # Annule si encore en file; un job deja lance termine dans son worker
+            future.cancel()
+            raise JobDeadlineExceeded()
+        except asyncio.CancelledError:
+            # client parti: meme traitement, le job en file ne part pas
+            future.cancel()
+            raise
+
+        # etapes du worker -> collecteur de la requete (cf. app/metrics)
+        add_stage("queue_wait", (started - submitted) * 1000)
+        merge_stages(stages)
+        return result, {
+            "queue_wait_ms": int((started - submitted) * 1000),
+            "run_ms": int((ended - started) * 1000),
+        }
+
+    async def warm_up(self) -> int:
+        """
+        Lance les `workers` processus d'un coup (spawn + imports) au lieu d'attendre les
+        premieres requetes. Hors file d'admission. Retourne le nb de workers prets.
+        """
+        # soumises ensemble: aucun worker n'est libre, le pool en demarre un par tache
+        futures = [self.executor.submit(_warm_worker) for _ in range(self.workers)]
+        pids = await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+        return len(set(pids))
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+extraction_pool = ExtractionPool()
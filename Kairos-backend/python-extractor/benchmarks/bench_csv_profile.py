@@ -0,0 +1,61 @@
+"""
+Benchmark du profil CSV (extract_document(..., profile=True)) sur un export synthetique.
+
+    cd python-extractor && python -m benchmarks.bench_csv_profile [lignes]
+
+Genere un CSV facon export Shopify/comptable (1M lignes par defaut) dans un dossier
+temporaire, puis mesure l'apercu seul (200 lignes) et le profil complet.
+"""
+from __future__ import annotations
+
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.extractor import extract_document
+
+DEFAULT_ROWS = 1_000_000
+_CATEGORIES = ["loyer", "publicite", "stock", "salaires", "logiciels", "transport", "frais bancaires"]
+_CLIENTS = [f"client-{i}" for i in range(5000)]
+
+
+def make_csv(path: Path, rows: int) -> None:
+    rnd = random.Random(7)
+    with path.open("w", encoding="utf-8", newline="") as f:
+        f.write("date,order_id,client,categorie,montant,quantite,description\n")
+        for i in range(rows):
+            montant = "" if rnd.random() < 0.01 else f"{rnd.uniform(-200, 2000):.2f}"
+            f.write(
+                f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d},{100000 + i},"
+                f"{rnd.choice(_CLIENTS)},{rnd.choice(_CATEGORIES)},{montant},{rnd.randint(1, 9)},"
+                f"\"commande {i}, note libre\"\n"
+            )
+
+
+def timed(label: str, fn):
+    t0 = time.perf_counter()
+    out = fn()
+    print(f"  {label:<22} {time.perf_counter() - t0:8.2f} s")
+    return out
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "export.csv"
+        timed("generation", lambda: make_csv(path, rows))
+        print(f"{rows} lignes, {path.stat().st_size / 1e6:.1f} Mo:")
+        timed("apercu (200 lignes)", lambda: extract_document(path))
+        result = timed("profil complet", lambda: extract_document(path, profile=True))
+
+    profile = result["profile"]
+    print(f"  row_count={profile['row_count']} total_rows={result['tables_preview'][0]['total_rows']}")
+    for col in profile["columns"]:
+        extra = {k: v for k, v in col.items() if k not in ("name", "type", "top_values")}
+        print(f"  - {col['name']:<12} {col['type']:<10} {extra}")
+
+
+if __name__ == "__main__":
+    main()
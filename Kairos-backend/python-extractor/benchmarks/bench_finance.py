@@ -0,0 +1,84 @@
+"""
+Micro-benchmark de detect_finance_like sur des echantillons de 35k caracteres.
+
+    cd python-extractor && python -m benchmarks.bench_finance
+
+Compare l'ancien scan (un `kw in t` par mot-cle apres .lower()) au matcher
+compile en un seul passage, avec la liste actuelle puis en ajoutant des mots-cles.
+Avec la liste actuelle (~40 mots), le matcher est PLUS LENT que l'ancien scan
+(~1.4-1.6 ms contre ~0.9 ms): 40 recherches de sous-chaine en C restent moins cheres
+qu'un passage du moteur re, qui n'a pas de recherche multi-litteraux. Le matcher est
+garde pour les mots entiers + pluriels (l'ancien scan n'a pas cette semantique) et
+parce que son cout ne grandit presque pas avec la liste: il passe devant vers ~70 mots.
+"""
+from __future__ import annotations
+
+import random
+import time
+
+from app.detectors.finance import FINANCE_KEYWORDS, FINANCE_WEIGHTS, KeywordMatcher
+
+SAMPLE_CHARS = 35_000
+ROUNDS = 200
+
+_FILLER = (
+    "le la les des un une client commande livraison produit boutique vente achat solde "
+    "pour avec dans sur par votre notre merci reference numero adresse telephone courriel "
+    "the of and order shipping store customer to for with your our thanks reference number "
+    "update accountability dated totally accounting pricing"
+).split()
+_KEYWORDS = "facture montant total taxe tps tvq date paiement compte credit debit invoice amount price".split()
+
+
+def make_sample(seed: int, chars: int = SAMPLE_CHARS) -> str:
+    rnd = random.Random(seed)
+    parts, size = [], 0
+    while size < chars:
+        w = rnd.choice(_KEYWORDS if rnd.random() < 0.05 else _FILLER)
+        if rnd.random() < 0.1:
+            w = f"{rnd.randint(1, 9999)}.{rnd.randint(0, 99):02d}$"
+        parts.append(w)
+        size += len(w) + 1
+    return " ".join(parts)[:chars]
+
+
+def legacy_scan(keywords: dict[str, list[str]], text: str) -> int:
+    t = (text or "").lower()
+    return sum(1 for kws in keywords.values() for kw in kws if kw in t)
+
+
+def extended_keywords(n_extra: int) -> dict[str, list[str]]:
+    rnd = random.Random(42)
+    extra = {f"terme{i}{''.join(rnd.choice('abcdefgh') for _ in range(4))}" for i in range(n_extra)}
+    return {"strong": list(FINANCE_KEYWORDS["strong"]), "medium": list(FINANCE_KEYWORDS["medium"]) + sorted(extra)}
+
+
+def bench(label: str, fn, samples: list[str]) -> float:
+    t0 = time.perf_counter()
+    for i in range(ROUNDS):
+        fn(samples[i % len(samples)])
+    ms = (time.perf_counter() - t0) * 1000 / ROUNDS
+    print(f"  {label:<28} {ms:8.3f} ms/echantillon")
+    return ms
+
+
+def main() -> None:
+    samples = [make_sample(s) for s in range(8)]
+    for label, keywords in [
+        (f"{sum(map(len, FINANCE_KEYWORDS.values()))} mots-cles (liste actuelle)", FINANCE_KEYWORDS),
+        ("+30 mots-cles", extended_keywords(30)),
+        ("+60 mots-cles", extended_keywords(60)),
+        ("+100 mots-cles", extended_keywords(100)),
+        ("+400 mots-cles", extended_keywords(400)),
+    ]:
+        matcher = KeywordMatcher(keywords, FINANCE_WEIGHTS)
+        print(f"{label} ({SAMPLE_CHARS} caracteres):")
+        legacy = bench("substring (ancien)", lambda t: legacy_scan(keywords, t), samples)
+        compiled = bench("matcher compile (count)", matcher.count, samples)
+        bench("matcher compile (positions)", matcher.scan, samples)
+        verdict = "plus rapide" if compiled < legacy else "PLUS LENT"
+        print(f"  matcher / ancien: x{legacy / compiled:.2f} ({verdict})")
+
+
+if __name__ == "__main__":
+    main()
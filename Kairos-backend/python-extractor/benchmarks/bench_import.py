@@ -0,0 +1,97 @@
+"""
+Budget de demarrage a froid: temps d'import de app.main dans un interpreteur neuf.
+
+    cd python-extractor && python -m benchmarks.bench_import [--budget-ms 1000] [--runs 5]
+
+Echoue (code 1) si la mediane depasse le budget, ou si un module lourd qui doit etre
+charge a la demande (pypdf: seuls les workers du pool lisent des PDF) l'est a l'import.
+Affiche aussi les imports les plus couteux (python -X importtime).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+MODULE = "app.main"
+LAZY_MODULES = ("pypdf",)
+DEFAULT_BUDGET_MS = 1000.0
+TOP_IMPORTS = 8
+
+_PROBE = (
+    "import json, sys, time; t0 = time.perf_counter(); import {module}; "
+    "print(json.dumps({{'ms': (time.perf_counter() - t0) * 1000, "
+    "'loaded': [m for m in {lazy!r} if m in sys.modules]}}))"
+)
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    # app.security lit KAIROS_STORAGE_ROOT a l'import
+    env.setdefault("KAIROS_STORAGE_ROOT", tempfile.gettempdir())
+    return env
+
+
+def probe(module: str = MODULE, lazy: tuple = LAZY_MODULES) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, lazy=lazy)],
+        capture_output=True, text=True, check=True, env=_env(),
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def top_imports(module: str = MODULE, n: int = TOP_IMPORTS) -> list[tuple[str, float]]:
+    """Imports directs de `module` les plus couteux (temps cumule, ms)."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True, env=_env(),
+    )
+    children: list[tuple[str, float]] = []
+    for line in out.stderr.splitlines():
+        parts = line[len("import time:"):].split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        field = parts[2]
+        depth = (len(field) - len(field.lstrip()) - 1) // 2
+        name = field.strip()
+        # -X importtime ecrit les enfants avant leur parent
+        if depth == 1:
+            children.append((name, int(parts[1]) / 1000))
+        elif depth == 0:
+            if name == module:
+                return sorted(children, key=lambda r: -r[1])[:n]
+            children = []
+    return []
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", DEFAULT_BUDGET_MS)))
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    probe()  # premier lancement: compile les .pyc, hors mesure
+    results = [probe() for _ in range(args.runs)]
+    median = statistics.median(r["ms"] for r in results)
+    loaded = sorted({m for r in results for m in r["loaded"]})
+
+    print(f"import {MODULE}: median {median:.1f} ms (min {min(r['ms'] for r in results):.1f}, budget {args.budget_ms:.0f})")
+    for name, ms in top_imports():
+        print(f"  {name:<32} {ms:8.1f} ms")
+
+    failed = False
+    if median > args.budget_ms:
+        print(f"FAIL: import time {median:.1f} ms > budget {args.budget_ms:.0f} ms")
+        failed = True
+    if loaded:
+        print(f"FAIL: loaded at import (should be lazy): {', '.join(loaded)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
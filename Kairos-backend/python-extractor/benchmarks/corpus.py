@@ -0,0 +1,215 @@
+"""
+Corpus synthetiques deterministes pour la suite de benchmarks (aucun acces reseau).
+
+- CSV facon demo_michael_boutique.csv (journal revenus/depenses d'une boutique) et
+  test_import_clients.csv (import clients), de 1k a 5M lignes
+- TXT de quelques Mo a plusieurs Go (paragraphes facture/compta, accents compris)
+- PDF de 1 a 500 pages (couche texte, une page blanche sur 7), ecrits a la main:
+  pas de dependance en plus de pypdf
+
+Les fichiers sont generes une fois dans le dossier de corpus puis reutilises
+(meme nom = meme contenu, a CORPUS_VERSION egal).
+"""
+from __future__ import annotations
+
+import os
+import random
+import zlib
+from pathlib import Path
+
+CORPUS_VERSION = 1
+_ROWS_PER_WRITE = 10_000
+_TXT_BLOCK_CHARS = 1 << 20
+
+# tier -> fichiers generes: (generateur, parametre)
+TIERS = {
+    "quick": [
+        ("csv_boutique", 1_000),
+        ("csv_boutique", 100_000),
+        ("csv_clients", 10_000),
+        ("txt", 16 << 20),
+        ("pdf", 1),
+        ("pdf", 50),
+    ],
+    "full": [
+        ("csv_boutique", 1_000),
+        ("csv_boutique", 100_000),
+        ("csv_boutique", 1_000_000),
+        ("csv_boutique", 5_000_000),
+        ("csv_clients", 1_000),
+        ("csv_clients", 100_000),
+        ("csv_clients", 1_000_000),
+        ("txt", 16 << 20),
+        ("txt", 2 << 30),
+        ("pdf", 1),
+        ("pdf", 50),
+        ("pdf", 500),
+    ],
+}
+
+_CATEGORIES_OUT = ["Loyer", "Logiciels", "Publicite", "Stock", "Salaires", "Transport", "Frais bancaires"]
+_CATEGORIES_IN = ["Ventes en magasin", "Ventes en ligne", "Ateliers", "Cartes cadeaux"]
+_PAYMENTS = ["carte", "virement", "comptant", "interac"]
+_FIRST = ["Sophie", "Jean-Philippe", "Marie", "Luc", "Camille", "Olivier", "Chloe", "Mathieu", "Julie", "Etienne"]
+_LAST = ["Martin", "Tremblay", "Gagnon", "Roy", "Cote", "Bouchard", "Gauthier", "Morin", "Lavoie", "Fortin"]
+_COMPANIES = ["Entreprise GlobaTech", "Cafe Maple Leaf", "Hotel Montreal Plaza", "Studio Nord", "Atelier Boreal"]
+_WORDS = (
+    "facture montant total taxe tps tvq paiement compte credit debit solde client commande livraison "
+    "produit boutique vente achat pour avec dans sur par votre notre merci reference numero adresse "
+    "échéance reçu périodique détail frais règlement invoice amount price order shipping store"
+).split()
+
+
+def count_label(n: int) -> str:
+    for unit, size in (("G", 1 << 30), ("M", 1 << 20)):
+        if n >= size and n % size == 0:
+            return f"{n // size}{unit}"
+    for unit, size in (("M", 1_000_000), ("k", 1_000)):
+        if n >= size and n % size == 0:
+            return f"{n // size}{unit}"
+    return str(n)
+
+
+def _rng(name: str) -> random.Random:
+    return random.Random(zlib.crc32(name.encode()))
+
+
+def _write_rows(path: Path, header: str, rows: int, make_row) -> None:
+    with path.open("w", encoding="utf-8", newline="") as f:
+        f.write(header)
+        for start in range(0, rows, _ROWS_PER_WRITE):
+            f.write("".join(make_row(i) for i in range(start, min(start + _ROWS_PER_WRITE, rows))))
+
+
+def make_csv_boutique(path: Path, rows: int) -> None:
+    rnd = _rng(path.name)
+
+    def row(i: int) -> str:
+        date = f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}"
+        if rnd.random() < 0.3:
+            cat = rnd.choice(_CATEGORIES_OUT)
+            return (
+                f"{date},Dépense,{rnd.uniform(10, 2500):.2f},{cat},,,,,,"
+                f"\"{cat} - paiement {i}, fournisseur\",{rnd.choice(_PAYMENTS)},DEP-{i:07d}\n"
+            )
+        first, last = rnd.choice(_FIRST), rnd.choice(_LAST)
+        return (
+            f"{date},Revenu,{rnd.uniform(5, 900):.2f},{rnd.choice(_CATEGORIES_IN)},{first} {last},{first},{last},"
+            f"{first.lower()}.{last.lower()}{i % 997}@exemple.ca,(514) 555-{i % 10000:04d},"
+            f"Vente articles {i},{rnd.choice(_PAYMENTS)},VTE-{i:07d}\n"
+        )
+
+    header = (
+        "date,mouvement,montant,categorie,client_name,prenom,nom_de_famille,email,"
+        "telephone,libelle,mode_paiement,ref_facture\n"
+    )
+    _write_rows(path, header, rows, row)
+
+
+def make_csv_clients(path: Path, rows: int) -> None:
+    rnd = _rng(path.name)
+
+    def row(i: int) -> str:
+        income = rnd.random() < 0.6
+        amount = f"{rnd.uniform(50, 9000):.2f}"
+        if income:
+            client = rnd.choice(_COMPANIES)
+            return f"2026-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d},income,{amount},consulting,{client},\"Mandat {i}, suivi\"\n"
+        return f"2026-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d},expense,{amount},software,,Abonnement {i % 50}\n"
+
+    _write_rows(path, "date,type,amount,category,client_name,description\n", rows, row)
+
+
+def make_txt(path: Path, size: int) -> None:
+    """Un bloc de ~1M caracteres repete jusqu'a `size` octets (ecriture rapide meme a 2 Go)."""
+    rnd = _rng(path.name)
+    lines, length = [], 0
+    while length < _TXT_BLOCK_CHARS:
+        line = " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(6, 16)))
+        if rnd.random() < 0.2:
+            line += f" {rnd.randint(1, 9999)},{rnd.randint(0, 99):02d} $"
+        lines.append(line)
+        length += len(line) + 1
+    block = ("\n".join(lines) + "\n").encode("utf-8")
+    with path.open("wb") as f:
+        written = 0
+        while written < size:
+            chunk = block[: size - written]
+            f.write(chunk)
+            written += len(chunk)
+
+
+def _pdf_page_text(rnd: random.Random, page: int) -> str:
+    lines = [f"Releve de compte - page {page}"]
+    for _ in range(40):
+        lines.append(" ".join(rnd.choice(_WORDS[:40]) for _ in range(10)) + f" {rnd.randint(1, 9999)}.{rnd.randint(0, 99):02d}")
+    return "\n".join(lines)
+
+
+def make_pdf(path: Path, pages: int) -> None:
+    """PDF minimal (Helvetica, un flux de contenu par page); une page sur 7 est blanche."""
+    rnd = _rng(path.name)
+    font_id = 3 + 2 * pages
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(pages))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+    for i in range(pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>".encode()
+        )
+        if (i + 1) % 7 == 0:
+            stream = b""
+        else:
+            body = " ".join(f"({line}) '" for line in _pdf_page_text(rnd, i + 1).split("\n"))
+            stream = f"BT /F1 9 Tf 36 770 Td 11 TL {body} ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    with path.open("wb") as f:
+        out = bytearray(b"%PDF-1.4\n")
+        offsets = []
+        for i, obj in enumerate(objects):
+            offsets.append(len(out))
+            out += f"{i + 1} 0 obj\n".encode() + obj + b"\nendobj\n"
+        xref = len(out)
+        out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+        out += b"".join(f"{o:010d} 00000 n \n".encode() for o in offsets)
+        out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+        f.write(out)
+
+
+_GENERATORS = {
+    "csv_boutique": ("csv", make_csv_boutique),
+    "csv_clients": ("csv", make_csv_clients),
+    "txt": ("txt", make_txt),
+    "pdf": ("pdf", make_pdf),
+}
+
+
+def build_corpus(tier: str, directory: Path, only: str = "") -> list[dict]:
+    """
+    Genere (si absent) le corpus du tier. Retourne [{name, path, file_type, size_bytes, rows|pages}].
+    only: si ce texte designe des fichiers du corpus, seuls ceux-la sont generes
+    (sinon il filtre des cas, ex. "profile": tout le corpus est garde).
+    """
+    directory = directory / f"v{CORPUS_VERSION}"
+    directory.mkdir(parents=True, exist_ok=True)
+    entries = [(kind, param, f"{kind}_{count_label(param)}") for kind, param in TIERS[tier]]
+    if only and any(only in name for _, _, name in entries):
+        entries = [e for e in entries if only in e[2]]
+    corpus = []
+    for kind, param, name in entries:
+        file_type, generate = _GENERATORS[kind]
+        unit = {"csv": "rows", "pdf": "pages"}.get(file_type, "bytes")
+        path = directory / f"{name}.{file_type}"
+        if not path.exists():
+            print(f"  generation {path.name} ...", flush=True)
+            tmp = path.with_suffix(".tmp")
+            generate(tmp, param)
+            os.replace(tmp, path)  # pas de fichier partiel si la generation est interrompue
+        entry = {"name": name, "path": str(path), "file_type": file_type, "size_bytes": path.stat().st_size}
+        if unit != "bytes":
+            entry[unit] = param
+        corpus.append(entry)
+    return corpus
@@ -0,0 +1,357 @@
+"""
+Suite de benchmarks de l'extracteur: corpus synthetiques, resultats JSON, comparaison
+a une baseline versionnee (benchmarks/baseline.json).
+
+    cd python-extractor && python -m benchmarks.suite                    # tier quick + comparaison
+    python -m benchmarks.suite --tier full --out results.json            # 5M lignes, TXT de 2 Go, PDF 500 pages
+    python -m benchmarks.suite --only csv_boutique --repeat 10
+    python -m benchmarks.suite --write-baseline                          # nouvelle reference
+
+Chaque cas tourne dans un process neuf (pic RSS propre au cas):
+- doc/<corpus>/<mode>      extract_document dans chaque mode
+- doc/<csv>/profile        profil CSV sur tout le fichier
+- doc/<txt>/spread         echantillonnage TXT "spread"
+- doc/<pdf>/all_pages      PDF lu jusqu'a la derniere page (max_chars illimite)
+- upload/<corpus>          route /extract-upload en process (TestClient, cache desactive)
+
+Par cas: p50/p99 (ms), debit (Mo/s sur les octets lus, lignes/s, pages/s), pic RSS (Mo).
+La baseline depend de la machine: la reenregistrer sur la machine de reference.
+Code de sortie 1 si un cas regresse au-dela de --tolerance.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import math
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from benchmarks.corpus import build_corpus
+
+BENCH_DIR = Path(__file__).resolve().parent
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+DEFAULT_CORPUS_DIR = Path(tempfile.gettempdir()) / "kairos-extractor-bench"
+
+MODES = ("auto", "text_only", "tables_only")
+UPLOAD_MAX_BYTES = 64 * 1024 * 1024  # TestClient garde le corps en memoire
+CASE_TIME_BUDGET_S = 60.0            # au-dela, moins de repetitions (au moins une)
+NOISE_FLOOR_MS = 2.0                 # ecart absolu ignore (cas tres courts)
+BENCH_KEY = "bench"
+
+try:
+    import resource
+except ImportError:  # Windows: pas de pic RSS
+    resource = None
+
+
+def _peak_rss_mb(who: int) -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux: Ko, macOS: octets
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Rang le plus proche (p99 de 5 mesures = le max)."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+# -----------------------------------------------------------------------------
+# Cas
+# -----------------------------------------------------------------------------
+def make_cases(corpus: list[dict]) -> list[dict]:
+    cases = []
+    for item in corpus:
+        for mode in MODES:
+            cases.append({"case": f"doc/{item['name']}/{mode}", "kind": "doc", "corpus": item, "mode": mode})
+        if item["file_type"] == "csv":
+            cases.append({"case": f"doc/{item['name']}/profile", "kind": "doc", "corpus": item, "profile": True})
+        elif item["file_type"] == "txt":
+            cases.append({"case": f"doc/{item['name']}/spread", "kind": "doc", "corpus": item, "txt_strategy": "spread"})
+        elif item["file_type"] == "pdf":
+            cases.append({"case": f"doc/{item['name']}/all_pages", "kind": "doc", "corpus": item, "max_chars": 10**9})
+        if item["size_bytes"] <= UPLOAD_MAX_BYTES:
+            cases.append({"case": f"upload/{item['name']}", "kind": "upload", "corpus": item})
+    return cases
+
+
+def _work(result: dict, corpus: dict) -> dict:
+    """
+    Travail effectue (octets lus, lignes, pages) d'apres le resultat brut ou camelCase.
+    Octets: fenetres lues (TXT), octets recus (upload), fichier entier (profil CSV, PDF lu
+    jusqu'au bout); inconnus sinon (apercu CSV, PDF arrete a max_chars): lignes/s ou pages/s seulement.
+    """
+    limits = result.get("limits", {})
+    txt = limits.get("txt")
+    pdf = limits.get("pdf")
+    profile = result.get("profile")
+    if "uploaded_file" in result:
+        read = result["uploaded_file"]["size_bytes"]
+    elif txt:
+        read = txt["bytes_read"]
+    elif profile or (pdf and pdf["pages_scanned"] == pdf["pages_total"]):
+        read = corpus["size_bytes"]
+    else:
+        read = None
+    work: dict[str, Any] = {"bytes": read}
+    if corpus["file_type"] == "csv":
+        tables = result.get("tables_preview", result.get("tablesPreview")) or []
+        work["rows"] = profile["row_count"] if profile else (tables[0]["total_rows"] if tables else None)
+    if pdf:
+        work["pages"] = pdf["pages_scanned"]
+    return work
+
+
+def _doc_runner(case: dict):
+    from app.extractor import extract_document
+
+    path = Path(case["corpus"]["path"])
+    kwargs = {
+        "mode": case.get("mode", "auto"),
+        "max_chars": case.get("max_chars", 35_000),
+        "profile": case.get("profile", False),
+        "txt_strategy": case.get("txt_strategy"),
+    }
+    return lambda: (extract_document(path, **kwargs), None)
+
+
+def _upload_runner(case: dict, client):
+    corpus = case["corpus"]
+    path = Path(corpus["path"])
+    content_type = {"csv": "text/csv", "txt": "text/plain", "pdf": "application/pdf"}[corpus["file_type"]]
+
+    def run():
+        with path.open("rb") as f:
+            res = client.post(
+                "/extract-upload",
+                data={"max_chars": "35000", "mode": "auto"},
+                files={"file": (path.name, f, content_type)},
+                headers={"X-KAIROS-EXTRACTOR-KEY": BENCH_KEY},
+            )
+        if res.status_code != 200:
+            raise RuntimeError(f"/extract-upload {res.status_code}: {res.text[:200]}")
+        body = res.json()
+        return body, body.get("stages_ms")
+
+    return run
+
+
+def _measure(run, repeat: int) -> tuple[list[float], Any, list[dict]]:
+    run()  # echauffement (imports, workers du pool, cache disque de l'OS)
+    latencies, stages, result = [], [], None
+    started = time.perf_counter()
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result, stage_ms = run()
+        latencies.append((time.perf_counter() - t0) * 1000)
+        if stage_ms:
+            stages.append(stage_ms)
+        if time.perf_counter() - started > CASE_TIME_BUDGET_S:
+            break
+    return latencies, result, stages
+
+
+def _case_process(case: dict, repeat: int, conn) -> None:
+    """Process enfant: un cas, puis envoi des mesures au parent."""
+    try:
+        if case["kind"] == "upload":
+            from fastapi.testclient import TestClient
+            from app.main import app
+            from app.workers import extraction_pool
+
+            # logs par requete de la route: hors du rapport
+            with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet), TestClient(app) as client:
+                latencies, result, stages = _measure(_upload_runner(case, client), repeat)
+                # workers du pool attendus: leur pic RSS compte dans RUSAGE_CHILDREN
+                extraction_pool.executor.shutdown(wait=True)
+        else:
+            latencies, result, stages = _measure(_doc_runner(case), repeat)
+        out = {"latencies": latencies, "work": _work(result, case["corpus"]), "stages": stages}
+        out["peak_rss_mb"] = _peak_rss_mb(resource.RUSAGE_SELF) if resource else None
+        out["peak_rss_children_mb"] = _peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None
+        conn.send(out)
+    except BaseException as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def run_case(case: dict, repeat: int) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_case_process, args=(case, repeat, child))
+    proc.start()
+    child.close()
+    try:
+        raw = parent.recv()
+    except EOFError:
+        raw = {"error": f"process exited with code {proc.exitcode}"}
+    proc.join()
+
+    corpus = case["corpus"]
+    entry: dict[str, Any] = {
+        "case": case["case"],
+        "file_type": corpus["file_type"],
+        "mode": case.get("mode", "auto"),
+        "file_bytes": corpus["size_bytes"],
+    }
+    if "error" in raw:
+        entry["error"] = raw["error"]
+        return entry
+
+    latencies = raw["latencies"]
+    p50 = percentile(latencies, 50)
+    work = raw["work"]
+    seconds = p50 / 1000 if p50 > 0 else float("inf")
+    entry.update({
+        "runs": len(latencies),
+        "p50_ms": round(p50, 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(sum(latencies) / len(latencies), 2),
+        "bytes_read": work["bytes"],
+        "mb_per_s": round(work["bytes"] / 1e6 / seconds, 2) if work["bytes"] is not None else None,
+        "peak_rss_mb": raw["peak_rss_mb"],
+    })
+    if work.get("rows") is not None:
+        entry["rows"] = work["rows"]
+        entry["rows_per_s"] = round(work["rows"] / seconds)
+    if work.get("pages") is not None:
+        entry["pages"] = work["pages"]
+        entry["pages_per_s"] = round(work["pages"] / seconds, 1)
+    if case["kind"] == "upload":
+        entry["peak_rss_workers_mb"] = raw["peak_rss_children_mb"]
+        if raw["stages"]:
+            names = sorted({n for s in raw["stages"] for n in s})
+            entry["stages_p50_ms"] = {n: round(percentile([s.get(n, 0.0) for s in raw["stages"]], 50), 2) for n in names}
+    return entry
+
+
+# -----------------------------------------------------------------------------
+# Rapport + comparaison
+# -----------------------------------------------------------------------------
+def environment(tier: str, repeat: int) -> dict:
+    import pypdf
+
+    return {
+        "tier": tier,
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "pypdf": pypdf.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(results: list[dict], baseline: dict, tolerance: float) -> list[dict]:
+    """Cas plus lents (p50) ou plus gourmands (pic RSS) que la baseline au-dela de la tolerance."""
+    base = {r["case"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        b = base.get(r["case"])
+        if b is None or "error" in b:
+            r["vs_baseline"] = None
+            continue
+        if "error" in r:
+            regressions.append({"case": r["case"], "metric": "error", "detail": r["error"]})
+            continue
+        ratio = r["p50_ms"] / b["p50_ms"] if b["p50_ms"] else 1.0
+        r["vs_baseline"] = round(ratio, 3)
+        if ratio > 1 + tolerance and r["p50_ms"] - b["p50_ms"] > NOISE_FLOOR_MS:
+            regressions.append({"case": r["case"], "metric": "p50_ms", "baseline": b["p50_ms"], "current": r["p50_ms"]})
+        if r.get("peak_rss_mb") and b.get("peak_rss_mb") and r["peak_rss_mb"] > b["peak_rss_mb"] * (1 + tolerance):
+            regressions.append({
+                "case": r["case"], "metric": "peak_rss_mb", "baseline": b["peak_rss_mb"], "current": r["peak_rss_mb"],
+            })
+    return regressions
+
+
+def _print_row(r: dict) -> None:
+    if "error" in r:
+        print(f"  {r['case']:<42} ERROR {r['error']}")
+        return
+    rate = ""
+    if "rows_per_s" in r:
+        rate = f"{r['rows_per_s']:>10} rows/s"
+    elif "pages_per_s" in r:
+        rate = f"{r['pages_per_s']:>10} pages/s"
+    vs = r.get("vs_baseline")
+    print(
+        f"  {r['case']:<42} p50 {r['p50_ms']:>9.2f} ms  p99 {r['p99_ms']:>9.2f} ms  "
+        f"{r['mb_per_s'] if r['mb_per_s'] is not None else '-':>9} MB/s {rate:<17} rss {r['peak_rss_mb']} MB"
+        + (f"  x{vs:.2f}" if vs is not None else "")
+    )
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tier", choices=("quick", "full"), default="quick")
+    parser.add_argument("--repeat", type=int, default=5, help="mesures par cas (apres 1 echauffement)")
+    parser.add_argument("--only", default="", help="garde les cas dont le nom contient ce texte")
+    parser.add_argument("--corpus-dir", type=Path, default=DEFAULT_CORPUS_DIR)
+    parser.add_argument("--out", type=Path, help="ecrit les resultats JSON dans ce fichier")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="regression si p50/RSS > baseline * (1 + tol)")
+    parser.add_argument("--write-baseline", action="store_true", help="enregistre les resultats comme baseline")
+    args = parser.parse_args(argv)
+
+    # Enfants spawn: l'environnement est herite. Cache desactive: chaque mesure extrait vraiment.
+    os.environ["EXTRACTOR_CACHE_ENABLED"] = "0"
+    os.environ["KAIROS_EXTRACTOR_KEY"] = BENCH_KEY
+    os.environ.setdefault("KAIROS_STORAGE_ROOT", str(args.corpus_dir))
+
+    print(f"corpus ({args.tier}) -> {args.corpus_dir}")
+    corpus = build_corpus(args.tier, args.corpus_dir, only=args.only)
+    cases = [c for c in make_cases(corpus) if args.only in c["case"]]
+
+    baseline = None
+    if not args.write_baseline and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+
+    print(f"{len(cases)} cas, {args.repeat} mesures chacun:")
+    results = []
+    for case in cases:
+        entry = run_case(case, args.repeat)
+        if baseline is not None:
+            compare([entry], baseline, args.tolerance)
+        _print_row(entry)
+        results.append(entry)
+
+    report = {"environment": environment(args.tier, args.repeat), "results": results}
+    regressions = []
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        report["baseline"] = {"path": str(args.baseline), "environment": baseline.get("environment")}
+        report["regressions"] = regressions
+
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    if args.write_baseline:
+        if args.only and args.baseline.exists():
+            # baseline partielle: les cas non relances gardent leur valeur
+            previous = json.loads(args.baseline.read_text(encoding="utf-8"))
+            done = {r["case"] for r in results}
+            report["results"] = [r for r in previous.get("results", []) if r["case"] not in done] + results
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"baseline ecrite: {args.baseline}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) vs {args.baseline}:")
+        for reg in regressions:
+            print(f"  - {reg['case']} {reg['metric']}: {reg.get('baseline')} -> {reg.get('current', reg.get('detail'))}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,11 @@ import { Prisma } from "../../generated/prisma/client";
 import fs from "fs";
 
 import { askKairosFinanceFromDocument, askKairosFromDocument } from "./aiService";
-import { extractUploadViaPython } from "./extractorClient";
+import {
+  EXTRACTOR_SHARED_STORAGE,
+  extractUploadViaPython,
+  extractViaPython,
+} from "./extractorClient";
 
 // ✅ IMPORTANT: utiliser la version stable basée sur UPLOADS_ROOT
 import { toAbsoluteDiskPath } from "../utils/fileStorage";
@@ -189,13 +193,21 @@ export const processDocumentByIdService = async (params: {
   // 3) Extraction via Python (source of truth)
   console.log(`[processDocument] Sending file to extractor: id_document=${doc.id_document} file_type=${doc.file_type}`);
 
-  const extracted = await extractUploadViaPython({
-    file_path: absPath,
-    original_name: doc.file_name,
-    max_chars: 35000,
-    mode: "auto",
-    ...(doc.file_type ? { file_type: doc.file_type } : {}),
-  });
+  // Volume partage: Python lit le fichier en place (pas de transfert HTTP)
+  const extracted = EXTRACTOR_SHARED_STORAGE
+    ? await extractViaPython({
+        storage_path: doc.storage_path,
+        max_chars: 35000,
+        mode: "auto",
+        ...(doc.file_type ? { file_type: doc.file_type } : {}),
+      })
+    : await extractUploadViaPython({
+        file_path: absPath,
+        original_name: doc.file_name,
+        max_chars: 35000,
+        mode: "auto",
+        ...(doc.file_type ? { file_type: doc.file_type } : {}),
+      });
 
   if (!extracted.ok) {
     throw new Error(`EXTRACTOR_FAILED: ${extracted.error} - ${extracted.message}`);
@@ -9,6 +9,8 @@ export type ExtractRequest = {
   file_type?: string;
   max_chars?: number;
   mode?: ExtractMode;
+  profile?: boolean;
+  txt_strategy?: "head" | "head_tail" | "spread";
 };
 
 export type ExtractResponseOk = {
@@ -39,9 +41,38 @@ export type ExtractResponseOk = {
   limits: {
     max_chars: number;
     truncated: boolean;
+    txt?: {
+      file_bytes: number | null;
+      bytes_read: number;
+      strategy: "full" | "head" | "head_tail" | "spread";
+      windows?: Array<[number, number]>;
+    };
   };
 
+  // Present seulement si profile=true (CSV lu en entier)
+  profile?: CsvProfile;
+
   processing_time_ms?: number;
+  // Temps par etape (upload, cache, queue_wait, txt_read, csv_read, pdf_parse, detect)
+  stages_ms?: Record<string, number>;
+};
+
+export type CsvColumnProfile = {
+  name: string;
+  type: "date" | "decimal" | "category" | "free_text" | "empty";
+  nulls: number;
+  non_null: number;
+  min?: number | string;
+  max?: number | string;
+  sum?: number;
+  invalid?: number;
+  approx_distinct?: number;
+  top_values?: Array<[string, number]>;
+};
+
+export type CsvProfile = {
+  row_count: number;
+  columns: CsvColumnProfile[];
 };
 
 export type ExtractResponseError = {
@@ -58,7 +89,65 @@ const EXTRACTOR_URL =
 const EXTRACTOR_KEY = process.env.KAIROS_EXTRACTOR_KEY;
 const TIMEOUT_MS = 20_000;
 
+// "1" si Node et Python partagent le volume uploads (meme machine / meme volume):
+// Python lit le fichier en place, sans upload HTTP.
+export const EXTRACTOR_SHARED_STORAGE = process.env.EXTRACTOR_SHARED_STORAGE === "1";
+
+/**
+ * Path mode: Python lit storage_path (uploads/...) directement (/extract)
+ */
+export const extractViaPython = async (
+  req: ExtractRequest
+): Promise<ExtractResponse> => {
+  if (!EXTRACTOR_KEY) {
+    return {
+      ok: false,
+      error: "MISSING_KEY",
+      message: "KAIROS_EXTRACTOR_KEY not set",
+    };
+  }
 
+  // SECURITY: ne pas logger storage_path (chemins disque + PII business).
+  console.log(`[extractViaPython] request file_type=${req.file_type ?? "auto"} mode=${req.mode ?? "auto"}`);
+
+  try {
+    const res = await axios.post(
+      `${EXTRACTOR_URL}/extract`,
+      {
+        storage_path: req.storage_path,
+        max_chars: req.max_chars ?? 35000,
+        mode: req.mode ?? "auto",
+        ...(req.file_type ? { file_type: req.file_type } : {}),
+        ...(req.profile ? { profile: true } : {}),
+        ...(req.txt_strategy ? { txt_strategy: req.txt_strategy } : {}),
+      },
+      {
+        headers: { "X-KAIROS-EXTRACTOR-KEY": EXTRACTOR_KEY },
+        timeout: TIMEOUT_MS,
+        validateStatus: () => true,
+      }
+    );
+
+    console.log("[extractViaPython] status =", res.status);
+
+    if (res.status < 200 || res.status >= 300) {
+      return {
+        ok: false,
+        error: "HTTP_ERROR",
+        message: `Extractor ${res.status} - ${JSON.stringify(res.data)}`,
+      };
+    }
+
+    return res.data as ExtractResponse;
+  } catch (e: any) {
+    const msg = e?.code === "ECONNABORTED" ? "Request timeout" : e?.message;
+    return {
+      ok: false,
+      error: "REQUEST_FAILED",
+      message: msg ?? "Unknown error",
+    };
+  }
+};
 
 export type ExtractUploadRequest = {
   file_path: string;
@@ -67,6 +156,7 @@ export type ExtractUploadRequest = {
   max_chars?: number;
   mode?: ExtractMode;
   mime_type?: string;
+  profile?: boolean; // CSV: profil de colonnes sur tout le fichier
 };
 
 /**
@@ -86,15 +176,18 @@ export const extractUploadViaPython = async (
   const url = `${EXTRACTOR_URL}/extract-upload`;
 
   const form = new FormData();
-  
-  form.append("file", fs.createReadStream(req.file_path), {
-    filename: req.original_name,
-    contentType: req.mime_type ?? "application/octet-stream",
-  });
 
+  // Champs AVANT le fichier: Python lit le multipart en flux et peut couper
+  // la lecture des que max_chars / le plafond de lignes CSV est atteint.
   form.append("max_chars", String(req.max_chars ?? 35000));
   form.append("mode", req.mode ?? "auto");
   if (req.file_type) form.append("file_type", req.file_type);
+  if (req.profile) form.append("profile", "true");
+
+  form.append("file", fs.createReadStream(req.file_path), {
+    filename: req.original_name,
+    contentType: req.mime_type ?? "application/octet-stream",
+  });
 
   // SECURITY: ne pas logger file_path/original_name (chemins disque + PII business).
   console.log(`[extractUploadViaPython] request file_type=${req.file_type ?? "auto"} mode=${req.mode ?? "auto"}`);
@@ -131,3 +224,207 @@ export const extractUploadViaPython = async (
     };
   }
 };
+
+export type ExtractBatchFile = {
+  file_path: string;
+  original_name: string; // .zip: archive lue membre par membre cote Python
+  mime_type?: string;
+};
+
+export type ExtractBatchRequest = {
+  files: ExtractBatchFile[];
+  max_chars?: number;
+  mode?: ExtractMode;
+  on_error?: "continue" | "abort";
+};
+
+export type ExtractBatchLine =
+  | (ExtractResponseOk & { type: "result"; index: number; name: string })
+  | { type: "error"; index: number; name: string; ok: false; error: string }
+  | {
+      type: "summary";
+      files: number;
+      ok: number;
+      failed: number;
+      aborted: boolean;
+      upload_truncated: boolean;
+      processing_time_ms: number;
+    };
+
+/**
+ * Batch mode: plusieurs fichiers (ou un .zip) en une requete (/extract-batch).
+ * Python repond en NDJSON, une ligne par fichier des qu'il est extrait (ordre de fin),
+ * puis une ligne "summary". onLine est appele au fil de l'eau.
+ */
+export const extractBatchViaPython = async (
+  req: ExtractBatchRequest,
+  onLine?: (line: ExtractBatchLine) => void
+): Promise<ExtractBatchLine[]> => {
+  if (!EXTRACTOR_KEY) {
+    throw new Error("MISSING_KEY: KAIROS_EXTRACTOR_KEY not set");
+  }
+
+  const form = new FormData();
+  // Champs AVANT les fichiers (lus en flux)
+  form.append("max_chars", String(req.max_chars ?? 35000));
+  form.append("mode", req.mode ?? "auto");
+  form.append("on_error", req.on_error ?? "continue");
+  for (const f of req.files) {
+    form.append("files", fs.createReadStream(f.file_path), {
+      filename: f.original_name,
+      contentType: f.mime_type ?? "application/octet-stream",
+    });
+  }
+
+  console.log(`[extractBatchViaPython] request files=${req.files.length}`);
+
+  const res = await axios.post(`${EXTRACTOR_URL}/extract-batch`, form, {
+    headers: {
+      "X-KAIROS-EXTRACTOR-KEY": EXTRACTOR_KEY,
+      ...form.getHeaders(),
+    },
+    timeout: TIMEOUT_MS * Math.max(1, req.files.length),
+    maxBodyLength: Infinity,
+    maxContentLength: Infinity,
+    responseType: "stream",
+    validateStatus: () => true,
+  });
+
+  if (res.status < 200 || res.status >= 300) {
+    res.data.resume();
+    throw new Error(`EXTRACTOR_BATCH_FAILED: HTTP ${res.status}`);
+  }
+
+  const lines: ExtractBatchLine[] = [];
+  let buffered = "";
+  for await (const chunk of res.data) {
+    buffered += chunk.toString("utf8");
+    let nl: number;
+    while ((nl = buffered.indexOf("\n")) >= 0) {
+      const raw = buffered.slice(0, nl).trim();
+      buffered = buffered.slice(nl + 1);
+      if (!raw) continue;
+      const line = JSON.parse(raw) as ExtractBatchLine;
+      lines.push(line);
+      onLine?.(line);
+    }
+  }
+  return lines;
+};
+
+export type ExtractJobState = "queued" | "running" | "done" | "failed";
+
+export type ExtractJobStatus = {
+  ok: true;
+  job_id: string;
+  state: ExtractJobState;
+  progress: { pages_done: number | null; pages_total: number | null };
+  error: string | null;
+  deduplicated?: boolean; // meme contenu + memes parametres: job existant reutilise
+};
+
+const JOB_POLL_MS = 1_000;
+const JOB_MAX_WAIT_MS = 10 * 60_000;
+
+/**
+ * Job mode: upload -> job id (/extract-jobs), puis polling jusqu'au resultat.
+ * Pour les gros PDF: aucune requete HTTP ne reste ouverte pendant l'extraction.
+ */
+export const extractJobViaPython = async (
+  req: ExtractUploadRequest,
+  onProgress?: (status: ExtractJobStatus) => void
+): Promise<ExtractResponse> => {
+  if (!EXTRACTOR_KEY) {
+    return {
+      ok: false,
+      error: "MISSING_KEY",
+      message: "KAIROS_EXTRACTOR_KEY not set",
+    };
+  }
+
+  const headers = { "X-KAIROS-EXTRACTOR-KEY": EXTRACTOR_KEY };
+
+  const form = new FormData();
+  form.append("max_chars", String(req.max_chars ?? 35000));
+  form.append("mode", req.mode ?? "auto");
+  if (req.file_type) form.append("file_type", req.file_type);
+  if (req.profile) form.append("profile", "true");
+  form.append("file", fs.createReadStream(req.file_path), {
+    filename: req.original_name,
+    contentType: req.mime_type ?? "application/octet-stream",
+  });
+
+  // SECURITY: ne pas logger file_path/original_name (chemins disque + PII business).
+  console.log(`[extractJobViaPython] request file_type=${req.file_type ?? "auto"} mode=${req.mode ?? "auto"}`);
+
+  try {
+    const submit = await axios.post(`${EXTRACTOR_URL}/extract-jobs`, form, {
+      headers: { ...headers, ...form.getHeaders() },
+      timeout: TIMEOUT_MS,
+      maxBodyLength: Infinity,
+      maxContentLength: Infinity,
+      validateStatus: () => true,
+    });
+
+    console.log("[extractJobViaPython] submit status =", submit.status);
+
+    if (submit.status < 200 || submit.status >= 300) {
+      return {
+        ok: false,
+        error: "HTTP_ERROR",
+        message: `Extractor ${submit.status} - ${JSON.stringify(submit.data)}`,
+      };
+    }
+
+    const jobId = (submit.data as ExtractJobStatus).job_id;
+    const deadline = Date.now() + JOB_MAX_WAIT_MS;
+
+    while (Date.now() < deadline) {
+      const status = await axios.get(`${EXTRACTOR_URL}/extract-jobs/${jobId}`, {
+        headers,
+        timeout: TIMEOUT_MS,
+        validateStatus: () => true,
+      });
+      if (status.status !== 200) {
+        return {
+          ok: false,
+          error: "HTTP_ERROR",
+          message: `Extractor ${status.status} - ${JSON.stringify(status.data)}`,
+        };
+      }
+
+      const job = status.data as ExtractJobStatus;
+      onProgress?.(job);
+
+      if (job.state === "failed") {
+        return { ok: false, error: "JOB_FAILED", message: job.error ?? "Unknown error" };
+      }
+      if (job.state === "done") {
+        const result = await axios.get(`${EXTRACTOR_URL}/extract-jobs/${jobId}/result`, {
+          headers,
+          timeout: TIMEOUT_MS,
+          validateStatus: () => true,
+        });
+        if (result.status !== 200) {
+          return {
+            ok: false,
+            error: "HTTP_ERROR",
+            message: `Extractor ${result.status} - ${JSON.stringify(result.data)}`,
+          };
+        }
+        return result.data as ExtractResponse;
+      }
+
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_MS));
+    }
+
+    return { ok: false, error: "JOB_TIMEOUT", message: `Job ${jobId} not done after ${JOB_MAX_WAIT_MS} ms` };
+  } catch (e: any) {
+    const msg = e?.code === "ECONNABORTED" ? "Request timeout" : e?.message;
+    return {
+      ok: false,
+      error: "REQUEST_FAILED",
+      message: msg ?? "Unknown error",
+    };
+  }
+};
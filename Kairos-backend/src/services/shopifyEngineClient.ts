@@ -1,4 +1,5 @@
 import axios from "axios";
+import { Readable } from "stream";
 
 const ENGINE_URL = process.env.SHOPIFY_ENGINE_URL || "http://127.0.0.1:8002";
 const TIMEOUT_MS = 5_000;
@@ -33,17 +34,131 @@ export type ProfitabilitySnapshot = {
     has_cost: boolean;
 };
 
+/** Sans effective_date : cout en vigueur depuis toujours. Avec : s'applique aux ventes (order_date) a partir de cette date. */
+export type ProductCost = { product_id: string; cost_per_unit: number; effective_date?: string };
+
 export const computeProfitability = async (payload: {
     business_id: number;
     period_start: string; // ISO date string
     period_end: string;   // ISO date string
-    order_items: {product_id: string; quantity: number; unit_price: number;}[];
-    product_costs: {product_id: string; cost_per_unit: number;}[];
+    order_items: {product_id: string; quantity: number; unit_price: number; order_date?: string;}[];
+    product_costs: ProductCost[];
 }): Promise<ProfitabilitySnapshot[]> => {
     const res = await axios.post(`${ENGINE_URL}/profit/compute`, payload, { timeout: 10_000 });
     return res.data.snapshots
 };
 
+export type OrderItemLine = { product_id: string; quantity: number; unit_price: number; order_date?: string };
+
+/**
+ * Variante NDJSON pour les gros historiques (recalcul annuel) : les lignes de commande
+ * sont envoyees en chunked au fil de l'iteration, sans construire un corps JSON geant.
+ * Un curseur de base de donnees peut etre passe directement comme `orderItems`.
+ */
+export const computeProfitabilityStream = async (
+    header: {
+        business_id: number;
+        period_start: string; // ISO date string
+        period_end: string;   // ISO date string
+        product_costs: ProductCost[];
+    },
+    orderItems: Iterable<OrderItemLine> | AsyncIterable<OrderItemLine>,
+): Promise<ProfitabilitySnapshot[]> => {
+    async function* lines() {
+        yield JSON.stringify(header) + "\n";
+        for await (const item of orderItems) {
+            yield JSON.stringify(item) + "\n";
+        }
+    }
+    const res = await axios.post(`${ENGINE_URL}/profit/compute-stream`, Readable.from(lines()), {
+        headers: { "Content-Type": "application/x-ndjson" },
+        timeout: 300_000,
+        maxBodyLength: Infinity,
+    });
+    return res.data.snapshots;
+};
+
+/** Colonnes paralleles : une entree par couple (seau, produit) ayant des ventes. */
+export type ProfitSeriesColumns = {
+    bucket_start: string[];
+    bucket_end: string[];
+    bucket: number[];   // index dans bucket_start / bucket_end
+    product: number[];  // index dans products
+    revenue: number[];
+    cogs: number[];
+    gross_profit: number[];
+    gross_margin_pct: number[];
+    units_sold: number[];
+};
+
+export type ProfitSeries = {
+    business_id: number;
+    period_start: string;
+    period_end: string;
+    products: string[];
+    has_cost: boolean[];
+    series: Partial<Record<"day" | "week" | "month", ProfitSeriesColumns>>;
+    windows?: ProfitSeriesColumns & { label: (string | null)[] };
+    lines: number;
+    lines_outside_period: number;
+};
+
+/** Series jour / semaine / mois (+ fenetres libres) en un seul appel, au lieu d'un computeProfitability par seau. */
+export const computeProfitSeries = async (payload: {
+    business_id: number;
+    period_start: string;
+    period_end: string;
+    order_items: (OrderItemLine & { order_date: string })[];
+    product_costs: ProductCost[];
+    granularities?: ("day" | "week" | "month")[];
+    windows?: { start: string; end: string; label?: string }[];
+}): Promise<ProfitSeries> => {
+    const res = await axios.post(`${ENGINE_URL}/profit/series`, payload, { timeout: 60_000 });
+    return res.data;
+};
+
+export type ProfitLineSync = {
+    line_key: string;   // cle stable (id du line item Shopify) : renvoyer une ligne ne la compte pas deux fois
+    order_date: string; // ISO date ou datetime
+    product_id: string;
+    quantity: number;
+    unit_price: number;
+    removed?: boolean;
+};
+
+export type ProfitSyncResult = {
+    business_id: number;
+    received: number;
+    inserted: number;
+    updated: number;
+    removed: number;
+    unchanged: number;
+    processing_time_ms: number;
+};
+
+/** Synchro incrementale : seulement les lignes nouvelles / modifiees / supprimees depuis la derniere synchro. */
+export const syncProfitLines = async (payload: {
+    business_id: number;
+    order_items: ProfitLineSync[];
+    product_costs: ProductCost[];
+}): Promise<ProfitSyncResult> => {
+    const res = await axios.post(`${ENGINE_URL}/profit/sync`, payload, { timeout: 30_000 });
+    return res.data;
+};
+
+/** Snapshots d'une periode lus dans les agregats journaliers du moteur (pas de rescan des commandes). */
+export const getProfitSnapshots = async (
+    businessId: number,
+    periodStart: string,
+    periodEnd: string,
+): Promise<ProfitabilitySnapshot[]> => {
+    const res = await axios.get(`${ENGINE_URL}/profit/snapshots/${businessId}`, {
+        params: { period_start: periodStart, period_end: periodEnd },
+        timeout: TIMEOUT_MS,
+    });
+    return res.data.snapshots;
+};
+
 export type InsightResult = {
     type: string;
     product_id: string;
@@ -54,7 +169,7 @@ export type InsightResult = {
     value: number;
 };
 
-export const computeInsights = async (payload: {
+export type InsightInputs = {
     business_id: number;
     period_start: string;
     period_end: string;
@@ -75,11 +190,56 @@ export const computeInsights = async (payload: {
         original_price: number;
         refunded_amount: number;
     }[];
-}): Promise<InsightResult[]> => {
+};
+
+export const computeInsights = async (payload: InsightInputs): Promise<InsightResult[]> => {
     const res = await axios.post(`${ENGINE_URL}/insights/compute`, payload, { timeout: 30_000 });
     return res.data.insights;
 };
 
+export type TemplatedInsight = InsightResult & { next_step: string; source: "llm" | "template" };
+
+export type InsightRun = {
+    run_id: string;
+    revision: number;
+    complete: boolean;
+    insights: TemplatedInsight[];
+    pending: number;
+};
+
+/**
+ * Insights rendus tout de suite (textes en cache ou templates) : ne depend pas de la latence OpenAI.
+ * Les textes LLM arrivent ensuite via getInsightRun(run_id, revision).
+ */
+export const computeInsightsTemplateFirst = async (payload: InsightInputs): Promise<InsightRun> => {
+    const res = await axios.post(
+        `${ENGINE_URL}/insights/compute`,
+        { ...payload, template_first: true },
+        { timeout: 10_000 },
+    );
+    return res.data;
+};
+
+export type InsightRunUpdate = {
+    run_id: string;
+    business_id: number;
+    revision: number;
+    complete: boolean;
+    /** insights modifies depuis `since`, avec leur position dans la reponse initiale */
+    insights: (TemplatedInsight & { index: number })[];
+};
+
+/** null si le run est inconnu ou expire (on garde alors les templates). */
+export const getInsightRun = async (runId: string, since = -1): Promise<InsightRunUpdate | null> => {
+    try {
+        const res = await axios.get(`${ENGINE_URL}/insights/runs/${runId}`, { params: { since }, timeout: TIMEOUT_MS });
+        return res.data;
+    } catch (err) {
+        if (axios.isAxiosError(err) && err.response?.status === 404) return null;
+        throw err;
+    }
+};
+
 export type ChatAnswer = {
     business_id: number;
     question: string;